@@ -0,0 +1,167 @@
+"""Query throughput and per-worker memory as the number of server workers grows.
+
+Compares web.prefork (models loaded once, shared copy-on-write) with
+``uvicorn --workers`` (every worker loads its own models):
+
+    python -m benchmarks.prefork_bench [--workers 1,2,4] [--duration 10] [--backend fake]
+
+With the fake backend the models are tiny, so the memory columns mostly show
+the interpreter; run with ``--backend live`` to see the DPR and
+SentenceTransformer weights shared.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+QUESTIONS = [
+    "How can physiotherapy help my child start walking?",
+    "What are early signs of speech development?",
+    "Which medical checks are recommended in the first year?",
+    "How do I encourage my toddler to feed themselves?",
+]
+MODES = {
+    "prefork": lambda n, port: [sys.executable, "-m", "web.prefork", "--workers", str(n), "--port", str(port)],
+    "uvicorn": lambda n, port: [sys.executable, "-m", "uvicorn", "web.app:app", "--workers", str(n),
+                                "--port", str(port), "--log-level", "warning"],
+}
+
+
+def _children(pid: int) -> list:
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # Field 4 is the parent pid; the command name may contain spaces
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == pid:
+                children.append(int(entry))
+    return children
+
+
+def memory_mb(pid: int) -> dict:
+    """RSS, proportional set size and shared/private split from smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+    }
+
+
+def _wait_ready(port: int, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Server on port {port} did not become ready")
+
+
+def _load(port: int, duration: float, concurrency: int) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset: int):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        i = offset
+        while time.monotonic() < stop_at:
+            body = json.dumps({"question": QUESTIONS[i % len(QUESTIONS)] + f" ({i})"})
+            started = time.perf_counter()
+            try:
+                connection.request("POST", "/query", body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors[0] += 1
+            i += concurrency
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    percentile = lambda q: round(latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000, 1)
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": percentile(0.5) if latencies else None,
+        "p95_ms": percentile(0.95) if latencies else None,
+    }
+
+
+def run(workers=(1, 2, 4), modes=("prefork", "uvicorn"), duration: float = 10, concurrency: int = 16,
+        backend: str = "fake", port: int = 8100) -> list:
+    env = dict(os.environ, RAGSTEPS_BACKEND=backend, WEB_SYNC_PROFILES="0")
+    results = []
+    for mode in modes:
+        for n in workers:
+            server = subprocess.Popen(MODES[mode](n, port), env=env, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL)
+            try:
+                started = time.monotonic()
+                _wait_ready(port)
+                row = {"mode": mode, "workers": n, "startup_s": round(time.monotonic() - started, 1)}
+                row.update(_load(port, duration, concurrency))
+                worker_memory = [memory_mb(pid) for pid in _children(server.pid)]
+                row["parent_memory"] = memory_mb(server.pid)
+                row["worker_memory"] = worker_memory
+                row["total_pss_mb"] = round(
+                    row["parent_memory"]["pss_mb"] + sum(m["pss_mb"] for m in worker_memory), 1
+                )
+                results.append(row)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=30)
+            port += 1
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--modes", default="prefork,uvicorn")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--backend", default="fake")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    print(json.dumps(run(
+        workers=[int(n) for n in args.workers.split(",")],
+        modes=args.modes.split(","),
+        duration=args.duration,
+        concurrency=args.concurrency,
+        backend=args.backend,
+        port=args.port,
+    ), indent=2))
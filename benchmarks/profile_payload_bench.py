@@ -0,0 +1,75 @@
+"""Size and decode time of profile payloads: JSON in metadata vs the binary format.
+
+    python -m benchmarks.profile_payload_bench [--repeat 200]
+"""
+import argparse
+import json
+import timeit
+from datetime import date, timedelta
+
+from src.models.profile_payload import CODEC_JSON, CODEC_MSGPACK, decode_profile, encode_profile, msgpack
+
+HISTORY_SIZES = (10, 100, 1000, 5000)
+# Pinecone's per-vector metadata limit
+METADATA_LIMIT_BYTES = 40 * 1024
+
+
+def synthetic_profile(history: int) -> dict:
+    start = date(2023, 1, 1)
+    return {
+        "profile_id": "child_bench",
+        "name": "Benchmark Child",
+        "date_of_birth": "2022-01-01",
+        "medical_considerations": ["Hypotonia", "Hearing checks"],
+        "current_focus_areas": ["Walking", "First words"],
+        "milestones": {
+            f"Milestone {i}": {
+                "name": f"Milestone {i}", "category": ["Motor", "Speech", "Social"][i % 3],
+                "age_range": "12 months", "description": "", "completed": True,
+                "completed_date": (start + timedelta(days=i)).isoformat(), "notes": ""
+            }
+            for i in range(20)
+        },
+        "progress_history": [
+            {"date": (start + timedelta(days=i)).isoformat(), "milestone": f"Milestone {i % 20}",
+             "note": f"Practised for {i % 30 + 5} minutes and tried the next step"}
+            for i in range(history)
+        ],
+    }
+
+
+def _per_call_us(fn, repeat: int) -> float:
+    return round(min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1e6, 2)
+
+
+def run(repeat: int = 200) -> list:
+    codecs = [("json", CODEC_JSON)] + ([("msgpack", CODEC_MSGPACK)] if msgpack is not None else [])
+    results = []
+    for history in HISTORY_SIZES:
+        profile = synthetic_profile(history)
+        metadata_json = json.dumps(profile)
+        row = {
+            "progress_entries": history,
+            "json_metadata": {
+                "bytes": len(metadata_json),
+                "fits_metadata_limit": len(metadata_json) <= METADATA_LIMIT_BYTES,
+                "decode_us": _per_call_us(lambda: json.loads(metadata_json), repeat),
+            },
+        }
+        for name, codec in codecs:
+            blob = encode_profile(profile, codec=codec)
+            row[f"payload_{name}"] = {
+                "bytes": len(blob),
+                "size_ratio": round(len(blob) / len(metadata_json), 3),
+                "core_fields_us": _per_call_us(lambda: decode_profile(blob)["current_focus_areas"], repeat),
+                "full_decode_us": _per_call_us(lambda: decode_profile(blob).to_dict(), repeat),
+            }
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
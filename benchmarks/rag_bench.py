@@ -0,0 +1,287 @@
+"""End-to-end benchmark over the bundled corpus and query log.
+
+    python -m benchmarks.rag_bench [--output results.json] [--compare baseline.json]
+
+Ingests the PDFs in data/ into a fresh in-process index and document store,
+then measures question embedding, retrieval latency and recall, the saved
+Chroma collection in chroma_db/ (when chromadb can open it) and full
+query_knowledge_base latency over logged questions (``--query-log``: the
+legacy user_queries.txt by default, or a structured logs/queries.jsonl).
+Remote services are replaced by the fakes (``--backend fake``, the default;
+the RAGSTEPS_FAKE_*_LATENCY settings apply), so results depend only on the
+code under test.
+
+Recall is measured by self-retrieval: a passage taken from the middle of a
+sampled chunk must bring that chunk back in the top k. With ``--compare``,
+metrics that regressed by more than ``--tolerance`` against an earlier
+result file are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from src.rag import backends, document_store
+from src.utils import tracing
+from src.utils.query_log import iter_records, parse_legacy_log
+
+DATA_DIR = "data"
+CHROMA_DIR = "chroma_db"
+CHROMA_COLLECTION = "ds_knowledge_base"
+QUERY_LOG = "user_queries.txt"
+# Used when the query log holds fewer questions than requested
+FALLBACK_QUESTIONS = [
+    "What are the early signs of speech development in children with Down syndrome?",
+    "How can physiotherapy help my child start walking?",
+    "Which medical checks are recommended in the first year?",
+    "How do I support my child's behaviour at home?",
+    "What should be on the preventative medical checklist?",
+    "How can I encourage my toddler to feed themselves?",
+    "When do children with Down syndrome usually sit without support?",
+    "What hearing and vision checks should my child have?",
+]
+# Direction in which each compared metric gets worse
+LOWER_IS_BETTER = ("_ms", "_s")
+HIGHER_IS_BETTER = ("per_s", "recall", "mrr")
+
+
+def _latency_summary(seconds: List[float]) -> Dict:
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def parse_query_log(path: str) -> List[str]:
+    """Questions from a structured (.jsonl) or legacy free-text query log, oldest first"""
+    if path.endswith(".jsonl"):
+        records = iter_records(path)
+    elif os.path.exists(path):
+        records = parse_legacy_log(path)
+    else:
+        return []
+    return [r["question"] for r in records if r.get("question") and not r.get("cached")]
+
+
+def benchmark_questions(path: str, count: int) -> List[str]:
+    logged = parse_query_log(path)
+    questions = logged + [q for q in FALLBACK_QUESTIONS if q not in logged]
+    return (questions * (count // len(questions) + 1))[:count]
+
+
+def ingest_corpus(data_dir: str) -> Dict:
+    """Ingest every PDF through the production loader; returns throughput and chunk IDs"""
+    from src.utils.pdf_loader import ingest_pdf
+
+    files, chunk_ids = [], []
+    started = time.perf_counter()
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".pdf"):
+            continue
+        file_started = time.perf_counter()
+        counts = ingest_pdf(os.path.join(data_dir, filename))
+        files.append(dict(counts, file=filename, seconds=round(time.perf_counter() - file_started, 3)))
+        chunk_ids += [f"{filename}_chunk_{i}" for i in range(counts["chunks"])]
+    elapsed = time.perf_counter() - started
+    pages = sum(f["pages"] for f in files)
+    return {
+        "summary": {
+            "files": len(files),
+            "pages": pages,
+            "chunks": len(chunk_ids),
+            "total_s": round(elapsed, 3),
+            "pages_per_s": round(pages / elapsed, 1) if elapsed else None,
+            "chunks_per_s": round(len(chunk_ids) / elapsed, 1) if elapsed else None,
+        },
+        "files": files,
+        "chunk_ids": chunk_ids,
+    }
+
+
+def _probe(text: str, words: int = 30) -> str:
+    """A passage from the middle of a chunk, to look the chunk up by"""
+    tokens = text.split()
+    start = max(0, len(tokens) // 2 - words // 2)
+    return " ".join(tokens[start:start + words])
+
+
+def benchmark_retrieval(index, store, chunk_ids: List[str], samples: int = 200, top_k: int = 5,
+                        seed: int = 0) -> Dict:
+    """Embed and retrieval latency plus self-retrieval recall@k and MRR"""
+    encode = backends.get_question_encoder()
+    sampled = random.Random(seed).sample(chunk_ids, min(samples, len(chunk_ids)))
+    texts = store.get_texts(sampled)
+    embed_times, query_times, hits, reciprocal_ranks = [], [], 0, []
+    for chunk_id, text in zip(sampled, texts):
+        if not text:
+            continue
+        started = time.perf_counter()
+        embedding = encode(_probe(text))
+        embedded = time.perf_counter()
+        results = index.query(vector=embedding.tolist(), top_k=top_k, include_metadata=False)
+        query_times.append(time.perf_counter() - embedded)
+        embed_times.append(embedded - started)
+        ranked = [match.id for match in results.matches]
+        if chunk_id in ranked:
+            hits += 1
+            reciprocal_ranks.append(1 / (ranked.index(chunk_id) + 1))
+        else:
+            reciprocal_ranks.append(0.0)
+    return {
+        "embed": _latency_summary(embed_times),
+        "retrieval": dict(
+            _latency_summary(query_times),
+            top_k=top_k,
+            **{f"recall_at_{top_k}": round(hits / len(query_times), 4) if query_times else None},
+            mrr=round(float(np.mean(reciprocal_ranks)), 4) if reciprocal_ranks else None,
+        ),
+    }
+
+
+def benchmark_chroma(chroma_dir: str, questions: List[str]) -> Dict:
+    """Query latency of the saved Chroma collection, if it can be opened"""
+    try:
+        import chromadb
+    except ImportError:
+        return {"skipped": "chromadb is not installed"}
+    try:
+        collection = chromadb.PersistentClient(path=chroma_dir).get_collection(CHROMA_COLLECTION)
+    except Exception as e:
+        return {"skipped": f"cannot open {chroma_dir}/{CHROMA_COLLECTION}: {e}"}
+
+    encode = backends.get_question_encoder()
+    times = []
+    for question in questions:
+        embedding = encode(question).tolist()
+        started = time.perf_counter()
+        collection.query(query_embeddings=[embedding], n_results=3)
+        times.append(time.perf_counter() - started)
+    return dict(_latency_summary(times), documents=collection.count())
+
+
+def benchmark_end_to_end(questions: List[str]) -> Dict:
+    from src.rag.rag_query_streamlit import query_knowledge_base
+
+    times, errors = [], 0
+    for question in questions:
+        started = time.perf_counter()
+        result = query_knowledge_base(question)
+        times.append(time.perf_counter() - started)
+        errors += bool(result["error"])
+    return dict(_latency_summary(times), errors=errors)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(data_dir: str = DATA_DIR, chroma_dir: str = CHROMA_DIR, query_log: str = QUERY_LOG,
+        questions: int = 50, samples: int = 200, top_k: int = 5, seed: int = 0, backend: str = "fake") -> Dict:
+    os.environ["RAGSTEPS_BACKEND"] = backend
+    backends.reset_backends()
+    previous_tracer = tracing.get_tracer()
+    tracing.set_tracer(tracing.Tracer(enabled=True))
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    store = document_store.DocumentStore(os.path.join(workdir, "docs.sqlite"))
+    previous_store, document_store._default_store = document_store._default_store, store
+    try:
+        ingestion = ingest_corpus(data_dir)
+        chunk_ids = ingestion.pop("chunk_ids")
+        index = backends.get_vector_index()
+        asked = benchmark_questions(query_log, questions)
+        results = {
+            "environment": {
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "backend": backends.get_backend(),
+            },
+            "config": {"questions": len(asked), "samples": samples, "top_k": top_k, "seed": seed},
+            "ingestion": ingestion,
+        }
+        results.update(benchmark_retrieval(index, store, chunk_ids, samples, top_k, seed))
+        results["chroma"] = benchmark_chroma(chroma_dir, asked)
+        results["end_to_end"] = benchmark_end_to_end(asked)
+        results["stages"] = tracing.get_tracer().summary()
+        return results
+    finally:
+        document_store._default_store = previous_store
+        store.close()
+        tracing.set_tracer(previous_tracer)
+        backends.reset_backends()
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = 0.1) -> List[Dict]:
+    """Metrics that got worse by more than ``tolerance`` (a fraction) since the baseline"""
+    old, new = _flatten(baseline), _flatten(current)
+    regressions = []
+    for metric in sorted(old.keys() & new.keys()):
+        before, after = old[metric], new[metric]
+        name = metric.rsplit(".", 1)[-1]
+        if name.endswith(HIGHER_IS_BETTER) or name.startswith(HIGHER_IS_BETTER):
+            worse = after < before * (1 - tolerance)
+        elif name.endswith(LOWER_IS_BETTER):
+            worse = after > before * (1 + tolerance)
+        elif name == "errors":
+            worse = after > before
+        else:
+            continue
+        if worse:
+            regressions.append({"metric": metric, "baseline": before, "current": after})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--chroma-dir", default=CHROMA_DIR)
+    parser.add_argument("--query-log", default=QUERY_LOG)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="fake", help="fake, or replay to use recorded responses")
+    parser.add_argument("--output", help="Write results here as well as to stdout")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run(args.data_dir, args.chroma_dir, args.query_log, args.questions, args.samples,
+                  args.top_k, args.seed, args.backend)
+    if args.compare:
+        with open(args.compare) as f:
+            results["regressions"] = compare(json.load(f), results, args.tolerance)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if results.get("regressions") else 0)
@@ -49,6 +49,10 @@ else:
                                 st.text_area("How did it go? (Optional)", key=f"notes_{activity['name']}")
                                 if st.button("Submit", key=f"submit_{activity['name']}"):
                                     notes = st.session_state[f"notes_{activity['name']}"]
+                                    if 'user_manager' in st.session_state:
+                                        st.session_state.user_manager.add_progress_note(
+                                            profile, notes or "Completed", milestone=activity['name']
+                                        )
                                     assessment = st.session_state.program_generator.assess_activity_completion(
                                         profile, 
                                         f"Activity: {activity['name']}\nNotes: {notes}"
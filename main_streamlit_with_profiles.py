@@ -1,9 +1,11 @@
 import streamlit as st
 from datetime import datetime
 from src.models.user_model import UserManager, ChildProfile
+from src.models.profile_store import open_profile_store
 from src.models.milestone_data import DEVELOPMENTAL_MILESTONES, get_next_milestones
-from src.rag.rag_query_streamlit import query_knowledge_base
-from src.utils.pdf_loader import load_pdfs_to_pinecone
+from src.rag.rag_query_streamlit import get_session_cache, stream_knowledge_base
+from src.utils.ingestion_jobs import JobQueue, enqueue_pdf, launch_worker_processes
+from src.utils.query_log import log_query
 import os
 from dotenv import load_dotenv
 
@@ -17,9 +19,27 @@ st.set_page_config(
     layout="wide"
 )
 
+PROFILES_PER_PAGE = 50
+UPLOAD_DIR = os.path.join("data", "uploads")
+
+@st.cache_resource
+def get_profile_store():
+    """One profile store connection shared by every session and rerun.
+
+    Only the store is shared: each session keeps its own UserManager, whose
+    profile cache and unsynchronised edits stay with that session.
+    """
+    return open_profile_store()
+
+@st.cache_resource
+def get_ingestion_queue():
+    """Start the ingestion workers once per server and share the job queue"""
+    launch_worker_processes(int(os.getenv("INGESTION_WORKERS", 1)))
+    return JobQueue()
+
 # Initialize session state for user management
 if 'user_manager' not in st.session_state:
-    st.session_state.user_manager = UserManager()
+    st.session_state.user_manager = UserManager(store=get_profile_store())
 
 if 'current_profile' not in st.session_state:
     st.session_state.current_profile = None
@@ -28,8 +48,12 @@ if 'current_profile' not in st.session_state:
 with st.sidebar:
     st.title("Profile Management")
     
-    # Profile selection
-    profiles = st.session_state.user_manager.list_profiles()
+    # Profile selection, one page of names at a time
+    user_manager = st.session_state.user_manager
+    profile_count = user_manager.count_profiles()
+    page_count = max(1, -(-profile_count // PROFILES_PER_PAGE))
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+    profiles = user_manager.list_profiles(offset=(page - 1) * PROFILES_PER_PAGE, limit=PROFILES_PER_PAGE)
     profile_names = [profile.name for profile in profiles]
     
     # If there are no profiles, set the selectbox to display a default message
@@ -38,7 +62,7 @@ with st.sidebar:
     else:
         selected_name = st.selectbox("Select Profile", ["No profiles available"])
     
-    selected_profile = next((p for p in profiles if p.name == selected_name), None)
+    selected_profile = user_manager.get_profile_by_name(selected_name) if profile_names else None
 
     if selected_name != "No profiles available" and st.button("Load Profile"):
         if selected_profile:
@@ -61,7 +85,7 @@ with st.sidebar:
             focus_list = [item.strip() for item in new_focus.split(",")] if new_focus else []
             
             new_profile = ChildProfile(
-                profile_id=f"child_{len(profiles) + 1}",
+                profile_id=f"child_{profile_count + 1}",
                 name=new_name,
                 date_of_birth=new_dob.isoformat(),
                 medical_considerations=medical_list,
@@ -100,9 +124,17 @@ if st.session_state.current_profile:
         user_question = st.text_input("Ask a question about child development:")
         
         if user_question:
-            with st.spinner("Finding relevant information..."):
-                response = query_knowledge_base(user_question)
-                st.write(response)
+            # Render tokens as they arrive instead of waiting for the full answer.
+            # Reruns from other widgets replay the cached answer instead of re-querying.
+            stream = stream_knowledge_base(user_question, cache=get_session_cache(st.session_state))
+            st.write_stream(stream)
+            if stream.error:
+                st.error(f"Sorry, something went wrong: {stream.error}")
+            # Log each question once, not again on every rerun that replays it
+            if st.session_state.get('last_logged_question') != (profile.profile_id, user_question):
+                st.session_state.last_logged_question = (profile.profile_id, user_question)
+                log_query(user_question, stream.result(), profile_id=profile.profile_id, source="streamlit",
+                          timings=stream.timings, cached=stream.cached)
     
     with col2:
         st.header("Developmental Milestone Tracker")
@@ -128,7 +160,8 @@ if st.session_state.current_profile:
                     key=f"{profile.profile_id}_{milestone['name']}"
                 )
                 if completed:
-                    profile.add_milestone(
+                    st.session_state.user_manager.record_milestone(
+                        profile,
                         name=milestone["name"],
                         category=milestone["category"],
                         completed_date=datetime.now().isoformat()
@@ -157,6 +190,31 @@ else:
     st.title("Welcome to Bright Steps!")
     st.info("Please select or create a profile to begin tracking milestones.")
 
+# Knowledge base uploads run in the background ingestion workers
+with st.sidebar:
+    st.markdown("---")
+    st.subheader("Add Documents")
+    job_queue = get_ingestion_queue()
+    uploaded_files = st.file_uploader("PDFs for the knowledge base", type="pdf", accept_multiple_files=True)
+    if uploaded_files and st.button("Add to knowledge base"):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        for uploaded_file in uploaded_files:
+            path = os.path.join(UPLOAD_DIR, os.path.basename(uploaded_file.name))
+            with open(path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
+            enqueue_pdf(path, job_queue)
+        st.success(f"Queued {len(uploaded_files)} document(s) for ingestion")
+
+    for job in job_queue.recent(5):
+        name = os.path.basename(job["payload"].get("path", ""))
+        progress = job["progress"]
+        counts = ", ".join(f"{progress[key]} {key}" for key in ("pages", "chunks", "vectors") if key in progress)
+        st.caption(f"{name}: {job['status']}" + (f" ({counts})" if counts else ""))
+        if job["status"] == "failed" and job["error"]:
+            st.caption(f"Error: {job['error']}")
+    if st.button("Refresh status"):
+        st.rerun()
+
 # Add a WhatsApp button in the sidebar
 with st.sidebar:
     st.markdown("---")
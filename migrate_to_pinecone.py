@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 import os
 from tqdm import tqdm
 import numpy as np
+from src.rag.document_store import get_document_store
 
 # Load environment variables
 load_dotenv()
@@ -27,23 +28,36 @@ def migrate_to_pinecone():
         include=['embeddings', 'documents', 'metadatas']
     )
     
+    # Chunk text goes to the local document store, not vector metadata
+    store = get_document_store()
+    
     # Prepare batches for Pinecone
     batch_size = 100
     for i in tqdm(range(0, len(results['ids']), batch_size)):
         batch_ids = results['ids'][i:i + batch_size]
         batch_embeddings = results['embeddings'][i:i + batch_size]
         batch_documents = results['documents'][i:i + batch_size]
+        batch_metadatas = results['metadatas'][i:i + batch_size]
         
         # Prepare vectors for Pinecone
         vectors = []
-        for id_, embedding, text in zip(batch_ids, batch_embeddings, batch_documents):
+        records = []
+        for id_, embedding, text, meta in zip(batch_ids, batch_embeddings, batch_documents, batch_metadatas):
+            meta = meta or {}
             vectors.append({
                 'id': id_,
                 'values': embedding,
-                'metadata': {'text': text}
+                'metadata': {'source': meta.get('source', ''), 'page': meta.get('page', 0)}
+            })
+            records.append({
+                'id': id_,
+                'text': text,
+                'source': meta.get('source', ''),
+                'page': meta.get('page', 0)
             })
         
-        # Upsert to Pinecone
+        # Store text locally, then upsert to Pinecone
+        store.put_many(records)
         index.upsert(vectors=vectors)
     
     print(f"Migration complete! Migrated {len(results['ids'])} documents to Pinecone")
@@ -10,6 +10,7 @@ from dotenv import load_dotenv
 import os
 import torch
 import numpy as np
+from src.utils.llm_controller import estimate_tokens, get_llm_controller
 
 # Load environment variables
 load_dotenv()
@@ -28,7 +29,11 @@ def expand_query(query, llm):
         input_variables=["question"]
     )
     chain = LLMChain(llm=llm, prompt=prompt)
-    expanded = chain.run(question=query)
+    expanded = get_llm_controller().call(
+        chain.run,
+        question=query,
+        estimated_tokens=estimate_tokens(template + query, 100)
+    )
     # Split the result and add the original query
     queries = [query] + [q.strip() for q in expanded.split(',')]
     return queries
@@ -92,7 +97,8 @@ def setup_rag():
     # Initialize LLM
     llm = ChatOpenAI(
         model="gpt-3.5-turbo",
-        temperature=0.7
+        temperature=0.7,
+        max_retries=0  # Retries are handled by the shared LLM controller
     )
     
     # Create prompt template
@@ -130,7 +136,12 @@ def query_documents(question):
     context = get_relevant_context(expanded_queries, collection, question_encoder, question_tokenizer)
     
     # Generate answer
-    response = chain.run(context=context, question=question)
+    response = get_llm_controller().call(
+        chain.run,
+        context=context,
+        question=question,
+        estimated_tokens=estimate_tokens(context + question, 500)
+    )
     
     return response
 
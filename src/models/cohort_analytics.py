@@ -0,0 +1,216 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional
+import threading
+import numpy as np
+
+from src.models.milestone_data import DEVELOPMENTAL_MILESTONES, MILESTONE_CATEGORIES
+
+
+def _month_index(iso_date: Optional[str]) -> int:
+    """Months since year 0, or -1 when there is no date"""
+    if not iso_date:
+        return -1
+    parsed = datetime.fromisoformat(iso_date)
+    return parsed.year * 12 + parsed.month - 1
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class CohortAnalytics:
+    """Milestone completion statistics across every profile, held in columns.
+
+    Completions are rows of parallel NumPy arrays (profile, milestone,
+    category, completion month) and profiles carry their birth month, so
+    aggregates are a handful of ``bincount`` calls rather than a loop over
+    profile objects. Register ``record_event`` with ``UserManager.add_listener``
+    to keep the columns current as milestones are recorded.
+    """
+
+    def __init__(self, age_band_months: int = 12, capacity: int = 1024):
+        self.age_band_months = age_band_months
+        self._lock = threading.Lock()
+
+        self._profile_rows: Dict[str, int] = {}
+        self._birth_month = np.zeros(capacity, dtype=np.int32)
+        self._profile_active = np.zeros(capacity, dtype=bool)
+
+        self._milestone_codes: Dict[str, int] = {}
+        self._milestone_names: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._categories: List[str] = []
+        for category in MILESTONE_CATEGORIES:
+            self._code(self._category_codes, self._categories, category)
+        self._catalog_per_category = np.zeros(len(self._categories), dtype=np.int32)
+        for milestone in DEVELOPMENTAL_MILESTONES:
+            self._code(self._milestone_codes, self._milestone_names, milestone["name"])
+            self._catalog_per_category[self._category_codes[milestone["category"]]] += 1
+
+        self._size = 0
+        self._event_profile = np.zeros(capacity, dtype=np.int32)
+        self._event_milestone = np.zeros(capacity, dtype=np.int32)
+        self._event_category = np.zeros(capacity, dtype=np.int32)
+        self._event_month = np.zeros(capacity, dtype=np.int32)
+        self._event_active = np.zeros(capacity, dtype=bool)
+        # (profile row, milestone code) -> event row, so re-recording replaces
+        self._event_rows: Dict[tuple, int] = {}
+        self._profile_events: Dict[int, List[int]] = {}
+
+    @staticmethod
+    def _code(codes: Dict[str, int], names: List[str], value: str) -> int:
+        if value not in codes:
+            codes[value] = len(names)
+            names.append(value)
+        return codes[value]
+
+    @classmethod
+    def from_store(cls, store, age_band_months: int = 12) -> "CohortAnalytics":
+        """Build the columns from a profile store in two bulk scans"""
+        analytics = cls(age_band_months=age_band_months)
+        for record in store.list_profile_records():
+            analytics.add_profile(record)
+        for profile_id, milestone in store.iter_milestones():
+            analytics.add_completion(profile_id, milestone)
+        return analytics
+
+    def add_profile(self, record: Dict):
+        """Add or replace a profile; milestones in the record replace its completions"""
+        with self._lock:
+            profile_id = record["profile_id"]
+            row = self._profile_rows.get(profile_id)
+            if row is None:
+                row = len(self._profile_rows)
+                if row == len(self._birth_month):
+                    self._birth_month = _grow(self._birth_month, row * 2)
+                    self._profile_active = _grow(self._profile_active, row * 2)
+                self._profile_rows[profile_id] = row
+            self._birth_month[row] = _month_index(record["date_of_birth"])
+            self._profile_active[row] = True
+            if "milestones" in record:
+                self._clear_completions(row)
+        for milestone in record.get("milestones", {}).values():
+            self.add_completion(profile_id, milestone)
+
+    def _clear_completions(self, row: int):
+        for event in self._profile_events.pop(row, []):
+            self._event_active[event] = False
+            self._event_rows.pop((row, int(self._event_milestone[event])), None)
+
+    def remove_profile(self, profile_id: str):
+        with self._lock:
+            row = self._profile_rows.get(profile_id)
+            if row is not None:
+                self._profile_active[row] = False
+                self._clear_completions(row)
+
+    def add_completion(self, profile_id: str, milestone: Dict):
+        """Record one completed milestone (a ``DevelopmentalMilestone.to_dict``)"""
+        if not milestone.get("completed", True):
+            return
+        with self._lock:
+            row = self._profile_rows.get(profile_id)
+            if row is None:
+                return
+            code = self._code(self._milestone_codes, self._milestone_names, milestone["name"])
+            category = self._code(self._category_codes, self._categories, milestone["category"])
+            event = self._event_rows.get((row, code))
+            if event is None:
+                event = self._size
+                if event == len(self._event_profile):
+                    capacity = event * 2
+                    self._event_profile = _grow(self._event_profile, capacity)
+                    self._event_milestone = _grow(self._event_milestone, capacity)
+                    self._event_category = _grow(self._event_category, capacity)
+                    self._event_month = _grow(self._event_month, capacity)
+                    self._event_active = _grow(self._event_active, capacity)
+                self._size += 1
+                self._event_rows[(row, code)] = event
+                self._profile_events.setdefault(row, []).append(event)
+            self._event_profile[event] = row
+            self._event_milestone[event] = code
+            self._event_category[event] = category
+            self._event_month[event] = _month_index(milestone.get("completed_date"))
+            self._event_active[event] = True
+
+    def record_event(self, profile_id: str, event: Dict):
+        """``UserManager`` listener: fold one journal event or profile save in"""
+        if event["type"] == "milestone_completed":
+            self.add_completion(profile_id, event["milestone"])
+        elif event["type"] == "profile_saved":
+            self.add_profile(event["profile"])
+
+    def _snapshot(self):
+        """Active completion columns plus each profile's current age band (caller holds the lock)"""
+        active = self._event_active[:self._size]
+        profiles = self._event_profile[:self._size][active]
+        n_profiles = len(self._profile_rows)
+        today = date.today()
+        age_months = today.year * 12 + today.month - 1 - self._birth_month[:n_profiles]
+        bands = np.maximum(age_months, 0) // self.age_band_months
+        return active, profiles, bands
+
+    def completion_rates(self) -> List[Dict]:
+        """Completion rate per category and current age band.
+
+        ``rate`` is completions over children in the band times catalogue
+        milestones in the category (None for categories outside the catalogue).
+        """
+        with self._lock:
+            active, profiles, bands = self._snapshot()
+            categories = self._event_category[:self._size][active]
+            n_categories = len(self._categories)
+            n_bands = int(bands.max()) + 1 if len(bands) else 0
+            counts = np.bincount(
+                bands[profiles] * n_categories + categories, minlength=n_bands * n_categories
+            ).reshape(n_bands, n_categories)
+            children = np.bincount(bands[self._profile_active[:len(bands)]], minlength=n_bands)
+            catalog = np.zeros(n_categories, dtype=np.int32)
+            catalog[:len(self._catalog_per_category)] = self._catalog_per_category
+
+            rows = []
+            for band in np.flatnonzero(children):
+                for category in range(n_categories):
+                    possible = children[band] * catalog[category]
+                    rows.append({
+                        "age_band": f"{band * self.age_band_months}-{(band + 1) * self.age_band_months - 1} months",
+                        "category": self._categories[category],
+                        "children": int(children[band]),
+                        "completed": int(counts[band, category]),
+                        "rate": round(float(counts[band, category] / possible), 4) if possible else None,
+                    })
+            return rows
+
+    def median_completion_age(self) -> Dict[str, float]:
+        """Median age in months at which each milestone was completed"""
+        with self._lock:
+            active = self._event_active[:self._size]
+            months = self._event_month[:self._size][active]
+            dated = months >= 0
+            ages = (months - self._birth_month[self._event_profile[:self._size][active]])[dated]
+            codes = self._event_milestone[:self._size][active][dated]
+            if not len(codes):
+                return {}
+            order = np.lexsort((ages, codes))
+            codes, ages = codes[order], ages[order]
+            boundaries = np.flatnonzero(np.diff(codes)) + 1
+            return {
+                self._milestone_names[group_codes[0]]: float(np.median(group_ages))
+                for group_codes, group_ages in zip(np.split(codes, boundaries), np.split(ages, boundaries))
+            }
+
+    def to_arrow(self):
+        """Active completions as a pyarrow Table (requires pyarrow)"""
+        import pyarrow as pa
+
+        with self._lock:
+            active = self._event_active[:self._size]
+            profile_ids = np.array(list(self._profile_rows), dtype=object)
+            return pa.table({
+                "profile_id": profile_ids[self._event_profile[:self._size][active]],
+                "milestone": np.array(self._milestone_names, dtype=object)[self._event_milestone[:self._size][active]],
+                "category": np.array(self._categories, dtype=object)[self._event_category[:self._size][active]],
+                "completed_month": self._event_month[:self._size][active],
+            })
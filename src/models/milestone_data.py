@@ -1,4 +1,6 @@
-from typing import List, Dict
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+import numpy as np
 
 # Define milestone categories
 MILESTONE_CATEGORIES = [
@@ -139,29 +141,95 @@ DEVELOPMENTAL_MILESTONES: List[Dict] = [
     }
 ]
 
+def _parse_age_range(age_range: str) -> Tuple[int, int]:
+    """Parse an age range like "2-4 months" into (2, 4)"""
+    start, end = age_range.split("-")
+    return int(start.strip().split()[0]), int(end.strip().split()[0])
+
+
+# Milestones are included in "next" lists up to this many months past their range
+LOOKAHEAD_MONTHS = 3
+
+# Compiled once at import: milestones in (stable) order of their start month,
+# with parallel numeric arrays and per-category / per-range indexes
+MILESTONES_BY_START: List[Dict] = sorted(
+    DEVELOPMENTAL_MILESTONES, key=lambda m: _parse_age_range(m["age_range"])[0]
+)
+_STARTS: List[int] = [_parse_age_range(m["age_range"])[0] for m in MILESTONES_BY_START]
+_START_MONTHS = np.array(_STARTS, dtype=np.int32)
+_END_MONTHS = np.array([_parse_age_range(m["age_range"])[1] for m in MILESTONES_BY_START], dtype=np.int32)
+_COLUMNS: Dict[str, int] = {m["name"]: i for i, m in enumerate(MILESTONES_BY_START)}
+_BY_CATEGORY: Dict[str, List[Dict]] = {}
+_BY_AGE_RANGE: Dict[str, List[Dict]] = {}
+for _milestone in DEVELOPMENTAL_MILESTONES:
+    _BY_CATEGORY.setdefault(_milestone["category"], []).append(_milestone)
+    _BY_AGE_RANGE.setdefault(_milestone["age_range"], []).append(_milestone)
+
+
 def get_milestones_by_category(category: str) -> List[Dict]:
     """Get all milestones for a specific category"""
-    return [m for m in DEVELOPMENTAL_MILESTONES if m["category"] == category]
+    return list(_BY_CATEGORY.get(category, []))
 
 def get_milestones_by_age_range(age_range: str) -> List[Dict]:
     """Get all milestones for a specific age range"""
-    return [m for m in DEVELOPMENTAL_MILESTONES if m["age_range"] == age_range]
+    return list(_BY_AGE_RANGE.get(age_range, []))
 
 def get_next_milestones(current_age_months: int, limit: int = 3) -> List[Dict]:
     """Get the next appropriate milestones based on the child's age"""
-    # Convert age ranges to months for comparison
-    def age_range_to_months(age_range: str) -> tuple:
-        start, end = age_range.split("-")
-        start_num = int(start.strip().split()[0])
-        end_num = int(end.strip().split()[0])
-        return (start_num, end_num)
-    
-    appropriate_milestones = []
-    for milestone in DEVELOPMENTAL_MILESTONES:
-        start_month, end_month = age_range_to_months(milestone["age_range"])
-        if start_month <= current_age_months <= end_month + 3:  # Include milestones slightly ahead
-            appropriate_milestones.append(milestone)
-    
-    # Sort by age range and return the next few
-    appropriate_milestones.sort(key=lambda x: age_range_to_months(x["age_range"])[0])
-    return appropriate_milestones[:limit]
+    # Only milestones starting at or before this age can apply, and they are
+    # already in start order
+    candidates = bisect_right(_STARTS, current_age_months)
+    next_milestones = []
+    for i in range(candidates):
+        if len(next_milestones) == limit:
+            break
+        if current_age_months <= _END_MONTHS[i] + LOOKAHEAD_MONTHS:  # Include milestones slightly ahead
+            next_milestones.append(MILESTONES_BY_START[i])
+    return next_milestones
+
+def milestone_column(name: str) -> int:
+    """Column of a milestone in ``MILESTONES_BY_START`` and the batch APIs"""
+    return _COLUMNS[name]
+
+def completed_matrix(completed: Sequence[Iterable[str]]) -> np.ndarray:
+    """Boolean (children x milestones) matrix from each child's completed milestone names"""
+    matrix = np.zeros((len(completed), len(MILESTONES_BY_START)), dtype=bool)
+    for row, names in enumerate(completed):
+        columns = [_COLUMNS[name] for name in names if name in _COLUMNS]
+        matrix[row, columns] = True
+    return matrix
+
+def next_milestone_indices(
+    ages_months: Sequence[int],
+    completed: Union[np.ndarray, Sequence[Iterable[str]]] = None,
+    limit: int = 3
+) -> np.ndarray:
+    """Vectorised ``get_next_milestones`` for many children at once.
+
+    ``completed`` is either a boolean matrix (see ``completed_matrix``) or one
+    iterable of milestone names per child; completed milestones are skipped.
+    Returns an (n_children, limit) array of indexes into
+    ``MILESTONES_BY_START``, padded with -1.
+    """
+    ages = np.asarray(ages_months, dtype=np.int32)[:, None]
+    eligible = (_START_MONTHS[None, :] <= ages) & (ages <= _END_MONTHS[None, :] + LOOKAHEAD_MONTHS)
+    if completed is not None:
+        if not isinstance(completed, np.ndarray):
+            completed = completed_matrix(completed)
+        eligible &= ~completed
+    ranks = np.cumsum(eligible, axis=1)
+    rows, columns = np.nonzero(eligible & (ranks <= limit))
+    indices = np.full((len(ages), limit), -1, dtype=np.int32)
+    indices[rows, ranks[rows, columns] - 1] = columns
+    return indices
+
+def get_next_milestones_batch(
+    ages_months: Sequence[int],
+    completed: Union[np.ndarray, Sequence[Iterable[str]]] = None,
+    limit: int = 3
+) -> List[List[Dict]]:
+    """Next milestones for each (age, completed set) pair, as milestone dicts"""
+    return [
+        [MILESTONES_BY_START[i] for i in row if i >= 0]
+        for row in next_milestone_indices(ages_months, completed, limit)
+    ]
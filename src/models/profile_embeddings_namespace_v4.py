@@ -1,9 +1,23 @@
-from typing import Dict, List
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
+import copy
+import hashlib
 import json
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
+import threading
 from dotenv import load_dotenv
+from src.models.profile_payload import (
+    FORMAT_VERSION,
+    ProfilePayload,
+    ProfilePayloadStore,
+    decode_profile,
+    encode_profile,
+    get_payload_store,
+)
+from src.models.profile_similarity import ProfileSimilarityIndex
+from src.rag.backends import get_sentence_encoder, get_vector_index
+from src.utils.tracing import span
 import os
 import logging
 
@@ -12,22 +26,41 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ProfileEmbeddingHandler:
-    def __init__(self):
+    def __init__(self, index=None, model=None, cache_size: int = 1024, payloads: ProfilePayloadStore = None):
         # Load environment variables
         load_dotenv()
         logger.info("Initializing ProfileEmbeddingHandler...")
         
-        # Initialize Pinecone
+        # Initialize Pinecone (or the configured stand-in)
         logger.info("Connecting to Pinecone...")
-        self.pc = Pinecone()
-        self.index = self.pc.Index("studyrag")
+        self.index = index or get_vector_index("studyrag")
         self.namespace = "profiles"
         
         # Initialize the embedding model
         logger.info("Loading SentenceTransformer model...")
-        self.model = SentenceTransformer('bert-base-nli-mean-tokens')
+        self.model = model or get_sentence_encoder('bert-base-nli-mean-tokens')
+        # Full profile data lives in the payload store, referenced by profile ID
+        self.payloads = payloads or get_payload_store()
+        # Upsert verification runs off the request path
+        self._verifier = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-verify")
+        # Read-through cache of stored profile data for plain ID lookups
+        self._cache: "OrderedDict[str, ProfilePayload]" = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        # Local copy of every synced profile embedding for similar-profile search,
+        # complete once sync_all_profiles has run (``warmed``)
+        self.similarity = ProfileSimilarityIndex()
+        self.warmed = False
         logger.info("Initialization complete")
 
+    @staticmethod
+    def _vector_id(profile_id: str) -> str:
+        return f"profile_{profile_id}"
+
+    @staticmethod
+    def _text_hash(profile_text: str) -> str:
+        return hashlib.sha1(profile_text.encode("utf-8")).hexdigest()
+
     def _create_profile_text(self, profile_data: Dict) -> str:
         """Create a detailed text representation of the profile for embedding"""
         age_months = (datetime.now() - datetime.fromisoformat(profile_data["date_of_birth"])).days // 30
@@ -59,100 +92,211 @@ class ProfileEmbeddingHandler:
 
         # Add progress history
         text += "\n\nProgress History:\n"
-        for entry in profile_data["progress_history"]:
-            text += f"- {entry['date']}: {entry['milestone']} - {entry['notes']}\n"
+        for entry in profile_data.get("progress_history", []):
+            text += f"- {entry['date']}: {entry['milestone']} - {entry.get('notes', entry.get('note', ''))}\n"
 
         return text
 
-    def _create_profile_metadata(self, profile_data: Dict) -> Dict:
+    def _create_profile_metadata(self, profile_data: Dict, text_hash: str = None) -> Dict:
         """Create metadata for the profile"""
         return {
+            "text_hash": text_hash or self._text_hash(self._create_profile_text(profile_data)),
             "type": "profile",
             "profile_id": profile_data["profile_id"],
             "name": profile_data["name"],
             "date_of_birth": profile_data["date_of_birth"],
             "age_months": (datetime.now() - datetime.fromisoformat(profile_data["date_of_birth"])).days // 30,
             "last_updated": datetime.now().isoformat(),
-            "full_data": json.dumps(profile_data)  # Store full data directly in metadata
+            "payload_format": FORMAT_VERSION
         }
 
-    def upsert_profile(self, profile_data: Dict):
-        """Update or insert a profile into the vector database"""
-        try:
-            logger.info(f"Creating embedding for profile {profile_data['profile_id']}...")
-            profile_text = self._create_profile_text(profile_data)
-            profile_metadata = self._create_profile_metadata(profile_data)
-            
-            # Create embedding
-            logger.info("Generating embedding...")
-            embedding = self.model.encode(profile_text).tolist()
-            
-            vector_id = f"profile_{profile_data['profile_id']}"
-            logger.info(f"Upserting vector with ID: {vector_id}")
-            
-            # Upsert to Pinecone
-            self.index.upsert(
-                vectors=[{
-                    "id": vector_id,
-                    "values": embedding,
-                    "metadata": profile_metadata
-                }],
-                namespace=self.namespace
-            )
-            logger.info("Upsert completed successfully")
-            
-            # Verify the upsert with a query
-            logger.info("Verifying upsert with query...")
-            query_result = self.index.query(
-                vector=embedding,
-                filter={"type": "profile", "profile_id": profile_data["profile_id"]},
-                namespace=self.namespace,
-                top_k=1,
-                include_metadata=True
-            )
-            
-            if query_result and query_result.matches:
-                logger.info("Verification successful - profile found in index")
-                return True
+    def _fetch_vectors(self, vector_ids: List[str], batch_size: int = 100) -> Dict:
+        """Stored vectors (values and metadata) by vector ID"""
+        vectors = {}
+        for start in range(0, len(vector_ids), batch_size):
+            fetched = self.index.fetch(ids=vector_ids[start:start + batch_size], namespace=self.namespace)
+            vectors.update(fetched.vectors)
+        return vectors
+
+    def _stored_hashes(self, vector_ids: List[str]) -> Dict[str, str]:
+        """Text hashes of the profiles already in the index, by vector ID"""
+        return {
+            vector_id: (vector.metadata or {}).get("text_hash")
+            for vector_id, vector in self._fetch_vectors(vector_ids).items()
+        }
+
+    def _invalidate(self, profile_ids: List[str]):
+        with self._cache_lock:
+            for profile_id in profile_ids:
+                self._cache.pop(profile_id, None)
+
+    def _load_payload(self, profile_id: str, metadata: Dict = None) -> Optional[ProfilePayload]:
+        """Full profile data from the payload store.
+
+        Vectors written before the payload store existed carry the profile as
+        ``full_data`` JSON in their metadata; those are moved into the store
+        the first time they are read.
+        """
+        payload = self.payloads.get(profile_id)
+        if payload is None and metadata and "full_data" in metadata:
+            profile_data = json.loads(metadata["full_data"])
+            self.payloads.put_many([profile_data])
+            payload = decode_profile(encode_profile(profile_data))
+        return payload
+
+    def _fetch_profile(self, profile_id: str) -> Optional[ProfilePayload]:
+        """Stored profile data by ID, from the cache, the payload store or a direct fetch"""
+        with self._cache_lock:
+            if profile_id in self._cache:
+                self._cache.move_to_end(profile_id)
+                return self._cache[profile_id]
+
+        payload = self.payloads.get(profile_id)
+        if payload is None:
+            vector_id = self._vector_id(profile_id)
+            vector = self.index.fetch(ids=[vector_id], namespace=self.namespace).vectors.get(vector_id)
+            if vector is None:
+                return None
+            payload = self._load_payload(profile_id, vector.metadata)
+            if payload is None:
+                return None
+
+        with self._cache_lock:
+            self._cache[profile_id] = payload
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return payload
+
+    def _verify(self, expected: Dict[str, str]) -> bool:
+        """Check by ID that the index holds the expected version of each profile"""
+        stored = self._stored_hashes(list(expected))
+        missing = [vector_id for vector_id, text_hash in expected.items() if stored.get(vector_id) != text_hash]
+        if missing:
+            logger.warning(f"Verification failed - {len(missing)} profiles not found after upsert: {missing[:5]}")
+            return False
+        logger.info(f"Verification successful - {len(expected)} profiles found in index")
+        return True
+
+    def sync_profiles(self, profiles: List[Dict], force: bool = False, batch_size: int = 64) -> Dict:
+        """Re-embed and upsert the profiles whose embedding text changed.
+
+        The text includes the child's age, so a periodic sync of every profile
+        also refreshes embeddings that went stale as children got older. It
+        also loads every synced embedding into ``self.similarity`` and stores
+        any payload missing from the payload store. Only changed profiles are
+        encoded, in batches, and verification of the upserts runs in the
+        background; ``verification`` in the returned summary is a Future
+        resolving to True once every upserted profile is confirmed.
+        """
+        by_id = {self._vector_id(p["profile_id"]): p for p in profiles}
+        texts = {vector_id: self._create_profile_text(p) for vector_id, p in by_id.items()}
+        hashes = {vector_id: self._text_hash(text) for vector_id, text in texts.items()}
+        with span("profiles.fetch_hashes", profiles=len(by_id)):
+            stored = {} if force else self._fetch_vectors(list(by_id))
+        changed, unchanged = [], []
+        for vector_id, profile in by_id.items():
+            vector = stored.get(vector_id)
+            if vector is not None and (vector.metadata or {}).get("text_hash") == hashes[vector_id]:
+                self.similarity.upsert(profile, vector.values)
+                unchanged.append(profile)
             else:
-                logger.warning("Verification failed - profile not found after upsert")
-                return False
-                
+                changed.append(vector_id)
+        logger.info(f"{len(changed)} of {len(by_id)} profiles need re-embedding")
+
+        # A fresh payload store (new host, wiped disk) lacks rows for profiles
+        # whose vectors are current; restore them without re-embedding
+        if unchanged:
+            present = self.payloads.get_many([p["profile_id"] for p in unchanged])
+            missing = [p for p in unchanged if p["profile_id"] not in present]
+            if missing:
+                with span("profiles.store_payloads", profiles=len(missing)):
+                    self.payloads.put_many(missing)
+                self._invalidate([p["profile_id"] for p in missing])
+
+        expected = {}
+        for start in range(0, len(changed), batch_size):
+            vector_ids = changed[start:start + batch_size]
+            with span("profiles.encode", profiles=len(vector_ids)):
+                embeddings = self.model.encode([texts[vector_id] for vector_id in vector_ids], batch_size=batch_size)
+            with span("profiles.store_payloads", profiles=len(vector_ids)):
+                self.payloads.put_many([by_id[vector_id] for vector_id in vector_ids])
+            with span("profiles.upsert", profiles=len(vector_ids)):
+                self.index.upsert(
+                    vectors=[
+                        {
+                            "id": vector_id,
+                            "values": embedding.tolist(),
+                            "metadata": self._create_profile_metadata(by_id[vector_id], hashes[vector_id])
+                        }
+                        for vector_id, embedding in zip(vector_ids, embeddings)
+                    ],
+                    namespace=self.namespace
+                )
+            self._invalidate([by_id[vector_id]["profile_id"] for vector_id in vector_ids])
+            for vector_id, embedding in zip(vector_ids, embeddings):
+                self.similarity.upsert(by_id[vector_id], embedding)
+            expected.update({vector_id: hashes[vector_id] for vector_id in vector_ids})
+
+        if expected:
+            verification = self._verifier.submit(self._verify, expected)
+        else:
+            verification = Future()
+            verification.set_result(True)
+        return {
+            "total": len(by_id),
+            "upserted": len(expected),
+            "unchanged": len(by_id) - len(expected),
+            "verification": verification
+        }
+
+    def upsert_profile(self, profile_data: Dict, wait: bool = True):
+        """Update or insert a profile into the vector database if it changed.
+
+        Returns whether the index holds the profile afterwards (False if
+        verification failed). With ``wait=False`` it returns the verification
+        Future instead of blocking on it.
+        """
+        try:
+            logger.info(f"Syncing embedding for profile {profile_data['profile_id']}...")
+            result = self.sync_profiles([profile_data])
+            logger.info("Upsert completed successfully" if result["upserted"] else "Profile unchanged, upsert skipped")
+            return result["verification"].result() if wait else result["verification"]
         except Exception as e:
             logger.error(f"Error during upsert: {str(e)}")
             raise
 
-    def get_profile_context(self, profile_id: str, query: str = None, n_results: int = 1) -> Dict:
-        """Get the profile context, optionally with query-specific information"""
+    def get_profile_context(self, profile_id: str, query: str = None, n_results: int = 1) -> Optional[ProfilePayload]:
+        """Get the profile context, optionally with query-specific information.
+
+        Returns a read-only ProfilePayload, which may be shared with other
+        callers through the lookup cache; use its ``to_dict()`` for a mutable copy.
+        """
         try:
             if query:
                 # Search by query
                 logger.info(f"Searching for profile {profile_id} with query: {query}")
-                query_embedding = self.model.encode(query).tolist()
-                results = self.index.query(
-                    vector=query_embedding,
-                    filter={"type": "profile", "profile_id": profile_id},
-                    namespace=self.namespace,
-                    top_k=n_results,
-                    include_metadata=True
-                )
+                with span("profiles.encode_query"):
+                    query_embedding = self.model.encode(query).tolist()
+                with span("profiles.index_query", top_k=n_results):
+                    results = self.index.query(
+                        vector=query_embedding,
+                        filter={"type": "profile", "profile_id": profile_id},
+                        namespace=self.namespace,
+                        top_k=n_results,
+                        include_metadata=True
+                    )
             else:
-                # Get profile text and create embedding
-                logger.info(f"Searching for profile {profile_id}")
-                # Use a simple query to find the profile
-                dummy_query = f"Profile for {profile_id}"
-                query_embedding = self.model.encode(dummy_query).tolist()
-                results = self.index.query(
-                    vector=query_embedding,
-                    filter={"type": "profile", "profile_id": profile_id},
-                    namespace=self.namespace,
-                    top_k=1,
-                    include_metadata=True
-                )
+                # Plain lookup by ID: no embedding or vector search needed
+                logger.info(f"Fetching profile {profile_id}")
+                with span("profiles.fetch"):
+                    profile_data = self._fetch_profile(profile_id)
+                if profile_data is None:
+                    logger.warning(f"No results found for profile ID: {profile_id}")
+                return profile_data
 
             if results and results.matches:
                 logger.info(f"Found profile {profile_id}")
-                return json.loads(results.matches[0].metadata["full_data"])
+                return self._load_payload(profile_id, results.matches[0].metadata)
             else:
                 logger.warning(f"No results found for profile ID: {profile_id}")
                 return None
@@ -161,24 +305,59 @@ class ProfileEmbeddingHandler:
             logger.error(f"Error retrieving profile: {str(e)}")
             return None
 
-    def get_similar_profiles(self, query: str, n_results: int = 3) -> List[Dict]:
-        """Find similar profiles based on a query"""
+    def get_similar_profiles(
+        self,
+        query: str,
+        n_results: int = 3,
+        age_range: Tuple[int, int] = None,
+        focus_areas: Sequence[str] = None,
+        medical_considerations: Sequence[str] = None
+    ) -> List[Dict]:
+        """Find similar profiles based on a query, as plain dicts.
+
+        Served from the local similarity index once sync_all_profiles has
+        loaded every profile into it; until then a partial local index would
+        miss profiles, so the search goes to Pinecone, filtering by age there
+        and by focus areas and medical considerations on the fetched payloads.
+        """
         try:
             logger.info(f"Searching for profiles similar to query: {query}")
-            query_embedding = self.model.encode(query).tolist()
-            results = self.index.query(
-                vector=query_embedding,
-                filter={"type": "profile"},
-                namespace=self.namespace,
-                top_k=n_results,
-                include_metadata=True
-            )
+            with span("profiles.encode_query"):
+                query_embedding = self.model.encode(query)
+            if self.warmed:
+                with span("profiles.local_search", k=n_results):
+                    matches = self.similarity.search(
+                        query_embedding,
+                        k=n_results,
+                        age_range=age_range,
+                        focus_areas=focus_areas,
+                        medical_considerations=medical_considerations
+                    )
+                logger.info(f"Found {len(matches)} similar profiles locally")
+                return [copy.deepcopy(profile) for profile, _ in matches]
+
+            filter = {"type": "profile"}
+            if age_range is not None:
+                filter["age_months"] = {"$gte": age_range[0], "$lte": age_range[1]}
+            # Label filters run on the payloads, so fetch extra candidates for them
+            top_k = n_results * 5 if focus_areas or medical_considerations else n_results
+            with span("profiles.index_query", top_k=top_k):
+                results = self.index.query(
+                    vector=query_embedding.tolist(),
+                    filter=filter,
+                    namespace=self.namespace,
+                    top_k=top_k,
+                    include_metadata=True
+                )
             
             similar_profiles = []
             if results and results.matches:
                 for match in results.matches:
-                    profile_data = json.loads(match.metadata["full_data"])
-                    similar_profiles.append(profile_data)
+                    profile_data = self._load_payload(match.metadata["profile_id"], match.metadata)
+                    if profile_data is not None and _has_labels(profile_data, focus_areas, medical_considerations):
+                        similar_profiles.append(profile_data.to_dict())
+                    if len(similar_profiles) == n_results:
+                        break
                 logger.info(f"Found {len(similar_profiles)} similar profiles")
             else:
                 logger.info("No similar profiles found")
@@ -189,15 +368,85 @@ class ProfileEmbeddingHandler:
             logger.error(f"Error during similarity search: {str(e)}")
             return []
 
+    def get_profiles_like(self, profile_id: str, n_results: int = 3, age_window: int = 6,
+                          share_focus: bool = True) -> List[Dict]:
+        """Nearest synced profiles to this child within an age band ("children like mine"), without encoding anything"""
+        vector = self.similarity.vector(profile_id)
+        if vector is None:
+            return []
+        profile = self.similarity.profile(profile_id)
+        age_months = (datetime.now() - datetime.fromisoformat(profile["date_of_birth"])).days // 30
+        matches = self.similarity.search(
+            vector,
+            k=n_results,
+            age_range=(age_months - age_window, age_months + age_window),
+            focus_areas=profile.get("current_focus_areas") if share_focus else None,
+            exclude_ids=[profile_id]
+        )
+        return [copy.deepcopy(match) for match, _ in matches]
+
     def delete_profile(self, profile_id: str):
         """Delete a profile from the vector database"""
-        vector_id = f"profile_{profile_id}"
+        vector_id = self._vector_id(profile_id)
         try:
             self.index.delete(
                 ids=[vector_id],
                 namespace=self.namespace
             )
+            self.payloads.delete([profile_id])
+            self._invalidate([profile_id])
+            self.similarity.remove(profile_id)
             logger.info(f"Successfully deleted profile: {profile_id}")
         except Exception as e:
             logger.error(f"Error deleting profile: {str(e)}")
             raise
+
+
+def _has_labels(profile_data, focus_areas: Sequence[str] = None,
+                medical_considerations: Sequence[str] = None) -> bool:
+    """The label filters of ProfileSimilarityIndex.search, for a single profile"""
+    def labels(values):
+        return {value.strip().lower() for value in values or []}
+
+    if focus_areas and not labels(focus_areas) & labels(profile_data.get("current_focus_areas")):
+        return False
+    return labels(medical_considerations) <= labels(profile_data.get("medical_considerations"))
+
+
+def sync_all_profiles(user_manager=None, handler: ProfileEmbeddingHandler = None, force: bool = False,
+                      page_size: int = 500) -> Dict:
+    """Nightly refresh: one batched pass over every stored profile.
+
+    Also run periodically by long-lived processes to pick up profiles
+    created, edited or deleted elsewhere; deleted ones leave the local
+    similarity index.
+    """
+    from src.models.user_model import UserManager
+
+    user_manager = user_manager or UserManager()
+    handler = handler or ProfileEmbeddingHandler()
+    summary = {"total": 0, "upserted": 0, "unchanged": 0}
+    verifications = []
+    seen = set()
+    for offset in range(0, user_manager.count_profiles(), page_size):
+        page = [p.to_dict() for p in user_manager.list_profiles(offset=offset, limit=page_size)]
+        seen.update(p["profile_id"] for p in page)
+        result = handler.sync_profiles(page, force=force)
+        verifications.append(result.pop("verification"))
+        for key in summary:
+            summary[key] += result[key]
+    summary["verified"] = all(v.result() for v in verifications)
+    for profile_id in set(handler.similarity.profile_ids()) - seen:
+        handler.similarity.remove(profile_id)
+    # Every stored profile is now in the local similarity index
+    handler.warmed = True
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-embed changed profiles into the profiles namespace")
+    parser.add_argument("--force", action="store_true", help="Re-embed every profile")
+    args = parser.parse_args()
+    print(json.dumps(sync_all_profiles(force=args.force), indent=2))
@@ -0,0 +1,206 @@
+"""Compact binary encoding for full profile payloads.
+
+Layout (all integers big-endian):
+
+    magic "RSPP" | format version (u8) | codec (u8) | section count (u16)
+    per section: name length (u8) | name | flags (u8) | body length (u32) | body
+
+The ``core`` section holds the small scalar fields; each large field
+(milestones, progress history) gets its own section so it is only
+decompressed and decoded when read. Bodies are msgpack when it is installed,
+JSON otherwise, and zlib-compressed when that makes them smaller.
+"""
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Optional
+import json
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b"RSPP"
+FORMAT_VERSION = 1
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+LARGE_FIELDS = ("milestones", "progress_history")
+DEFAULT_PAYLOAD_PATH = "./profile_payloads.sqlite"
+
+_HEADER = struct.Struct(">4sBBH")
+_SECTION = struct.Struct(">BI")
+_COMPRESSED = 1
+# Smaller bodies rarely shrink under zlib
+_MIN_COMPRESS_BYTES = 64
+
+
+def _serialize(value, codec: int) -> bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _deserialize(body: bytes, codec: int):
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("This profile payload was written with msgpack, which is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def encode_profile(profile_data: Dict, codec: int = None) -> bytes:
+    """Encode a profile dict (as produced by ``ChildProfile.to_dict``)"""
+    if codec is None:
+        codec = CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+    sections = [("core", {k: v for k, v in profile_data.items() if k not in LARGE_FIELDS})]
+    sections += [(field, profile_data[field]) for field in LARGE_FIELDS if field in profile_data]
+
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, codec, len(sections))]
+    for name, value in sections:
+        body = _serialize(value, codec)
+        flags = 0
+        if len(body) >= _MIN_COMPRESS_BYTES:
+            compressed = zlib.compress(body, 6)
+            if len(compressed) < len(body):
+                body, flags = compressed, _COMPRESSED
+        encoded_name = name.encode("utf-8")
+        parts += [bytes([len(encoded_name)]), encoded_name, _SECTION.pack(flags, len(body)), body]
+    return b"".join(parts)
+
+
+def _freeze(value):
+    """Read-only copy of decoded JSON: dicts become mapping proxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ProfilePayload(Mapping):
+    """Read-only, lazily decoded view of an encoded profile.
+
+    Only the section holding a requested field is decoded. Decoded sections
+    are deeply read-only (nested lists come back as tuples), so a payload
+    can be cached and shared; use ``to_dict`` for a plain, mutable copy of
+    everything.
+    """
+
+    def __init__(self, blob: bytes):
+        magic, version, self.codec, count = _HEADER.unpack_from(blob, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a profile payload")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported profile payload version {version}")
+        self._sections = {}
+        offset = _HEADER.size
+        for _ in range(count):
+            name_length = blob[offset]
+            name = blob[offset + 1:offset + 1 + name_length].decode("utf-8")
+            offset += 1 + name_length
+            flags, length = _SECTION.unpack_from(blob, offset)
+            offset += _SECTION.size
+            self._sections[name] = (flags, blob[offset:offset + length])
+            offset += length
+        self._decoded = {}
+
+    def _decode(self, name: str):
+        flags, body = self._sections[name]
+        if flags & _COMPRESSED:
+            body = zlib.decompress(body)
+        return _deserialize(body, self.codec)
+
+    def _section(self, name: str):
+        if name not in self._decoded:
+            self._decoded[name] = _freeze(self._decode(name))
+        return self._decoded[name]
+
+    def __getitem__(self, key: str):
+        if key in LARGE_FIELDS and key in self._sections:
+            return self._section(key)
+        return self._section("core")[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._section("core")
+        yield from (name for name in LARGE_FIELDS if name in self._sections)
+
+    def __len__(self) -> int:
+        return len(self._section("core")) + sum(name in self._sections for name in LARGE_FIELDS)
+
+    def to_dict(self) -> Dict:
+        # Decoding afresh is cheaper than deep-copying the cached sections
+        data = self._decode("core")
+        data.update((name, self._decode(name)) for name in LARGE_FIELDS if name in self._sections)
+        return data
+
+
+def decode_profile(blob: bytes) -> ProfilePayload:
+    return ProfilePayload(blob)
+
+
+class ProfilePayloadStore:
+    """Encoded profile payloads keyed by profile ID, kept out of vector metadata"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("PROFILE_PAYLOAD_PATH", DEFAULT_PAYLOAD_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS payloads (profile_id TEXT PRIMARY KEY, payload BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put_many(self, profiles: Iterable[Dict]):
+        rows = [(p["profile_id"], encode_profile(p)) for p in profiles]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO payloads (profile_id, payload) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get(self, profile_id: str) -> Optional[ProfilePayload]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM payloads WHERE profile_id = ?", (profile_id,)
+            ).fetchone()
+        return decode_profile(row[0]) if row else None
+
+    def get_many(self, profile_ids: List[str]) -> Dict[str, ProfilePayload]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(profile_ids), 500):
+                batch = profile_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT profile_id, payload FROM payloads WHERE profile_id IN ({placeholders})", batch
+                ).fetchall()
+                found.update((profile_id, decode_profile(blob)) for profile_id, blob in rows)
+        return found
+
+    def delete(self, profile_ids: List[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM payloads WHERE profile_id = ?", [(i,) for i in profile_ids])
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_payload_store() -> ProfilePayloadStore:
+    """Return the process-wide profile payload store"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ProfilePayloadStore()
+        return _default_store
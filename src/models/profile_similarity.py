@@ -0,0 +1,181 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+import threading
+import numpy as np
+
+from src.utils.embedding_compression import EmbeddingCompressor
+
+
+def _normalize_label(label: str) -> str:
+    return label.strip().lower()
+
+
+class _LabelColumns:
+    """Boolean columns, one per distinct label, grown as new labels appear"""
+
+    def __init__(self, capacity: int):
+        self.vocabulary: Dict[str, int] = {}
+        self.matrix = np.zeros((capacity, 8), dtype=bool)
+
+    def resize(self, capacity: int):
+        grown = np.zeros((capacity, self.matrix.shape[1]), dtype=bool)
+        grown[:len(self.matrix)] = self.matrix
+        self.matrix = grown
+
+    def set_row(self, row: int, labels: Sequence[str]):
+        self.matrix[row] = False
+        for label in labels:
+            label = _normalize_label(label)
+            if label not in self.vocabulary:
+                if len(self.vocabulary) == self.matrix.shape[1]:
+                    grown = np.zeros((len(self.matrix), self.matrix.shape[1] * 2), dtype=bool)
+                    grown[:, :self.matrix.shape[1]] = self.matrix
+                    self.matrix = grown
+                self.vocabulary[label] = len(self.vocabulary)
+            self.matrix[row, self.vocabulary[label]] = True
+
+    def columns(self, labels: Sequence[str]) -> List[int]:
+        return [self.vocabulary[l] for l in map(_normalize_label, labels) if l in self.vocabulary]
+
+
+class ProfileSimilarityIndex:
+    """In-process similar-profile search over a NumPy embedding matrix.
+
+    Each profile occupies one row of a normalised embedding matrix, alongside
+    columnar arrays for date of birth, focus areas and medical considerations,
+    so a filtered top-k is a couple of vectorised operations. Rows are updated
+    in place as profiles change and freed rows are reused.
+
+    Rows are stored through ``compressor`` (float16 by default, half the
+    memory of float32); int8 or PCA compressors must be fitted beforehand.
+    """
+
+    def __init__(self, dimension: int = None, capacity: int = 64, compressor: EmbeddingCompressor = None):
+        self.compressor = compressor or EmbeddingCompressor("float16")
+        if self.compressor.needs_fit and self.compressor.scale is None:
+            raise ValueError("The similarity index needs a fitted compressor for int8 or PCA storage")
+        self.dimension = self.compressor.dimension or dimension
+        self._capacity = capacity
+        self._vectors = None
+        self._birth_days = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._focus = _LabelColumns(capacity)
+        self._medical = _LabelColumns(capacity)
+        self._profiles: List[Optional[Dict]] = [None] * capacity
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, profile_id: str) -> bool:
+        return profile_id in self._rows
+
+    def profile_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rows)
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        vectors = np.zeros((capacity, self.dimension), dtype=self._vectors.dtype)
+        vectors[:self._capacity] = self._vectors
+        self._vectors = vectors
+        self._birth_days = np.concatenate([self._birth_days, np.zeros(self._capacity, dtype=np.int64)])
+        self._active = np.concatenate([self._active, np.zeros(self._capacity, dtype=bool)])
+        self._focus.resize(capacity)
+        self._medical.resize(capacity)
+        self._profiles.extend([None] * self._capacity)
+        self._capacity = capacity
+
+    def upsert(self, profile_data: Dict, embedding):
+        """Add or replace one profile's row"""
+        code = self.compressor.encode(np.asarray(embedding, dtype=np.float32)[None])[0]
+        with self._lock:
+            if self._vectors is None:
+                self.dimension = self.dimension or len(code)
+                self._vectors = np.zeros((self._capacity, self.dimension), dtype=code.dtype)
+
+            profile_id = profile_data["profile_id"]
+            row = self._rows.get(profile_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    if self._size == self._capacity:
+                        self._grow()
+                    row = self._size
+                    self._size += 1
+                self._rows[profile_id] = row
+
+            self._vectors[row] = code
+            self._birth_days[row] = datetime.fromisoformat(profile_data["date_of_birth"]).toordinal()
+            self._focus.set_row(row, profile_data.get("current_focus_areas", []))
+            self._medical.set_row(row, profile_data.get("medical_considerations", []))
+            self._profiles[row] = profile_data
+            self._active[row] = True
+
+    def remove(self, profile_id: str):
+        with self._lock:
+            row = self._rows.pop(profile_id, None)
+            if row is not None:
+                self._active[row] = False
+                self._profiles[row] = None
+                self._free.append(row)
+
+    def vector(self, profile_id: str) -> Optional[np.ndarray]:
+        """The stored (normalised, decompressed) embedding of a profile"""
+        with self._lock:
+            row = self._rows.get(profile_id)
+            return None if row is None else self.compressor.reconstruct(self._vectors[row])
+
+    def profile(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._rows.get(profile_id)
+            return None if row is None else self._profiles[row]
+
+    def search(
+        self,
+        query_vector,
+        k: int = 3,
+        age_range: Tuple[int, int] = None,
+        focus_areas: Sequence[str] = None,
+        medical_considerations: Sequence[str] = None,
+        exclude_ids: Sequence[str] = ()
+    ) -> List[Tuple[Dict, float]]:
+        """Top-k profiles by cosine similarity, restricted by the given filters.
+
+        ``age_range`` is an inclusive (min, max) in months; ``focus_areas``
+        keeps profiles sharing at least one of them; ``medical_considerations``
+        keeps profiles that have all of them.
+        """
+        with self._lock:
+            if not self._rows:
+                return []
+            n = self._size
+            mask = self._active[:n].copy()
+
+            if age_range is not None:
+                age_months = (date.today().toordinal() - self._birth_days[:n]) // 30
+                mask &= (age_months >= age_range[0]) & (age_months <= age_range[1])
+            if focus_areas:
+                columns = self._focus.columns(focus_areas)
+                mask &= self._focus.matrix[:n, columns].any(axis=1) if columns else False
+            if medical_considerations:
+                columns = self._medical.columns(medical_considerations)
+                if len(columns) < len(set(map(_normalize_label, medical_considerations))):
+                    return []
+                mask &= self._medical.matrix[:n, columns].all(axis=1)
+            for profile_id in exclude_ids:
+                if profile_id in self._rows:
+                    mask[self._rows[profile_id]] = False
+
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            scores = self.compressor.scores(self._vectors[candidates], query_vector)
+            k = min(k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._profiles[candidates[i]], float(scores[i])) for i in top]
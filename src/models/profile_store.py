@@ -0,0 +1,414 @@
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+
+COMPACT_EVERY = int(os.getenv("PROFILE_JOURNAL_COMPACT_EVERY", 100))
+
+
+def milestone_completed_event(milestone: Dict, at: str = None) -> Dict:
+    return {"type": "milestone_completed", "at": at or datetime.now().isoformat(), "milestone": milestone}
+
+
+def note_added_event(note: str, milestone: str = None, at: str = None) -> Dict:
+    return {"type": "note_added", "at": at or datetime.now().isoformat(), "note": note, "milestone": milestone}
+
+
+def progress_entry(event: Dict) -> Dict:
+    """The ``progress_history`` entry an event contributes"""
+    if event["type"] == "milestone_completed":
+        milestone = event["milestone"]
+        return {"date": event["at"], "milestone": milestone["name"], "category": milestone["category"]}
+    return {"date": event["at"], "milestone": event.get("milestone") or "Note", "note": event["note"]}
+
+
+def apply_event(data: Dict, event: Dict):
+    """Fold one journal event into a stored profile dict"""
+    if event["type"] == "milestone_completed":
+        data.setdefault("milestones", {})[event["milestone"]["name"]] = event["milestone"]
+    data.setdefault("progress_history", []).append(progress_entry(event))
+
+
+def _tail_lines(path: str, block_size: int = 8192):
+    """Yield the lines of a file from last to first without reading it all"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + remainder).split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8")
+        if remainder.strip():
+            yield remainder.decode("utf-8")
+
+
+class JSONProfileStore:
+    """One JSON snapshot per profile, as stored in ``user_data/`` originally.
+
+    Changes are appended as events to ``<profile_id>.journal.jsonl`` and folded
+    into the snapshot every ``COMPACT_EVERY`` events by writing a new file and
+    renaming it over the old one. Events carry a sequence number and the
+    snapshot records the last one it includes, so a crash between the rename
+    and truncating the journal never applies an event twice.
+
+    Lookups by ID read a single profile; anything by name or listing has to
+    parse every file, which is why this backend is kept only for compatibility.
+    """
+
+    def __init__(self, data_dir: str = "user_data", compact_every: int = COMPACT_EVERY):
+        self.data_dir = data_dir
+        self.compact_every = compact_every
+        os.makedirs(data_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_seq: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.data_dir, f"{profile_id}.json")
+
+    def _journal_path(self, profile_id: str) -> str:
+        return os.path.join(self.data_dir, f"{profile_id}.journal.jsonl")
+
+    def _read_snapshot(self, profile_id: str) -> Optional[Dict]:
+        path = self._path(profile_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _read_journal(self, profile_id: str) -> List[Dict]:
+        path = self._journal_path(profile_id)
+        if not os.path.exists(path):
+            return []
+        events = []
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line torn by a crash mid-append
+                    continue
+        return events
+
+    def _read(self, profile_id: str) -> Optional[Dict]:
+        data = self._read_snapshot(profile_id)
+        if data is None:
+            return None
+        for event in self._read_journal(profile_id):
+            if event["seq"] > data.get("journal_seq", 0):
+                apply_event(data, event)
+                data["journal_seq"] = event["seq"]
+        return data
+
+    def _write_snapshot(self, data: Dict):
+        path = self._path(data["profile_id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _read_all(self) -> List[Dict]:
+        return [
+            self._read(filename[:-len(".json")])
+            for filename in sorted(os.listdir(self.data_dir))
+            if filename.endswith(".json")
+        ]
+
+    def get_profile_record(self, profile_id: str) -> Optional[Dict]:
+        return self._read(profile_id)
+
+    def find_profile_id_by_name(self, name: str) -> Optional[str]:
+        for record in self._read_all():
+            if record["name"] == name:
+                return record["profile_id"]
+        return None
+
+    def list_profile_records(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        records = self._read_all()
+        return records[offset:None if limit is None else offset + limit]
+
+    def count_profiles(self) -> int:
+        return sum(1 for f in os.listdir(self.data_dir) if f.endswith(".json"))
+
+    def load_milestones(self, profile_id: str) -> List[Dict]:
+        record = self._read(profile_id) or {}
+        return list(record.get("milestones", {}).values())
+
+    def load_progress(self, profile_id: str) -> List[Dict]:
+        record = self._read(profile_id) or {}
+        return record.get("progress_history", [])
+
+    def iter_milestones(self) -> Iterator[Tuple[str, Dict]]:
+        """Every stored milestone as (profile_id, milestone)"""
+        for record in self._read_all():
+            for milestone in record.get("milestones", {}).values():
+                yield record["profile_id"], milestone
+
+    def last_progress(self, profile_id: str, n: int) -> List[Dict]:
+        """The last ``n`` progress entries, read from the end of the journal when it has enough"""
+        entries = []
+        journal_path = self._journal_path(profile_id)
+        if n > 0 and os.path.exists(journal_path):
+            for line in _tail_lines(journal_path):
+                try:
+                    entries.append(progress_entry(json.loads(line)))
+                except json.JSONDecodeError:
+                    continue
+                if len(entries) == n:
+                    return entries[::-1]
+        record = self._read(profile_id) or {}
+        return record.get("progress_history", [])[-n:] if n > 0 else []
+
+    def append_event(self, profile_id: str, event: Dict):
+        """Append an event to the profile's journal, compacting it when it grows long"""
+        with self._lock:
+            if profile_id not in self._last_seq:
+                data = self._read(profile_id)
+                if data is None:
+                    raise KeyError(f"Unknown profile: {profile_id}")
+                self._last_seq[profile_id] = data.get("journal_seq", 0)
+                self._pending[profile_id] = len(self._read_journal(profile_id))
+            self._last_seq[profile_id] += 1
+            line = json.dumps(dict(event, seq=self._last_seq[profile_id])) + "\n"
+            with open(self._journal_path(profile_id), "a+b") as f:
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending[profile_id] += 1
+            if self._pending[profile_id] >= self.compact_every:
+                self._compact(profile_id)
+
+    def _compact(self, profile_id: str):
+        self._write_snapshot(self._read(profile_id))
+        os.remove(self._journal_path(profile_id))
+        self._pending[profile_id] = 0
+
+    def compact(self, profile_id: str):
+        """Fold the journal into the snapshot now"""
+        with self._lock:
+            if os.path.exists(self._journal_path(profile_id)):
+                self._compact(profile_id)
+
+    def save_profile(self, data: Dict):
+        profile_id = data["profile_id"]
+        with self._lock:
+            snapshot = self._read_snapshot(profile_id) or {}
+            journal = self._read_journal(profile_id)
+            last_seq = max([snapshot.get("journal_seq", 0)] + [event["seq"] for event in journal])
+            self._write_snapshot(dict(data, journal_seq=last_seq))
+            if journal:
+                os.remove(self._journal_path(profile_id))
+            self._last_seq[profile_id] = last_seq
+            self._pending[profile_id] = 0
+
+    def delete_profile(self, profile_id: str):
+        with self._lock:
+            for path in (self._path(profile_id), self._journal_path(profile_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._last_seq.pop(profile_id, None)
+            self._pending.pop(profile_id, None)
+
+
+class SQLiteProfileStore:
+    """Profiles in SQLite with indexed lookups by ID and name.
+
+    Profile rows hold only the small scalar fields; milestones and progress
+    history live in their own tables and are read only when a profile's
+    ``milestones`` or ``progress_history`` is first touched.
+    """
+
+    def __init__(self, db_path: str = "user_data/profiles.db"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS profiles (
+                profile_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                date_of_birth TEXT NOT NULL,
+                medical_considerations TEXT NOT NULL,
+                current_focus_areas TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS profiles_name ON profiles (name);
+            CREATE TABLE IF NOT EXISTS milestones (
+                profile_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (profile_id, name)
+            );
+            CREATE TABLE IF NOT EXISTS progress (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                profile_id TEXT NOT NULL,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS progress_profile ON progress (profile_id, seq);
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _record(row) -> Dict:
+        return {
+            "profile_id": row["profile_id"],
+            "name": row["name"],
+            "date_of_birth": row["date_of_birth"],
+            "medical_considerations": json.loads(row["medical_considerations"]),
+            "current_focus_areas": json.loads(row["current_focus_areas"]),
+        }
+
+    def get_profile_record(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM profiles WHERE profile_id = ?", (profile_id,)
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def find_profile_id_by_name(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT profile_id FROM profiles WHERE name = ? ORDER BY profile_id LIMIT 1", (name,)
+            ).fetchone()
+        return row["profile_id"] if row else None
+
+    def list_profile_records(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM profiles ORDER BY name, profile_id LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def count_profiles(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def load_milestones(self, profile_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM milestones WHERE profile_id = ? ORDER BY rowid", (profile_id,)
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def load_progress(self, profile_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry FROM progress WHERE profile_id = ? ORDER BY seq", (profile_id,)
+            ).fetchall()
+        return [json.loads(row["entry"]) for row in rows]
+
+    def iter_milestones(self) -> Iterator[Tuple[str, Dict]]:
+        """Every stored milestone as (profile_id, milestone), in one table scan"""
+        with self._lock:
+            rows = self._conn.execute("SELECT profile_id, data FROM milestones ORDER BY rowid").fetchall()
+        for row in rows:
+            yield row["profile_id"], json.loads(row["data"])
+
+    def last_progress(self, profile_id: str, n: int) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry FROM progress WHERE profile_id = ? ORDER BY seq DESC LIMIT ?", (profile_id, n)
+            ).fetchall()
+        return [json.loads(row["entry"]) for row in reversed(rows)]
+
+    def append_event(self, profile_id: str, event: Dict):
+        """Record an event as single-row writes; the tables themselves are the journal"""
+        with self._lock, self._conn:
+            if event["type"] == "milestone_completed":
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO milestones (profile_id, name, data) VALUES (?, ?, ?)",
+                    (profile_id, event["milestone"]["name"], json.dumps(event["milestone"]))
+                )
+            self._conn.execute(
+                "INSERT INTO progress (profile_id, entry) VALUES (?, ?)",
+                (profile_id, json.dumps(progress_entry(event)))
+            )
+
+    def save_profile(self, data: Dict):
+        """Replace a profile and its milestones and progress in one transaction"""
+        profile_id = data["profile_id"]
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO profiles
+                   (profile_id, name, date_of_birth, medical_considerations, current_focus_areas, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (
+                    profile_id,
+                    data["name"],
+                    data["date_of_birth"],
+                    json.dumps(data.get("medical_considerations", [])),
+                    json.dumps(data.get("current_focus_areas", [])),
+                    datetime.now().isoformat(),
+                )
+            )
+            self._conn.execute("DELETE FROM milestones WHERE profile_id = ?", (profile_id,))
+            self._conn.executemany(
+                "INSERT INTO milestones (profile_id, name, data) VALUES (?, ?, ?)",
+                [(profile_id, m["name"], json.dumps(m)) for m in data.get("milestones", {}).values()]
+            )
+            self._conn.execute("DELETE FROM progress WHERE profile_id = ?", (profile_id,))
+            self._conn.executemany(
+                "INSERT INTO progress (profile_id, entry) VALUES (?, ?)",
+                [(profile_id, json.dumps(entry)) for entry in data.get("progress_history", [])]
+            )
+
+    def delete_profile(self, profile_id: str):
+        with self._lock, self._conn:
+            for table in ("profiles", "milestones", "progress"):
+                self._conn.execute(f"DELETE FROM {table} WHERE profile_id = ?", (profile_id,))
+
+    def migrate_from_json(self, data_dir: str) -> int:
+        """Import every ``<data_dir>/*.json`` profile; returns the number imported"""
+        source = JSONProfileStore(data_dir)
+        records = source.list_profile_records()
+        for record in records:
+            self.save_profile(record)
+        return len(records)
+
+
+def open_profile_store(data_dir: str = "user_data"):
+    """Open the backend chosen by PROFILE_STORE (``sqlite`` by default, or ``json``).
+
+    The first time the SQLite store is opened over a directory of JSON
+    profiles, they are migrated in one shot.
+    """
+    backend = os.getenv("PROFILE_STORE", "sqlite").lower()
+    if backend == "json":
+        return JSONProfileStore(data_dir)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown PROFILE_STORE: {backend}")
+
+    store = SQLiteProfileStore(os.path.join(data_dir, "profiles.db"))
+    if store.count_profiles() == 0 and os.path.isdir(data_dir):
+        store.migrate_from_json(data_dir)
+    return store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate JSON profiles into the SQLite profile store")
+    parser.add_argument("--data-dir", default="user_data")
+    args = parser.parse_args()
+
+    store = SQLiteProfileStore(os.path.join(args.data_dir, "profiles.db"))
+    print(f"Migrated {store.migrate_from_json(args.data_dir)} profiles into {store.db_path}")
@@ -1,8 +1,14 @@
 from datetime import datetime
-from typing import List, Dict, Optional
-import json
+from typing import Callable, List, Dict, Optional
 import os
 
+from src.models.profile_store import (
+    milestone_completed_event,
+    note_added_event,
+    open_profile_store,
+    progress_entry,
+)
+
 class DevelopmentalMilestone:
     def __init__(self, name: str, category: str, age_range: str, description: str, completed: bool = False):
         self.name = name
@@ -29,6 +35,20 @@ class DevelopmentalMilestone:
             "notes": self.notes
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DevelopmentalMilestone":
+        milestone = cls(
+            name=data["name"],
+            category=data["category"],
+            age_range=data.get("age_range", ""),
+            description=data.get("description", ""),
+            completed=data.get("completed", False)
+        )
+        if data.get("completed_date"):
+            milestone.completed_date = datetime.fromisoformat(data["completed_date"])
+        milestone.notes = data.get("notes", "")
+        return milestone
+
 class ChildProfile:
     def __init__(
         self,
@@ -43,8 +63,53 @@ class ChildProfile:
         self.date_of_birth = date_of_birth
         self.medical_considerations = medical_considerations or []
         self.current_focus_areas = current_focus_areas or []
-        self.milestones: Dict[str, DevelopmentalMilestone] = {}
-        self.progress_history: List[Dict] = []
+        self._milestones: Optional[Dict[str, DevelopmentalMilestone]] = {}
+        self._progress_history: Optional[List[Dict]] = []
+        self._milestone_loader: Optional[Callable[[], List[Dict]]] = None
+        self._progress_loader: Optional[Callable[[], List[Dict]]] = None
+        self._recent_progress_loader: Optional[Callable[[int], List[Dict]]] = None
+
+    def set_lazy_loaders(
+        self,
+        milestones: Callable[[], List[Dict]],
+        progress: Callable[[], List[Dict]],
+        recent_progress: Callable[[int], List[Dict]] = None
+    ):
+        """Defer loading milestones and progress history until first accessed"""
+        self._milestone_loader, self._milestones = milestones, None
+        self._progress_loader, self._progress_history = progress, None
+        self._recent_progress_loader = recent_progress
+
+    @property
+    def milestones(self) -> Dict[str, DevelopmentalMilestone]:
+        if self._milestones is None:
+            self._milestones = {}
+            for data in self._milestone_loader():
+                milestone = DevelopmentalMilestone.from_dict(data)
+                self._milestones[milestone.name] = milestone
+        return self._milestones
+
+    @milestones.setter
+    def milestones(self, value: Dict[str, DevelopmentalMilestone]):
+        self._milestones = value
+
+    @property
+    def progress_history(self) -> List[Dict]:
+        if self._progress_history is None:
+            self._progress_history = self._progress_loader()
+        return self._progress_history
+
+    @progress_history.setter
+    def progress_history(self, value: List[Dict]):
+        self._progress_history = value
+
+    def last_entries(self, n: int) -> List[Dict]:
+        """The last ``n`` progress entries, without loading the full history when it isn't already"""
+        if n <= 0:
+            return []
+        if self._progress_history is None and self._recent_progress_loader is not None:
+            return self._recent_progress_loader(n)
+        return self.progress_history[-n:]
 
     @property
     def age_months(self) -> int:
@@ -80,64 +145,101 @@ class ChildProfile:
         }
 
 class UserManager:
-    def __init__(self, data_dir: str = "user_data"):
+    """Profile access on top of a profile store (SQLite by default, see ``profile_store``).
+
+    Nothing is read at construction; profiles are fetched by ID or name on
+    demand and their milestones and progress history load on first access.
+    """
+
+    def __init__(self, data_dir: str = "user_data", store=None):
         self.data_dir = data_dir
         os.makedirs(data_dir, exist_ok=True)
-        self.profiles: Dict[str, ChildProfile] = self._load_profiles()
-    
-    def list_profiles(self) -> List[ChildProfile]:
-        """Return a list of all profiles"""
-        return list(self.profiles.values())
-
-    def _load_profiles(self):
-        """Load all profiles from disk"""
-        profiles = {}
-        if os.path.exists(self.data_dir):
-            for filename in os.listdir(self.data_dir):
-                if filename.endswith(".json"):
-                    with open(os.path.join(self.data_dir, filename), 'r') as f:
-                        data = json.load(f)
-                        profile = self._dict_to_profile(data)
-                        profiles[profile.profile_id] = profile
-        return profiles
-
-    def _dict_to_profile(self, data: Dict):
-        """Convert dictionary to ChildProfile object"""
+        self.store = store or open_profile_store(data_dir)
+        # Profiles already handed out, so edits made through them are kept
+        self.profiles: Dict[str, ChildProfile] = {}
+        self._listeners: List[Callable[[str, Dict], None]] = []
+
+    def add_listener(self, callback: Callable[[str, Dict], None]):
+        """Call ``callback(profile_id, event)`` after every journal event or profile save"""
+        self._listeners.append(callback)
+
+    def _notify(self, profile_id: str, event: Dict):
+        for callback in self._listeners:
+            callback(profile_id, event)
+
+    def _record_to_profile(self, record: Dict) -> ChildProfile:
+        profile_id = record["profile_id"]
+        if profile_id in self.profiles:
+            return self.profiles[profile_id]
         profile = ChildProfile(
-            name=data["name"],
-            date_of_birth=data["date_of_birth"],
-            profile_id=data["profile_id"],
-            medical_considerations=data["medical_considerations"],
-            current_focus_areas=data["current_focus_areas"]
+            name=record["name"],
+            date_of_birth=record["date_of_birth"],
+            profile_id=profile_id,
+            medical_considerations=record.get("medical_considerations"),
+            current_focus_areas=record.get("current_focus_areas")
         )
-        profile.progress_history = data.get("progress_history", [])
-        
-        # Load milestones
-        for milestone_data in data.get("milestones", {}).values():
-            profile.add_milestone(
-                name=milestone_data["name"],
-                category=milestone_data["category"],
-                completed_date=milestone_data.get("completed_date")
-            )
+        profile.set_lazy_loaders(
+            milestones=lambda: self.store.load_milestones(profile_id),
+            progress=lambda: self.store.load_progress(profile_id),
+            recent_progress=lambda n: self.store.last_progress(profile_id, n)
+        )
+        self.profiles[profile_id] = profile
         return profile
 
+    def list_profiles(self, offset: int = 0, limit: Optional[int] = None) -> List[ChildProfile]:
+        """Return profiles ordered by name, optionally one page at a time"""
+        return [self._record_to_profile(r) for r in self.store.list_profile_records(offset, limit)]
+
+    def count_profiles(self) -> int:
+        return self.store.count_profiles()
+
     def save_profile(self, profile: ChildProfile):
-        """Save a profile to disk"""
-        filename = f"{profile.profile_id}.json"
-        filepath = os.path.join(self.data_dir, filename)
-        with open(filepath, 'w') as f:
-            json.dump(profile.to_dict(), f, indent=2)
+        """Save a profile to the store"""
+        data = profile.to_dict()
+        self.store.save_profile(data)
         self.profiles[profile.profile_id] = profile
+        self._notify(profile.profile_id, {"type": "profile_saved", "profile": data})
 
     def get_profile(self, profile_id: str) -> Optional[ChildProfile]:
         """Get a profile by ID"""
-        return self.profiles.get(profile_id)
+        if profile_id in self.profiles:
+            return self.profiles[profile_id]
+        record = self.store.get_profile_record(profile_id)
+        return self._record_to_profile(record) if record else None
+
+    def get_profile_by_name(self, name: str) -> Optional[ChildProfile]:
+        """Get a profile by name using the store's name index"""
+        profile_id = self.store.find_profile_id_by_name(name)
+        return self.get_profile(profile_id) if profile_id else None
 
     def add_profile(self, profile: ChildProfile):
         """Add a new profile"""
         self.save_profile(profile)
 
+    def _append_event(self, profile: ChildProfile, event: Dict):
+        self.store.append_event(profile.profile_id, event)
+        if profile._progress_history is not None:
+            profile._progress_history.append(progress_entry(event))
+        self._notify(profile.profile_id, event)
+
+    def record_milestone(self, profile: ChildProfile, name: str, category: str,
+                         completed_date: str = None) -> bool:
+        """Mark a milestone completed and append it to the profile's journal.
+
+        Returns False if it was already completed.
+        """
+        if name in profile.milestones:
+            return False
+        profile.add_milestone(name=name, category=category, completed_date=completed_date)
+        milestone = profile.milestones[name].to_dict()
+        self._append_event(profile, milestone_completed_event(milestone, at=milestone["completed_date"]))
+        return True
+
+    def add_progress_note(self, profile: ChildProfile, note: str, milestone: str = None):
+        """Append a free-text progress note to the profile's journal"""
+        self._append_event(profile, note_added_event(note, milestone=milestone))
+
     def update_profile(self, profile: ChildProfile):
         """Update an existing profile"""
-        if profile.profile_id in self.profiles:
+        if self.get_profile(profile.profile_id) is not None:
             self.save_profile(profile)
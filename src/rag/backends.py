@@ -0,0 +1,199 @@
+"""Factories for the remote services and models the query paths depend on.
+
+RAGSTEPS_BACKEND selects what they return:
+  live    - Pinecone, OpenAI and the real encoders (default)
+  fake    - in-process fakes with real cosine search and simulated LLM latency
+  record  - live services, with every response saved to RAGSTEPS_RECORDINGS
+  replay  - recorded responses only; no Pinecone or OpenAI account needed
+"""
+import os
+from functools import lru_cache
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+from src.rag.fakes import FakeChatClient, FakeEncoder, FakeVectorIndex, LatencyModel
+from src.rag.record_replay import (
+    RecordingChatClient,
+    RecordingIndex,
+    RecordingStore,
+    ReplayChatClient,
+    ReplayIndex,
+)
+from src.utils.tracing import span
+
+# Load environment variables
+load_dotenv()
+
+QUESTION_ENCODER_NAME = "facebook/dpr-question_encoder-single-nq-base"
+CONTEXT_ENCODER_NAME = "facebook/dpr-ctx_encoder-single-nq-base"
+
+
+def get_backend() -> str:
+    backend = os.getenv("RAGSTEPS_BACKEND", "live").lower()
+    if backend not in ("live", "fake", "record", "replay"):
+        raise ValueError(f"Unknown RAGSTEPS_BACKEND: {backend}")
+    return backend
+
+
+@lru_cache(maxsize=1)
+def get_recording_store() -> RecordingStore:
+    return RecordingStore()
+
+
+def _latency(name: str) -> LatencyModel:
+    return LatencyModel(os.getenv(name, "none"))
+
+
+@lru_cache(maxsize=None)
+def get_vector_index(name: str = None):
+    """Return the vector index client for the configured backend"""
+    backend = get_backend()
+    name = name or os.getenv("PINECONE_INDEX_NAME")
+    if backend == "fake":
+        path = os.getenv("RAGSTEPS_FAKE_INDEX")
+        latency = _latency("RAGSTEPS_FAKE_INDEX_LATENCY")
+        if path and os.path.exists(path):
+            return FakeVectorIndex.load(path, latency=latency)
+        return FakeVectorIndex(latency=latency)
+    if backend == "replay":
+        return ReplayIndex(get_recording_store(), latency=_latency("RAGSTEPS_FAKE_INDEX_LATENCY"))
+
+    from pinecone import Pinecone
+
+    index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(name)
+    if backend == "record":
+        return RecordingIndex(index, get_recording_store())
+    return index
+
+
+@lru_cache(maxsize=1)
+def get_chat_client():
+    """Return an OpenAI-compatible chat client for the configured backend"""
+    backend = get_backend()
+    if backend == "fake":
+        return FakeChatClient(
+            ttft=_latency("RAGSTEPS_FAKE_LLM_TTFT"),
+            token_latency=_latency("RAGSTEPS_FAKE_LLM_TOKEN_LATENCY")
+        )
+    if backend == "replay":
+        return ReplayChatClient(
+            get_recording_store(),
+            ttft=_latency("RAGSTEPS_FAKE_LLM_TTFT"),
+            token_latency=_latency("RAGSTEPS_FAKE_LLM_TOKEN_LATENCY")
+        )
+
+    from openai import OpenAI
+
+    # Retries are left to the shared LLM controller
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    if backend == "record":
+        return RecordingChatClient(client, get_recording_store())
+    return client
+
+
+@lru_cache(maxsize=1)
+def get_question_encoder():
+    """Return a callable mapping a question to its DPR embedding"""
+    if get_backend() == "fake":
+        return FakeEncoder(768, latency=_latency("RAGSTEPS_FAKE_ENCODER_LATENCY"))
+
+    import torch
+    from transformers import DPRQuestionEncoder, DPRQuestionEncoderTokenizer
+
+    with span("model_load.question_encoder", model=QUESTION_ENCODER_NAME):
+        question_encoder = DPRQuestionEncoder.from_pretrained(QUESTION_ENCODER_NAME)
+        question_tokenizer = DPRQuestionEncoderTokenizer.from_pretrained(QUESTION_ENCODER_NAME)
+
+    def encode(question):
+        with span("tokenize"):
+            question_inputs = question_tokenizer(
+                question, max_length=512, truncation=True, return_tensors="pt"
+            )
+        with span("encoder_forward"), torch.no_grad():
+            question_embedding = question_encoder(**question_inputs).pooler_output
+        return question_embedding[0].numpy()
+
+    return encode
+
+
+@lru_cache(maxsize=1)
+def get_context_encoder():
+    """Return a callable mapping a list of passages to their DPR context embeddings"""
+    if get_backend() == "fake":
+        return FakeEncoder(768, latency=_latency("RAGSTEPS_FAKE_ENCODER_LATENCY")).encode
+
+    import torch
+    from transformers import DPRContextEncoder, DPRContextEncoderTokenizer
+
+    with span("model_load.context_encoder", model=CONTEXT_ENCODER_NAME):
+        context_encoder = DPRContextEncoder.from_pretrained(CONTEXT_ENCODER_NAME)
+        context_tokenizer = DPRContextEncoderTokenizer.from_pretrained(CONTEXT_ENCODER_NAME)
+
+    def encode(passages):
+        with span("tokenize_passages", passages=len(passages)):
+            context_inputs = context_tokenizer(
+                passages, max_length=512, padding=True, truncation=True, return_tensors="pt"
+            )
+        with span("encode_passages", passages=len(passages)), torch.no_grad():
+            return context_encoder(**context_inputs).pooler_output.numpy()
+
+    return encode
+
+
+@lru_cache(maxsize=None)
+def get_sentence_encoder(model_name: str = "bert-base-nli-mean-tokens"):
+    """Return a SentenceTransformer, or a fake with the same encode interface"""
+    if get_backend() == "fake":
+        return FakeEncoder(768, latency=_latency("RAGSTEPS_FAKE_ENCODER_LATENCY"))
+
+    from sentence_transformers import SentenceTransformer
+
+    with span("model_load.sentence_encoder", model=model_name):
+        return SentenceTransformer(model_name)
+
+
+class ChatClientModel:
+    """Minimal ``invoke(prompt)`` chat model over the backend's chat client.
+
+    Lets the LangChain-style query path run against live, fake, recorded or
+    replayed completions alike.
+    """
+
+    def __init__(self, client=None, model: str = "gpt-3.5-turbo", temperature: float = 0, max_tokens: int = 500):
+        self.client = client or get_chat_client()
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def invoke(self, prompt: str):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+        return SimpleNamespace(content=response.choices[0].message.content)
+
+
+def preload_models():
+    """Load the model weights the query paths use, without opening any connections.
+
+    Safe to call in a parent process before forking workers: nothing here
+    starts a thread or holds a socket.
+    """
+    get_question_encoder()
+    get_sentence_encoder('bert-base-nli-mean-tokens')
+
+
+def reset_clients():
+    """Drop cached network clients, e.g. in a freshly forked worker"""
+    for factory in (get_recording_store, get_vector_index, get_chat_client):
+        factory.cache_clear()
+
+
+def reset_backends():
+    """Drop cached clients, e.g. after changing RAGSTEPS_BACKEND in tests"""
+    for factory in (get_recording_store, get_vector_index, get_chat_client,
+                    get_question_encoder, get_context_encoder, get_sentence_encoder):
+        factory.cache_clear()
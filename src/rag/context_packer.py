@@ -0,0 +1,112 @@
+from functools import lru_cache
+from typing import List, Optional
+import os
+import re
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Chunks are split with a 200 character overlap; anything shorter than this
+# matching across two chunks is treated as coincidence rather than overlap
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 400
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Load the tokenizer for a model, or None when tiktoken isn't installed"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Count tokens with the target model's tokenizer"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Roughly four characters per token for English text
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def get_token_budget() -> int:
+    """Context token budget from CONTEXT_TOKEN_BUDGET, if set"""
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    longest = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _strip_overlap(text: str, packed: List[str]) -> str:
+    """Remove text already covered by packed chunks from either end of text"""
+    for existing in packed:
+        if text in existing:
+            return ""
+        head = _overlap(existing, text)
+        if head:
+            text = text[head:]
+        tail = _overlap(text, existing)
+        if tail:
+            text = text[:-tail]
+    return text.strip()
+
+
+def _trim_to_budget(text: str, budget: int, model: str) -> str:
+    """Keep as many whole sentences from the start of text as fit in budget"""
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END.split(text):
+        cost = count_tokens(sentence + " ", model)
+        if used + cost > budget:
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+
+def pack_contexts(
+    contexts: List[str],
+    scores: Optional[List[float]] = None,
+    budget: Optional[int] = None,
+    model: str = DEFAULT_MODEL
+) -> List[str]:
+    """Pack the highest-scoring contexts into a token budget.
+
+    Text repeated through chunk overlap is dropped, and the last chunk that
+    doesn't fit whole is cut at a sentence boundary. Packed contexts keep
+    their score order.
+    """
+    budget = get_token_budget() if budget is None else budget
+    if scores is None:
+        scores = [0.0] * len(contexts)
+    ranked = sorted(zip(contexts, scores), key=lambda pair: pair[1] or 0.0, reverse=True)
+
+    packed: List[str] = []
+    used = 0
+    for text, _ in ranked:
+        text = _strip_overlap(text.strip(), packed)
+        if not text:
+            continue
+        remaining = budget - used
+        cost = count_tokens(text, model)
+        if cost > remaining:
+            text = _trim_to_budget(text, remaining, model)
+            if not text:
+                break
+            cost = count_tokens(text, model)
+        packed.append(text)
+        used += cost
+    return packed
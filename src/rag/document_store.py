@@ -0,0 +1,159 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_STORE_PATH = "./doc_store.sqlite"
+
+
+class DocumentStore:
+    """Local chunk store keyed by vector ID.
+
+    Vector indexes only carry IDs and small filterable fields; the chunk text
+    lives here as zlib-compressed blobs and is hydrated in one bulk lookup.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("DOCUMENT_STORE_PATH", DEFAULT_STORE_PATH)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                source TEXT,
+                page INTEGER,
+                text BLOB NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.commit()
+
+    def put_many(self, records: Iterable[Dict]):
+        """Insert or replace chunks given dicts with id, text, source and page"""
+        rows = [
+            (
+                record["id"],
+                record.get("source"),
+                record.get("page", 0),
+                zlib.compress(record["text"].encode("utf-8")),
+            )
+            for record in records
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, source, page, text) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._bump_version(row[0] for row in rows)
+            self._conn.commit()
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict]:
+        """Fetch chunks for the given IDs in a single query"""
+        if not ids:
+            return {}
+        found = {}
+        with self._lock:
+            # SQLite caps bound parameters, so look up in slices
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT id, source, page, text FROM chunks WHERE id IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for chunk_id, source, page, blob in rows:
+                    found[chunk_id] = {
+                        "id": chunk_id,
+                        "text": zlib.decompress(blob).decode("utf-8"),
+                        "source": source,
+                        "page": page,
+                    }
+        return found
+
+    def get_texts(self, ids: List[str]) -> List[Optional[str]]:
+        """Return the text for each ID in order, None where the ID is unknown"""
+        found = self.get_many(ids)
+        return [found[i]["text"] if i in found else None for i in ids]
+
+    def delete(self, ids: List[str]):
+        """Remove chunks by ID"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+            self._bump_version(ids)
+            self._conn.commit()
+
+    def count(self) -> int:
+        """Number of chunks in the store"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def kb_version(self) -> str:
+        """Opaque version string that changes whenever the stored chunks change"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else ""
+
+    def _bump_version(self, ids: Iterable[str]):
+        """Fold the touched IDs into the running version hash (caller holds the lock)"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        digest = hashlib.sha1((row[0] if row else "").encode("utf-8"))
+        for chunk_id in ids:
+            digest.update(chunk_id.encode("utf-8"))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+            (digest.hexdigest(),),
+        )
+
+    def close(self):
+        self._conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Return the process-wide document store"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DocumentStore()
+        return _default_store
+
+
+def hydrate_matches(matches, index=None, store: DocumentStore = None) -> List[Dict]:
+    """Resolve vector matches to dicts with id, score and text.
+
+    Text comes from the local store in one bulk lookup. Vectors written before
+    the store existed still carry their text in metadata, so any misses are
+    fetched from the index by ID as a fallback. Matches whose text can't be
+    found anywhere are dropped.
+    """
+    store = store or get_document_store()
+    ids = [match.id for match in matches]
+    texts = store.get_texts(ids)
+
+    missing = [chunk_id for chunk_id, text in zip(ids, texts) if text is None]
+    if missing and index is not None:
+        fetched = index.fetch(ids=missing).vectors
+        legacy = {
+            chunk_id: vector.metadata.get("text")
+            for chunk_id, vector in fetched.items()
+            if vector.metadata
+        }
+        texts = [text if text is not None else legacy.get(chunk_id) for chunk_id, text in zip(ids, texts)]
+
+    return [
+        {"id": match.id, "score": getattr(match, "score", None), "text": text}
+        for match, text in zip(matches, texts)
+        if text is not None
+    ]
@@ -0,0 +1,295 @@
+"""In-process stand-ins for Pinecone, OpenAI and the embedding models.
+
+They mirror just enough of each client's interface for the query paths to
+run unchanged, so the pipeline can be tested and benchmarked offline.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+
+
+class LatencyModel:
+    """Samples simulated latencies in seconds.
+
+    Specs look like ``constant:0.2``, ``uniform:0.1:0.5`` or
+    ``lognormal:<median>:<sigma>``; ``none`` disables the delay.
+    """
+
+    def __init__(self, spec: str = "none", seed: Optional[int] = None):
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        if self.kind not in ("none", "constant", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self._rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self._rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return self._rng.lognormvariate(np.log(median), sigma)
+        return 0.0
+
+    def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FakeEncoder:
+    """Deterministic hashed bag-of-words embeddings.
+
+    Texts that share words get similar vectors, so cosine search over fake
+    embeddings still ranks related passages first. Exposes ``encode`` like
+    SentenceTransformer and is callable like the DPR helpers.
+    """
+
+    def __init__(self, dimension: int = 768, latency: LatencyModel = None):
+        self.dimension = dimension
+        self.latency = latency or LatencyModel()
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            slot = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[slot] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        self.latency.wait()
+        if isinstance(texts, str):
+            return self._embed(texts)
+        return np.stack([self._embed(text) for text in texts])
+
+    def __call__(self, text: str) -> np.ndarray:
+        return self.encode(text)
+
+
+def _matches_filter(metadata: Dict, filter: Optional[Dict]) -> bool:
+    """Evaluate the subset of Pinecone's metadata filter language we use"""
+    if not filter:
+        return True
+    for field, condition in filter.items():
+        value = metadata.get(field)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$gte" and not (value is not None and value >= operand):
+                    return False
+                if op == "$lte" and not (value is not None and value <= operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class _Namespace:
+    def __init__(self):
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.metadata: Dict[str, Dict] = {}
+        self._matrix = None
+        self._ids: List[str] = []
+
+    def matrix(self):
+        """Normalised matrix of all vectors, rebuilt lazily after writes"""
+        if self._matrix is None:
+            self._ids = list(self.vectors)
+            if self._ids:
+                stacked = np.stack([self.vectors[i] for i in self._ids])
+                norms = np.linalg.norm(stacked, axis=1, keepdims=True)
+                self._matrix = stacked / np.where(norms > 0, norms, 1.0)
+            else:
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+        return self._ids, self._matrix
+
+
+class FakeVectorIndex:
+    """Pinecone Index stand-in with exact cosine search over NumPy arrays"""
+
+    def __init__(self, latency: LatencyModel = None):
+        self.latency = latency or LatencyModel()
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        return self._namespaces.setdefault(namespace or "", _Namespace())
+
+    def upsert(self, vectors: List, namespace: str = ""):
+        self.latency.wait()
+        with self._lock:
+            ns = self._namespace(namespace)
+            for vector in vectors:
+                if isinstance(vector, dict):
+                    vector_id, values, metadata = vector["id"], vector["values"], vector.get("metadata")
+                else:
+                    vector_id, values, metadata = (tuple(vector) + (None,))[:3]
+                ns.vectors[vector_id] = np.asarray(values, dtype=np.float32)
+                ns.metadata[vector_id] = dict(metadata or {})
+            ns._matrix = None
+        return SimpleNamespace(upserted_count=len(vectors))
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False,
+              include_values: bool = False, filter: Dict = None, namespace: str = "", **kwargs):
+        self.latency.wait()
+        with self._lock:
+            ns = self._namespace(namespace)
+            ids, matrix = ns.matrix()
+            if not ids:
+                return SimpleNamespace(matches=[], namespace=namespace)
+            query = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            scores = matrix @ (query / norm if norm else query)
+            candidates = [i for i in range(len(ids)) if _matches_filter(ns.metadata[ids[i]], filter)]
+            candidates.sort(key=lambda i: -scores[i])
+            matches = []
+            for i in candidates[:top_k]:
+                vector_id = ids[i]
+                matches.append(SimpleNamespace(
+                    id=vector_id,
+                    score=float(scores[i]),
+                    metadata=dict(ns.metadata[vector_id]) if include_metadata else None,
+                    values=ns.vectors[vector_id].tolist() if include_values else []
+                ))
+        return SimpleNamespace(matches=matches, namespace=namespace)
+
+    def fetch(self, ids: List[str], namespace: str = ""):
+        self.latency.wait()
+        with self._lock:
+            ns = self._namespace(namespace)
+            vectors = {
+                vector_id: SimpleNamespace(
+                    id=vector_id,
+                    values=ns.vectors[vector_id].tolist(),
+                    metadata=dict(ns.metadata[vector_id])
+                )
+                for vector_id in ids
+                if vector_id in ns.vectors
+            }
+        return SimpleNamespace(vectors=vectors, namespace=namespace)
+
+    def delete(self, ids: List[str] = None, namespace: str = "", delete_all: bool = False, **kwargs):
+        self.latency.wait()
+        with self._lock:
+            ns = self._namespace(namespace)
+            for vector_id in (list(ns.vectors) if delete_all else ids or []):
+                ns.vectors.pop(vector_id, None)
+                ns.metadata.pop(vector_id, None)
+            ns._matrix = None
+        return {}
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            namespaces = {
+                name: SimpleNamespace(vector_count=len(ns.vectors))
+                for name, ns in self._namespaces.items()
+            }
+        return SimpleNamespace(
+            namespaces=namespaces,
+            total_vector_count=sum(ns.vector_count for ns in namespaces.values())
+        )
+
+    def save(self, path: str, namespace: str = ""):
+        """Persist one namespace's vectors (metadata is kept in the document store)"""
+        with self._lock:
+            ns = self._namespace(namespace)
+            ids = list(ns.vectors)
+            if ids:
+                vectors = np.stack([ns.vectors[i] for i in ids])
+            else:
+                vectors = np.zeros((0, 0), dtype=np.float32)
+            np.savez(path, ids=np.array(ids, dtype=str), vectors=vectors)
+
+    @classmethod
+    def load(cls, path: str, namespace: str = "", latency: LatencyModel = None) -> "FakeVectorIndex":
+        index = cls(latency=latency)
+        with np.load(path, allow_pickle=False) as data:
+            index.upsert(
+                [{"id": str(i), "values": v} for i, v in zip(data["ids"], data["vectors"])],
+                namespace=namespace
+            )
+        return index
+
+
+def _completion_text(messages: List[Dict]) -> str:
+    """Deterministic answer that quotes the start of the first context"""
+    prompt = messages[-1]["content"] if messages else ""
+    match = re.search(r"Context 1: (.+)", prompt)
+    if match:
+        return f"According to the documents, {match.group(1)[:300].strip()}"
+    return "I cannot find the answer in the provided context."
+
+
+class _FakeCompletions:
+    def __init__(self, client: "FakeChatClient"):
+        self._client = client
+
+    def create(self, model: str = None, messages: List[Dict] = None, max_tokens: int = 500,
+               stream: bool = False, **kwargs):
+        client = self._client
+        text = client.responder(messages or [])
+        if (kwargs.get("response_format") or {}).get("type") == "json_object":
+            text = json.dumps({"activities": [{
+                "name": "Guided practice",
+                "description": text,
+                "duration": "15 minutes",
+                "materials": [],
+                "progress_indicators": []
+            }]})
+        words = text.split(" ")[:max_tokens]
+        prompt_tokens = sum(len(m["content"]) for m in messages or []) // 4
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(words),
+            total_tokens=prompt_tokens + len(words)
+        )
+        client.calls += 1
+        if stream:
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage")
+            return self._stream(words, usage if include_usage else None)
+        client.ttft.wait()
+        for _ in words:
+            client.token_latency.wait()
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=" ".join(words)))],
+            usage=usage
+        )
+
+    def _stream(self, words: List[str], usage=None) -> Iterator:
+        client = self._client
+        client.ttft.wait()
+        for i, word in enumerate(words):
+            if i:
+                client.token_latency.wait()
+            content = word if i == 0 else " " + word
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None)
+        if usage is not None:
+            # Like the API with stream_options={"include_usage": True}
+            yield SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeChatClient:
+    """OpenAI client stand-in with configurable time-to-first-token and per-token latency"""
+
+    def __init__(self, ttft: LatencyModel = None, token_latency: LatencyModel = None, responder=None):
+        self.ttft = ttft or LatencyModel()
+        self.token_latency = token_latency or LatencyModel()
+        self.responder = responder or _completion_text
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
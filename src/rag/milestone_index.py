@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+import gzip
+import json
+import logging
+import os
+import threading
+
+from src.models.milestone_data import DEVELOPMENTAL_MILESTONES, MILESTONE_CATEGORIES
+from src.rag.backends import get_question_encoder, get_vector_index
+from src.rag.context_packer import pack_contexts
+from src.rag.document_store import DocumentStore, get_document_store, hydrate_matches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = "./milestone_index.json.gz"
+
+
+def _milestone_query(milestone: Dict) -> str:
+    return (f"How can parents support a child with Down syndrome with {milestone['name']}: "
+            f"{milestone['description']} ({milestone['category']})")
+
+
+def _category_query(category: str) -> str:
+    return f"Activities to support {category} development in children with Down syndrome"
+
+
+def build_milestone_index(path: str = None, top_k: int = 5, index=None, encode=None,
+                          store: DocumentStore = None) -> Dict:
+    """Precompute the top-k knowledge base chunks for every milestone and category.
+
+    The result is written as gzipped JSON: each entry keeps chunk IDs and
+    scores, and each chunk's text is stored once however many entries use it.
+    """
+    path = path or os.getenv("MILESTONE_INDEX_PATH", DEFAULT_INDEX_PATH)
+    index = index or get_vector_index()
+    encode = encode or get_question_encoder()
+    store = store or get_document_store()
+
+    chunks: Dict[str, str] = {}
+
+    def lookup(query: str) -> List[Dict]:
+        results = index.query(vector=encode(query).tolist(), top_k=top_k, include_metadata=False)
+        entries = []
+        for match in hydrate_matches(results.matches, index=index, store=store):
+            chunks[match["id"]] = match["text"]
+            entries.append({"id": match["id"], "score": match["score"]})
+        return entries
+
+    data = {
+        "kb_version": store.kb_version(),
+        "built_at": datetime.now().isoformat(),
+        "top_k": top_k,
+        "milestones": {m["name"]: lookup(_milestone_query(m)) for m in DEVELOPMENTAL_MILESTONES},
+        "categories": {c: lookup(_category_query(c)) for c in MILESTONE_CATEGORIES},
+    }
+    data["chunks"] = chunks
+
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    logger.info(f"Milestone index built with {len(chunks)} chunks for "
+                f"{len(data['milestones'])} milestones at {path}")
+    return data
+
+
+class MilestoneKnowledgeIndex:
+    """Read-only view over a built milestone index"""
+
+    def __init__(self, data: Dict):
+        self.kb_version = data["kb_version"]
+        self._milestones = data["milestones"]
+        self._categories = data["categories"]
+        self._chunks = data["chunks"]
+
+    @classmethod
+    def load(cls, path: str = None, kb_version: str = None) -> Optional["MilestoneKnowledgeIndex"]:
+        """Load the index, or None if it is missing or built for another KB version"""
+        path = path or os.getenv("MILESTONE_INDEX_PATH", DEFAULT_INDEX_PATH)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if kb_version is not None and data.get("kb_version") != kb_version:
+            logger.info("Milestone index is stale for the current knowledge base; ignoring it")
+            return None
+        return cls(data)
+
+    def _resolve(self, entries: List[Dict]) -> List[Dict]:
+        return [dict(entry, text=self._chunks[entry["id"]]) for entry in entries]
+
+    def milestone_chunks(self, name: str) -> List[Dict]:
+        return self._resolve(self._milestones.get(name, []))
+
+    def category_chunks(self, category: str) -> List[Dict]:
+        return self._resolve(self._categories.get(category, []))
+
+    def contexts_for(self, milestone_names: List[str], categories: List[str] = None,
+                     token_budget: int = None) -> List[str]:
+        """Packed contexts covering the given milestones (and optional categories)"""
+        entries = []
+        for name in milestone_names:
+            entries.extend(self.milestone_chunks(name))
+        for category in categories or []:
+            entries.extend(self.category_chunks(category))
+        return pack_contexts(
+            [entry["text"] for entry in entries],
+            scores=[entry["score"] for entry in entries],
+            budget=token_budget
+        )
+
+
+_cached = {"key": None, "index": None}
+_cached_lock = threading.Lock()
+
+
+def get_milestone_index(path: str = None) -> Optional[MilestoneKnowledgeIndex]:
+    """Return the current milestone index, reloading when the file or KB changes"""
+    path = path or os.getenv("MILESTONE_INDEX_PATH", DEFAULT_INDEX_PATH)
+    if not os.path.exists(path):
+        return None
+    kb_version = get_document_store().kb_version()
+    key = (path, os.path.getmtime(path), kb_version)
+    with _cached_lock:
+        if _cached["key"] != key:
+            _cached["index"] = MilestoneKnowledgeIndex.load(path, kb_version=kb_version)
+            _cached["key"] = key
+        return _cached["index"]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_milestone_index()
@@ -1,22 +1,74 @@
 from typing import Dict, List, Optional
+import time
 from src.models.user_model import ChildProfile
 from src.models.profile_embeddings_namespace_v4 import ProfileEmbeddingHandler
-from src.rag.rag_query_pinecone import query_knowledge_base
+from src.rag.rag_query_streamlit import (
+    build_messages,
+    generate_completion,
+    match_sources,
+    pack_matches,
+    retrieve_matches,
+)
+from src.utils.llm_controller import INTERACTIVE
 
 class ProfileAwareRAG:
-    def __init__(self):
-        self.profile_handler = ProfileEmbeddingHandler()
-        
+    def __init__(self, profile_handler: ProfileEmbeddingHandler = None):
+        # Only needed by callers that also search similar profiles; the
+        # profile context itself comes from the ChildProfile passed in
+        self.profile_handler = profile_handler
+
     def generate_profile_context(self, profile: ChildProfile, query: str) -> str:
         """Generate context about the child's profile relevant to the query"""
-        profile_data = self.profile_handler.get_profile_context(profile.profile_id, query)
-        
         # Create a context string that focuses on relevant aspects of the child's development
         context = f"""
         Context about {profile.name}:
         - Age: {profile.age_months} months
-        - Medical considerations: {', '.join(profile.medical_considerations)}
-        - Current focus areas: {', '.join(profile.current_focus_areas)}
-        
+        - Medical considerations: {', '.join(profile.medical_considerations) or 'None'}
+        - Current focus areas: {', '.join(profile.current_focus_areas) or 'None'}
+
         Recent Progress:
         """
+        # The caller's profile is current; the synced payload may not be
+        recent = profile.last_entries(5)
+        for entry in recent:
+            detail = entry.get('note') or entry.get('category', '')
+            context += f"\n        - {entry.get('date', '')}: {entry.get('milestone', '')} {detail}".rstrip()
+        if not recent:
+            context += "\n        - No progress recorded yet"
+        return context
+
+    def query(self, profile: ChildProfile, question: str, top_k: int = 3, use_gpt_knowledge: bool = True,
+              token_budget: Optional[int] = None, priority: int = INTERACTIVE) -> Dict:
+        """Answer a question from the knowledge base with the child's profile as extra context.
+
+        Returns the same fields as query_knowledge_base plus ``profile_context``.
+        """
+        started = time.perf_counter()
+        timings = {}
+        try:
+            profile_context = self.generate_profile_context(profile, question)
+            matches = retrieve_matches(question, top_k=top_k)
+            contexts: List[str] = pack_matches(matches, token_budget)
+            timings['retrieve_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            messages = build_messages(question, [profile_context] + contexts, use_gpt_knowledge)
+            answer, usage = generate_completion(messages, priority=priority)
+            timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return {
+                'answer': answer,
+                'contexts': contexts,
+                'sources': match_sources(matches),
+                'profile_context': profile_context,
+                'usage': usage,
+                'timings': timings,
+                'error': None
+            }
+        except Exception as e:
+            return {
+                'answer': None,
+                'contexts': None,
+                'sources': None,
+                'profile_context': None,
+                'usage': None,
+                'timings': timings,
+                'error': str(e)
+            }
@@ -10,6 +10,8 @@ from dotenv import load_dotenv
 import os
 import torch
 import numpy as np
+from src.utils.llm_controller import estimate_tokens, get_llm_controller
+from src.utils.tracing import span
 
 # Load environment variables
 load_dotenv()
@@ -28,7 +30,12 @@ def expand_query(query, llm):
         input_variables=["question"]
     )
     chain = LLMChain(llm=llm, prompt=prompt)
-    expanded = chain.run(question=query)
+    with span("expand_query"):
+        expanded = get_llm_controller().call(
+            chain.run,
+            question=query,
+            estimated_tokens=estimate_tokens(template + query, 100)
+        )
     # Split the result and add the original query
     queries = [query] + [q.strip() for q in expanded.split(',')]
     return queries
@@ -38,24 +45,26 @@ def get_relevant_context(queries, collection, question_encoder, question_tokeniz
     # Create embeddings for all queries
     all_embeddings = []
     for query in queries:
-        inputs = question_tokenizer(
-            query,
-            max_length=512,
-            padding=True,
-            truncation=True,
-            return_tensors="pt"
-        )
-        with torch.no_grad():
+        with span("tokenize"):
+            inputs = question_tokenizer(
+                query,
+                max_length=512,
+                padding=True,
+                truncation=True,
+                return_tensors="pt"
+            )
+        with span("encode_question"), torch.no_grad():
             embedding = question_encoder(**inputs).pooler_output[0]
             all_embeddings.append(embedding.numpy().tolist())
     
     # Query ChromaDB with all embeddings
     all_results = []
     for embedding in all_embeddings:
-        results = collection.query(
-            query_embeddings=[embedding],
-            n_results=k
-        )
+        with span("collection.query", n_results=k):
+            results = collection.query(
+                query_embeddings=[embedding],
+                n_results=k
+            )
         all_results.extend(zip(results['documents'][0], results['metadatas'][0]))
     
     # Remove duplicates while preserving order
@@ -92,7 +101,8 @@ def setup_rag():
     # Initialize LLM
     llm = ChatOpenAI(
         model="gpt-3.5-turbo",
-        temperature=0.7
+        temperature=0.7,
+        max_retries=0  # Retries are handled by the shared LLM controller
     )
     
     # Create prompt template
@@ -119,18 +129,26 @@ def setup_rag():
 
 def query_documents(question):
     """Main function to query documents using RAG with DPR and query expansion"""
-    # Set up RAG components
-    collection, question_encoder, question_tokenizer, llm, chain = setup_rag()
+    # Set up RAG components (loads the encoder and collection)
+    with span("setup_rag"):
+        collection, question_encoder, question_tokenizer, llm, chain = setup_rag()
     
     # Expand the query
     expanded_queries = expand_query(question, llm)
     print("\nExpanded queries:", expanded_queries)
     
     # Get relevant context using all queries
-    context = get_relevant_context(expanded_queries, collection, question_encoder, question_tokenizer)
+    with span("retrieve_contexts"):
+        context = get_relevant_context(expanded_queries, collection, question_encoder, question_tokenizer)
     
     # Generate answer
-    response = chain.run(context=context, question=question)
+    with span("chat_completion"):
+        response = get_llm_controller().call(
+            chain.run,
+            context=context,
+            question=question,
+            estimated_tokens=estimate_tokens(context + question, 500)
+        )
     
     return response
 
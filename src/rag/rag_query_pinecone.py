@@ -1,15 +1,11 @@
-from transformers import (
-    DPRQuestionEncoder,
-    DPRQuestionEncoderTokenizer,
-)
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 from dotenv import load_dotenv
-import pinecone
-import os
-import torch
 import numpy as np
+from src.rag.backends import ChatClientModel, get_question_encoder, get_vector_index
+from src.utils.llm_controller import estimate_tokens, get_llm_controller
+from src.rag.document_store import hydrate_matches
+from src.rag.context_packer import pack_contexts
+from src.utils.tracing import span
 
 # Load environment variables
 load_dotenv()
@@ -27,76 +23,74 @@ def expand_query(query, llm):
         template=template,
         input_variables=["question"]
     )
-    chain = LLMChain(llm=llm, prompt=prompt)
-    expanded = chain.run(question=query)
+    with span("expand_query"):
+        expanded = get_llm_controller().call(
+            llm.invoke,
+            prompt.format(question=query),
+            estimated_tokens=estimate_tokens(template + query, 100)
+        ).content
     # Split the result and add the original query
     queries = [query] + [q.strip() for q in expanded.split(',')]
     return queries
 
-def get_relevant_context(queries, index, question_encoder, question_tokenizer, k=3):
+def get_relevant_context(queries, index, encode, k=3):
     """Retrieve relevant context from Pinecone based on the queries using DPR"""
     # Create embeddings for all queries
-    all_embeddings = []
-    for query in queries:
-        inputs = question_tokenizer(
-            query,
-            max_length=512,
-            padding=True,
-            truncation=True,
-            return_tensors="pt"
-        )
-        with torch.no_grad():
-            embedding = question_encoder(**inputs).pooler_output[0]
-            all_embeddings.append(embedding.numpy().tolist())
+    with span("encode_question", queries=len(queries)):
+        all_embeddings = [encode(query) for query in queries]
     
     # Average the embeddings from all queries
     query_embedding = np.mean(all_embeddings, axis=0)
     
-    # Query Pinecone
-    results = index.query(
-        vector=query_embedding.tolist(),
-        top_k=k,
-        include_metadata=True
-    )
+    # Query Pinecone for IDs and scores only
+    with span("index.query", top_k=k):
+        results = index.query(
+            vector=query_embedding.tolist(),
+            top_k=k,
+            include_metadata=False
+        )
     
-    # Extract and return contexts
-    contexts = [result.metadata['text'] for result in results.matches]
+    # Hydrate contexts from the local document store
+    with span("hydrate_matches"):
+        hydrated = hydrate_matches(results.matches, index=index)
+    
+    # Pack the best contexts into the prompt's token budget
+    with span("pack_contexts"):
+        contexts = pack_contexts(
+            [match['text'] for match in hydrated],
+            scores=[match['score'] for match in hydrated]
+        )
     return contexts
 
 def setup_rag():
     """Initialize RAG components"""
-    # Initialize Pinecone
-    pinecone.init(
-        api_key=os.getenv('PINECONE_API_KEY'),
-        environment=os.getenv('PINECONE_ENV')
-    )
-    
-    # Connect to index
-    index_name = os.getenv('PINECONE_INDEX_NAME')
-    index = pinecone.Index(index_name)
+    # Connect to the vector index
+    index = get_vector_index()
     
-    # Initialize DPR components
-    tokenizer = DPRQuestionEncoderTokenizer.from_pretrained("facebook/dpr-question_encoder-single-nq-base")
-    model = DPRQuestionEncoder.from_pretrained("facebook/dpr-question_encoder-single-nq-base")
+    # DPR question encoder
+    encode = get_question_encoder()
     
-    # Initialize LLM
-    llm = ChatOpenAI(
-        model_name="gpt-3.5-turbo",
-        temperature=0
-    )
+    # Initialize LLM; retries are handled by the shared LLM controller
+    llm = ChatClientModel(model="gpt-3.5-turbo", temperature=0)
     
-    return index, model, tokenizer, llm
+    return index, encode, llm
 
 def query_documents(question):
     """Main function to query documents using RAG with DPR and query expansion"""
-    # Setup components
-    index, question_encoder, question_tokenizer, llm = setup_rag()
+    with span("query_documents"):
+        return _query_documents(question)
+
+def _query_documents(question):
+    # Setup components (loads the encoder on first use)
+    with span("setup_rag"):
+        index, encode, llm = setup_rag()
     
     # Expand the query
     expanded_queries = expand_query(question, llm)
     
     # Get relevant contexts
-    contexts = get_relevant_context(expanded_queries, index, question_encoder, question_tokenizer)
+    with span("retrieve_contexts"):
+        contexts = get_relevant_context(expanded_queries, index, encode)
     
     # Create prompt for final answer
     context_text = "\n".join(contexts)
@@ -110,7 +104,12 @@ Question: {question}
 Answer:"""
     
     # Generate final answer
-    response = llm.invoke(prompt)
+    with span("chat_completion"):
+        response = get_llm_controller().call(
+            llm.invoke,
+            prompt,
+            estimated_tokens=estimate_tokens(prompt, 500)
+        )
     return response.content
 
 if __name__ == "__main__":
@@ -1,51 +1,122 @@
-from transformers import DPRQuestionEncoder, DPRQuestionEncoderTokenizer
-import torch
-from pinecone import Pinecone
+from collections import OrderedDict
+from itertools import chain
 from dotenv import load_dotenv
+import copy
 import os
-from openai import OpenAI
+import threading
+import time
+from src.rag.backends import get_chat_client, get_question_encoder, get_vector_index
+from src.rag.document_store import get_document_store, hydrate_matches
+from src.rag.context_packer import pack_contexts
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import span
+from src.utils.llm_controller import INTERACTIVE, estimate_tokens, get_llm_controller
 
 # Load environment variables
 load_dotenv()
 
+# Identical questions asked at the same time share one embed/search/LLM call
+_query_flight = SingleFlight()
+
+def normalize_question(question):
+    """Normalize a question for request coalescing"""
+    return " ".join(question.lower().split())
+
+def _query_key(question, use_gpt_knowledge, top_k, token_budget):
+    return (normalize_question(question), use_gpt_knowledge, top_k, token_budget)
+
+class QueryResultCache:
+    """Answers already produced for one session, so reruns don't repeat them.
+
+    Streamlit reruns the whole script on every widget interaction; keeping one
+    of these in ``st.session_state`` means an unchanged question is answered
+    from memory instead of another embed, search and LLM call. Entries are
+    tied to the knowledge base version and ignored once it changes. Failed
+    queries are never cached.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        kb_version = get_document_store().kb_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != kb_version:
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry[1])
+
+    def put(self, key, result):
+        if result.get('error'):
+            return
+        kb_version = get_document_store().kb_version()
+        with self._lock:
+            self._entries[key] = (kb_version, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def get_session_cache(session_state, max_entries=32):
+    """The QueryResultCache kept in a Streamlit session_state"""
+    if "query_result_cache" not in session_state:
+        session_state["query_result_cache"] = QueryResultCache(max_entries)
+    return session_state["query_result_cache"]
+
 def get_question_embedding(question):
-    # Initialize DPR question encoder
-    question_encoder = DPRQuestionEncoder.from_pretrained(
-        "facebook/dpr-question_encoder-single-nq-base"
-    )
-    question_tokenizer = DPRQuestionEncoderTokenizer.from_pretrained(
-        "facebook/dpr-question_encoder-single-nq-base"
-    )
-    
-    # Create question embedding
-    question_inputs = question_tokenizer(question, return_tensors="pt")
-    question_embedding = question_encoder(**question_inputs).pooler_output
-    return question_embedding[0].detach().numpy()
+    """Embed a question with the DPR question encoder"""
+    encode = get_question_encoder()
+    with span("encode_question"):
+        return encode(question)
 
-def query_knowledge_base(question, top_k=3, use_gpt_knowledge=True):
-    try:
-        # Initialize Pinecone
-        pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
-        
-        # Connect to index
-        index = pc.Index(os.getenv('PINECONE_INDEX_NAME'))
-        
-        # Get question embedding
-        question_embedding = get_question_embedding(question)
-        
-        # Query Pinecone
+def retrieve_matches(question, top_k=3):
+    """Embed the question, search Pinecone and hydrate the matches (id, score, text)"""
+    # Connect to the vector index
+    index = get_vector_index()
+    
+    # Get question embedding
+    question_embedding = get_question_embedding(question)
+    
+    # Query Pinecone for IDs and scores only
+    with span("index.query", top_k=top_k):
         results = index.query(
             vector=question_embedding.tolist(),
             top_k=top_k,
-            include_metadata=True
+            include_metadata=False
         )
-        
-        # Extract contexts
-        contexts = [match.metadata['text'] for match in results.matches]
-        
-        # Create prompt for GPT based on mode
-        if use_gpt_knowledge:
-            prompt = f"""Answer the question based on the provided contexts. If the contexts don't contain enough information, you can also use your general knowledge to provide a complete answer. Always prioritize information from the contexts when available, but feel free to supplement with additional relevant information.
+    
+    # Hydrate contexts from the local document store
+    with span("hydrate_matches"):
+        return hydrate_matches(results.matches, index=index)
+
+def pack_matches(matches, token_budget=None):
+    """Pack the best matched contexts into the prompt's token budget"""
+    with span("pack_contexts"):
+        return pack_contexts(
+            [match['text'] for match in matches],
+            scores=[match['score'] for match in matches],
+            budget=token_budget
+        )
+
+def match_sources(matches):
+    """IDs and scores of the retrieved chunks, for logging"""
+    return [{'id': match['id'], 'score': match['score']} for match in matches]
+
+def retrieve_contexts(question, top_k=3, token_budget=None):
+    """Embed the question, search Pinecone and pack the hydrated contexts"""
+    return pack_matches(retrieve_matches(question, top_k=top_k), token_budget)
+
+def build_messages(question, contexts, use_gpt_knowledge=True):
+    """Build the chat messages for answering a question from contexts"""
+    # Create prompt for GPT based on mode
+    if use_gpt_knowledge:
+        prompt = f"""Answer the question based on the provided contexts. If the contexts don't contain enough information, you can also use your general knowledge to provide a complete answer. Always prioritize information from the contexts when available, but feel free to supplement with additional relevant information.
 
 Question: {question}
 
@@ -59,8 +130,8 @@ Instructions:
 4. Be helpful and informative while maintaining accuracy
 
 Answer:"""
-        else:
-            prompt = f"""Answer the question based ONLY on the provided contexts. If the contexts don't contain enough information to answer the question, simply state that you cannot answer based on the available information.
+    else:
+        prompt = f"""Answer the question based ONLY on the provided contexts. If the contexts don't contain enough information to answer the question, simply state that you cannot answer based on the available information.
 
 Question: {question}
 
@@ -74,29 +145,216 @@ Instructions:
 4. Be accurate and precise
 
 Answer:"""
-        
-        # Get response from GPT
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that answers questions based on provided document contexts." + (" You can also use your general knowledge when appropriate." if use_gpt_knowledge else " You must ONLY use information from the provided contexts.")},
-            {"role": "user", "content": prompt}
-        ]
-        
-        response = client.chat.completions.create(
+    
+    return [
+        {"role": "system", "content": "You are a helpful assistant that answers questions based on provided document contexts." + (" You can also use your general knowledge when appropriate." if use_gpt_knowledge else " You must ONLY use information from the provided contexts.")},
+        {"role": "user", "content": prompt}
+    ]
+
+def query_knowledge_base(question, top_k=3, use_gpt_knowledge=True, token_budget=None, priority=INTERACTIVE,
+                         cache=None):
+    """Answer a question from the knowledge base, sharing work with identical in-flight questions.
+
+    With a QueryResultCache, a question it already answered is served from it.
+    """
+    key = _query_key(question, use_gpt_knowledge, top_k, token_budget)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    result = _query_flight.do(
+        key, _query_knowledge_base, question, top_k, use_gpt_knowledge, token_budget, priority
+    )
+    if cache is not None:
+        cache.put(key, result)
+    # Each caller gets its own copy of the shared result, lists included
+    return copy.deepcopy(result)
+
+def generate_completion(messages, max_tokens=500, temperature=0.7, priority=INTERACTIVE, response_format=None):
+    """Run one chat completion under the shared LLM controller.
+
+    Returns the answer text and a usage dict (None if the API didn't report it).
+    """
+    # Retries are left to the shared controller
+    client = get_chat_client()
+    extra = {'response_format': response_format} if response_format else {}
+    with span("chat_completion", max_tokens=max_tokens):
+        response = get_llm_controller().call(
+            client.chat.completions.create,
             model="gpt-3.5-turbo",
             messages=messages,
-            temperature=0.7,
-            max_tokens=500
+            temperature=temperature,
+            max_tokens=max_tokens,
+            estimated_tokens=estimate_tokens(messages, max_tokens),
+            priority=priority,
+            **extra
         )
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        usage = {
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens
+        }
+    return response.choices[0].message.content, usage
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def _query_knowledge_base(question, top_k, use_gpt_knowledge, token_budget, priority):
+    started = time.perf_counter()
+    timings = {}
+    try:
+        with span("query_knowledge_base", top_k=top_k):
+            with span("retrieve_contexts"):
+                matches = retrieve_matches(question, top_k=top_k)
+                contexts = pack_matches(matches, token_budget)
+            timings['retrieve_ms'] = _elapsed_ms(started)
+            messages = build_messages(question, contexts, use_gpt_knowledge)
+            
+            # Get response from GPT
+            answer, usage = generate_completion(messages, priority=priority)
+        timings['total_ms'] = _elapsed_ms(started)
         
         return {
-            'answer': response.choices[0].message.content,
+            'answer': answer,
             'contexts': contexts,
+            'sources': match_sources(matches),
+            'usage': usage,
+            'timings': timings,
             'error': None
         }
     except Exception as e:
+        timings['total_ms'] = _elapsed_ms(started)
         return {
             'answer': None,
             'contexts': None,
+            'sources': None,
+            'usage': None,
+            'timings': timings,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+class StreamingAnswer:
+    """Iterable of answer tokens that keeps the final answer for logging.
+
+    Iterating runs retrieval and then yields content deltas from the chat
+    completions stream as they arrive. Concurrent streams for the same
+    question subscribe to a single upstream completion. Once exhausted,
+    ``answer``, ``contexts``, ``sources``, ``usage`` and ``error`` hold the
+    same fields query_knowledge_base returns, and ``result()`` returns them
+    as a dict; ``timings`` holds retrieval, first-token and total times as
+    seen by this reader. With a cache, an answer it already holds is yielded
+    in one piece and ``cached`` is set (with no ``usage``, as no tokens were spent).
+    """
+
+    def __init__(self, question, top_k=3, use_gpt_knowledge=True, token_budget=None, cache=None):
+        self.question = question
+        self.top_k = top_k
+        self.use_gpt_knowledge = use_gpt_knowledge
+        self.token_budget = token_budget
+        self.cache = cache
+        self.cached = False
+        self.answer = None
+        self.contexts = None
+        self.sources = None
+        self.usage = None
+        self.error = None
+        self.timings = {}
+
+    def __iter__(self):
+        started = time.perf_counter()
+        cache_key = _query_key(self.question, self.use_gpt_knowledge, self.top_k, self.token_budget)
+        if self.cache is not None:
+            hit = self.cache.get(cache_key)
+            if hit is not None:
+                self.cached = True
+                self.answer, self.contexts, self.error = hit['answer'], hit['contexts'], hit['error']
+                self.sources = hit.get('sources')
+                self.timings = {'total_ms': _elapsed_ms(started)}
+                yield self.answer
+                return
+
+        parts = []
+        key = ("stream",) + cache_key
+        try:
+            events = _query_flight.stream(
+                key, _stream_events, self.question, self.top_k,
+                self.use_gpt_knowledge, self.token_budget
+            )
+            for kind, value in events:
+                # Events are shared by every subscriber, so keep copies
+                if kind == "contexts":
+                    self.contexts = list(value)
+                    self.timings['retrieve_ms'] = _elapsed_ms(started)
+                elif kind == "sources":
+                    self.sources = copy.deepcopy(value)
+                elif kind == "usage":
+                    self.usage = dict(value)
+                else:
+                    if not parts:
+                        self.timings['first_token_ms'] = _elapsed_ms(started)
+                    parts.append(value)
+                    yield value
+            self.answer = "".join(parts)
+        except Exception as e:
+            self.answer = "".join(parts) or None
+            self.error = str(e)
+        self.timings['total_ms'] = _elapsed_ms(started)
+        if self.cache is not None:
+            self.cache.put(cache_key, self.result())
+
+    def result(self):
+        return {
+            'answer': self.answer,
+            'contexts': self.contexts,
+            'sources': self.sources,
+            'usage': self.usage,
+            'error': self.error
+        }
+
+def _stream_events(question, top_k, use_gpt_knowledge, token_budget):
+    """Yield ("sources", list) and ("contexts", list) once, then ("token", str) for each content delta
+    and finally ("usage", dict) if the API reported token usage"""
+    with span("retrieve_contexts"):
+        matches = retrieve_matches(question, top_k=top_k)
+        contexts = pack_matches(matches, token_budget)
+    yield "sources", match_sources(matches)
+    yield "contexts", contexts
+    
+    messages = build_messages(question, contexts, use_gpt_knowledge)
+    client = get_chat_client()
+    # Time to the first streamed chunk; the rest is paced by the model
+    with span("chat_completion.first_chunk"):
+        stream = iter(get_llm_controller().call(
+            client.chat.completions.create,
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            stream=True,
+            stream_options={"include_usage": True},
+            estimated_tokens=estimate_tokens(messages, 500),
+            priority=INTERACTIVE
+        ))
+        first = next(stream, None)
+    if first is None:
+        return
+    # Closing hands the stream's concurrency slot back to the LLM controller
+    with stream:
+        for chunk in chain([first], stream):
+            if not chunk.choices:
+                # The closing usage chunk requested through stream_options
+                usage = getattr(chunk, 'usage', None)
+                if usage is not None:
+                    yield "usage", {
+                        'prompt_tokens': usage.prompt_tokens,
+                        'completion_tokens': usage.completion_tokens
+                    }
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield "token", delta
+
+def stream_knowledge_base(question, top_k=3, use_gpt_knowledge=True, token_budget=None, cache=None):
+    """Streaming variant of query_knowledge_base that yields tokens as they arrive"""
+    return StreamingAnswer(question, top_k, use_gpt_knowledge, token_budget, cache=cache)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import threading
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+from src.rag.fakes import LatencyModel
+
+
+def _to_plain(value):
+    """Convert client response objects into JSON-serialisable data"""
+    if hasattr(value, "to_dict"):
+        value = value.to_dict()
+    elif hasattr(value, "model_dump"):
+        value = value.model_dump()
+    elif isinstance(value, SimpleNamespace):
+        value = vars(value)
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(v) for v in value]
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return value
+
+
+def _to_namespace(value):
+    """Rebuild attribute-style objects from recorded data"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+def _round_vectors(value):
+    """Round floats so recomputed embeddings map to the same recording key"""
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, dict):
+        return {k: _round_vectors(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round_vectors(v) for v in value]
+    if hasattr(value, "tolist"):
+        return _round_vectors(value.tolist())
+    return value
+
+
+class RecordingStore:
+    """Append-only JSONL file of request/response pairs keyed by request hash"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("RAGSTEPS_RECORDINGS", "./recordings/recordings.jsonl")
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(kind: str, request: Dict) -> str:
+        canonical = json.dumps(_round_vectors(request), sort_keys=True, default=str)
+        return hashlib.sha256(f"{kind}:{canonical}".encode("utf-8")).hexdigest()
+
+    def get(self, kind: str, request: Dict) -> Optional[Dict]:
+        return self._entries.get(self.key(kind, request))
+
+    def put(self, kind: str, request: Dict, response):
+        entry = {"key": self.key(kind, request), "kind": kind, "response": _to_plain(response)}
+        with self._lock:
+            self._entries[entry["key"]] = entry
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def require(self, kind: str, request: Dict) -> Dict:
+        entry = self.get(kind, request)
+        if entry is None:
+            raise KeyError(f"No recording for {kind} request; re-run with RAGSTEPS_BACKEND=record")
+        return entry["response"]
+
+
+class RecordingIndex:
+    """Wraps a live vector index and records every query and fetch"""
+
+    def __init__(self, index, store: RecordingStore):
+        self._index = index
+        self._store = store
+
+    def query(self, **kwargs):
+        response = self._index.query(**kwargs)
+        self._store.put("index.query", kwargs, response)
+        return response
+
+    def fetch(self, ids, **kwargs):
+        response = self._index.fetch(ids=ids, **kwargs)
+        self._store.put("index.fetch", dict(kwargs, ids=ids), response)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+
+class ReplayIndex:
+    """Serves recorded vector index responses without a Pinecone account"""
+
+    def __init__(self, store: RecordingStore, latency: LatencyModel = None):
+        self._store = store
+        self.latency = latency or LatencyModel()
+
+    def query(self, **kwargs):
+        self.latency.wait()
+        return _to_namespace(self._store.require("index.query", kwargs))
+
+    def fetch(self, ids, **kwargs):
+        self.latency.wait()
+        response = self._store.require("index.fetch", dict(kwargs, ids=ids))
+        vectors = {k: _to_namespace(v) for k, v in (response.get("vectors") or {}).items()}
+        return SimpleNamespace(vectors=vectors)
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, store: RecordingStore):
+        self._completions = completions
+        self._store = store
+
+    def create(self, **kwargs):
+        response = self._completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            self._store.put("chat.create", kwargs, response)
+            return response
+        return self._record_stream(kwargs, response)
+
+    def _record_stream(self, request: Dict, stream) -> Iterator:
+        deltas: List[str] = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                deltas.append(chunk.choices[0].delta.content)
+            yield chunk
+        self._store.put("chat.stream", request, {"deltas": deltas})
+
+
+class RecordingChatClient:
+    """Wraps a live OpenAI client and records chat completions, streamed or not"""
+
+    def __init__(self, client, store: RecordingStore):
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(client.chat.completions, store))
+
+
+class _ReplayCompletions:
+    def __init__(self, store: RecordingStore, ttft: LatencyModel, token_latency: LatencyModel):
+        self._store = store
+        self._ttft = ttft
+        self._token_latency = token_latency
+
+    def create(self, **kwargs):
+        if not kwargs.get("stream"):
+            self._ttft.wait()
+            return _to_namespace(self._store.require("chat.create", kwargs))
+        deltas = self._store.require("chat.stream", kwargs)["deltas"]
+        return self._replay_stream(deltas)
+
+    def _replay_stream(self, deltas: List[str]) -> Iterator:
+        self._ttft.wait()
+        for i, delta in enumerate(deltas):
+            if i:
+                self._token_latency.wait()
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+
+class ReplayChatClient:
+    """Serves recorded chat completions, optionally with simulated latency"""
+
+    def __init__(self, store: RecordingStore, ttft: LatencyModel = None, token_latency: LatencyModel = None):
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(
+            store, ttft or LatencyModel(), token_latency or LatencyModel()
+        ))
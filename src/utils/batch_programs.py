@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import time
+
+from src.models.user_model import ChildProfile, UserManager
+from src.utils.program_generator import ProgramGenerator
+
+logger = logging.getLogger(__name__)
+
+# gpt-3.5-turbo list prices in USD per 1K tokens
+PRICE_PER_1K_TOKENS = {"prompt_tokens": 0.0005, "completion_tokens": 0.0015}
+
+
+def current_run_id() -> str:
+    """ISO year and week, so re-running in the same week resumes the same batch"""
+    year, week, _ = datetime.now().isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _write_json_atomic(path: str, data: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def estimate_cost(token_usage: Dict[str, int]) -> float:
+    """Dollar cost of the given token usage"""
+    return sum(token_usage.get(k, 0) / 1000 * price for k, price in PRICE_PER_1K_TOKENS.items())
+
+
+class BatchProgramRunner:
+    """Generate weekly programs for every profile concurrently.
+
+    Each finished program is written to ``<output_dir>/<run_id>/<profile_id>.json``
+    as soon as it completes, so a crashed or interrupted run picks up where it
+    left off: profiles with a result file are skipped and failures are retried.
+    """
+
+    def __init__(
+        self,
+        user_manager: UserManager = None,
+        generator: ProgramGenerator = None,
+        output_dir: str = "programs",
+        max_concurrency: int = 4,
+        run_id: str = None
+    ):
+        self.user_manager = user_manager or UserManager()
+        self.generator = generator or ProgramGenerator()
+        self.max_concurrency = max_concurrency
+        self.run_id = run_id or current_run_id()
+        self.run_dir = os.path.join(output_dir, self.run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+
+    def _result_path(self, profile_id: str) -> str:
+        return os.path.join(self.run_dir, f"{profile_id}.json")
+
+    def _error_path(self, profile_id: str) -> str:
+        return os.path.join(self.run_dir, f"{profile_id}.error.json")
+
+    def pending_profiles(self) -> List[ChildProfile]:
+        """Profiles without a program for this run yet"""
+        return [
+            profile for profile in self.user_manager.list_profiles()
+            if not os.path.exists(self._result_path(profile.profile_id))
+        ]
+
+    def _generate(self, profile: ChildProfile) -> Dict:
+        program = self.generator.generate_weekly_program(profile)
+        result = {
+            "profile_id": profile.profile_id,
+            "run_id": self.run_id,
+            "generated_at": datetime.now().isoformat(),
+            "program": program
+        }
+        _write_json_atomic(self._result_path(profile.profile_id), result)
+        if os.path.exists(self._error_path(profile.profile_id)):
+            os.remove(self._error_path(profile.profile_id))
+        return result
+
+    def run(self, limit: Optional[int] = None) -> Dict:
+        """Generate all pending programs and return a summary report"""
+        pending = self.pending_profiles()
+        if limit is not None:
+            pending = pending[:limit]
+        logger.info(f"Generating {len(pending)} programs for run {self.run_id} "
+                    f"with concurrency {self.max_concurrency}")
+
+        usage_before = dict(self.generator.token_usage)
+        started = time.monotonic()
+        completed, failed = [], []
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {executor.submit(self._generate, profile): profile for profile in pending}
+            for future in as_completed(futures):
+                profile = futures[future]
+                try:
+                    future.result()
+                    completed.append(profile.profile_id)
+                    logger.info(f"Program ready for {profile.profile_id} "
+                                f"({len(completed) + len(failed)}/{len(pending)})")
+                except Exception as e:
+                    failed.append(profile.profile_id)
+                    logger.error(f"Program generation failed for {profile.profile_id}: {str(e)}")
+                    _write_json_atomic(self._error_path(profile.profile_id), {
+                        "profile_id": profile.profile_id,
+                        "error": str(e),
+                        "failed_at": datetime.now().isoformat()
+                    })
+
+        elapsed = time.monotonic() - started
+        usage = {
+            key: self.generator.token_usage[key] - usage_before.get(key, 0)
+            for key in self.generator.token_usage
+        }
+        report = {
+            "run_id": self.run_id,
+            "completed": len(completed),
+            "failed": failed,
+            "elapsed_seconds": round(elapsed, 2),
+            "profiles_per_minute": round(len(completed) / elapsed * 60, 2) if elapsed else 0.0,
+            "token_usage": usage,
+            "estimated_cost_usd": round(estimate_cost(usage), 4)
+        }
+        _write_json_atomic(os.path.join(self.run_dir, "report.json"), report)
+        return report
+
+    def load_program(self, profile_id: str) -> Optional[Dict]:
+        """Read a persisted program for this run"""
+        path = self._result_path(profile_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generate weekly programs for every profile")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("PROGRAM_BATCH_CONCURRENCY", 4)))
+    parser.add_argument("--output-dir", default="programs")
+    parser.add_argument("--run-id", default=None, help="Resume a specific run (default: this ISO week)")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    runner = BatchProgramRunner(
+        output_dir=args.output_dir,
+        max_concurrency=args.concurrency,
+        run_id=args.run_id
+    )
+    print(json.dumps(runner.run(limit=args.limit), indent=2))
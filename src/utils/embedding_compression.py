@@ -0,0 +1,218 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+class EmbeddingCompressor:
+    """Reduced-precision and reduced-dimension encoding for embeddings.
+
+    Vectors are L2-normalised, optionally projected onto the top PCA components
+    fitted on the corpus, then stored as float16 or symmetric per-dimension int8.
+    Only int8 and PCA need ``fit``; float32/float16 encode straight away.
+    """
+
+    def __init__(self, precision: str = "float16", n_components: Optional[int] = None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+        self.precision = precision
+        self.n_components = n_components
+        self.components: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Stored dimension after any PCA reduction"""
+        if self.components is not None:
+            return self.components.shape[0]
+        if self.scale is not None:
+            return self.scale.shape[0]
+        return None
+
+    @property
+    def bytes_per_vector(self) -> int:
+        itemsize = np.dtype(self.precision).itemsize
+        return itemsize * (self.dimension or 0)
+
+    @property
+    def needs_fit(self) -> bool:
+        return self.precision == "int8" or bool(self.n_components)
+
+    def fit(self, embeddings) -> "EmbeddingCompressor":
+        """Fit PCA and quantization ranges on a sample of the corpus"""
+        matrix = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if self.n_components:
+            # Right singular vectors of the centred data are the principal axes
+            _, _, vt = np.linalg.svd(matrix - matrix.mean(axis=0), full_matrices=False)
+            self.components = vt[:self.n_components].astype(np.float32)
+        projected = self._project(matrix)
+        max_abs = np.abs(projected).max(axis=0)
+        self.scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        return self
+
+    def encode(self, embeddings) -> np.ndarray:
+        """Compress embeddings to the configured precision"""
+        self._check_fitted()
+        projected = self._project(_normalize(np.asarray(embeddings, dtype=np.float32)))
+        if self.precision == "int8":
+            return np.clip(np.rint(projected / self.scale), -127, 127).astype(np.int8)
+        return projected.astype(self.precision)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Expand compressed codes back to float32 in the stored space"""
+        self._check_fitted()
+        if self.precision == "int8":
+            return codes.astype(np.float32) * self.scale
+        return codes.astype(np.float32)
+
+    def reconstruct(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate the original (normalised) embeddings from their codes"""
+        decoded = self.decode(codes)
+        return decoded if self.components is None else decoded @ self.components
+
+    def project_query(self, query) -> np.ndarray:
+        """Map query vectors into the stored space without quantizing them"""
+        self._check_fitted()
+        return self._project(_normalize(np.asarray(query, dtype=np.float32)))
+
+    def scores(self, codes: np.ndarray, query) -> np.ndarray:
+        """Cosine scores of one query against a matrix of codes.
+
+        With PCA both sides are projected onto the same (uncentred) subspace,
+        so this approximates the cosine by the dot product of the projections.
+        """
+        q = self.project_query(query).reshape(-1)
+        if self.precision == "int8":
+            # Fold the dequantization scale into the query instead of the matrix
+            return codes.astype(np.float32) @ (q * self.scale)
+        return codes.astype(np.float32) @ q
+
+    def state(self) -> Dict[str, np.ndarray]:
+        state = {"precision": np.array(self.precision)}
+        if self.scale is not None:
+            state["scale"] = self.scale
+        if self.components is not None:
+            state["components"] = self.components
+        return state
+
+    @classmethod
+    def from_state(cls, state) -> "EmbeddingCompressor":
+        compressor = cls(precision=str(state["precision"]))
+        compressor.scale = state.get("scale")
+        if "components" in state:
+            compressor.components = state["components"]
+            compressor.n_components = compressor.components.shape[0]
+        return compressor
+
+    def _project(self, matrix: np.ndarray) -> np.ndarray:
+        if self.components is None:
+            return matrix
+        # Not centred: scores must stay dot products of the original vectors
+        return matrix @ self.components.T
+
+    def _check_fitted(self):
+        if self.needs_fit and self.scale is None:
+            raise RuntimeError("EmbeddingCompressor must be fitted before use")
+
+
+class CompressedVectorIndex:
+    """In-memory cosine index over compressed embeddings, persisted as .npz"""
+
+    def __init__(self, compressor: EmbeddingCompressor):
+        self.compressor = compressor
+        self.ids: List[str] = []
+        self.codes: Optional[np.ndarray] = None
+
+    def add(self, ids: List[str], embeddings):
+        codes = self.compressor.encode(embeddings)
+        self.codes = codes if self.codes is None else np.vstack([self.codes, codes])
+        self.ids.extend(ids)
+
+    def search(self, query, k: int = 3) -> List[Tuple[str, float]]:
+        """Return the top-k (id, score) pairs for a single query vector"""
+        if self.codes is None or not self.ids:
+            return []
+        scores = self.compressor.scores(self.codes, query)
+        k = min(k, len(self.ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.codes is None else self.codes.nbytes
+
+    def save(self, path: str):
+        np.savez(path, ids=np.array(self.ids), codes=self.codes, **self.compressor.state())
+
+    @classmethod
+    def load(cls, path: str) -> "CompressedVectorIndex":
+        with np.load(path, allow_pickle=False) as data:
+            state = {key: data[key] for key in data.files}
+        index = cls(EmbeddingCompressor.from_state(state))
+        index.ids = [str(i) for i in state["ids"]]
+        index.codes = state["codes"]
+        return index
+
+
+def recall_at_k(embeddings, queries, compressor: EmbeddingCompressor, k: int = 10) -> float:
+    """Fraction of the exact float32 top-k that the compressed index also returns"""
+    full = _normalize(np.asarray(embeddings, dtype=np.float32))
+    queries = _normalize(np.asarray(queries, dtype=np.float32))
+    codes = compressor.encode(full)
+    k = min(k, len(full))
+
+    hits = 0
+    for query in queries:
+        exact = np.argpartition(-(full @ query), k - 1)[:k]
+        approx = np.argpartition(-compressor.scores(codes, query), k - 1)[:k]
+        hits += len(set(exact.tolist()) & set(approx.tolist()))
+    return hits / (k * len(queries))
+
+
+def evaluate_compression(embeddings, queries, precision: str = "float16",
+                         n_components: Optional[int] = None, k: int = 10) -> Dict:
+    """Fit a compressor and report its size reduction and recall@k"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    compressor = EmbeddingCompressor(precision, n_components).fit(embeddings)
+    full_bytes = embeddings.shape[1] * np.dtype(np.float32).itemsize
+    return {
+        "precision": precision,
+        "n_components": n_components,
+        "bytes_per_vector": compressor.bytes_per_vector,
+        "compression_ratio": full_bytes / compressor.bytes_per_vector,
+        f"recall@{k}": recall_at_k(embeddings, queries, compressor, k),
+    }
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+if __name__ == "__main__":
+    import argparse
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Build a compressed local index from the Chroma knowledge base")
+    parser.add_argument("--precision", choices=PRECISIONS, default="int8")
+    parser.add_argument("--components", type=int, default=None, help="PCA dimensions (default: keep all)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default="local_index.npz")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path="./chroma_db")
+    collection = client.get_collection("ds_knowledge_base")
+    results = collection.get(include=["embeddings"])
+    embeddings = np.asarray(results["embeddings"], dtype=np.float32)
+
+    # Use a sample of the corpus itself as queries for the recall check
+    rng = np.random.default_rng(0)
+    sample = embeddings[rng.choice(len(embeddings), size=min(200, len(embeddings)), replace=False)]
+    report = evaluate_compression(embeddings, sample, args.precision, args.components, args.k)
+    print("Compression report:", report)
+
+    index = CompressedVectorIndex(EmbeddingCompressor(args.precision, args.components).fit(embeddings))
+    index.add(results["ids"], embeddings)
+    index.save(args.output)
+    print(f"Saved {len(index.ids)} vectors ({index.nbytes / 1e6:.1f} MB) to {args.output}")
@@ -0,0 +1,323 @@
+"""Persistent background jobs for growing the knowledge base.
+
+The app only enqueues: a job is one row in a local SQLite queue. Worker
+processes claim queued jobs, run them and write their progress back to the
+row, so the UI can poll a single SELECT while ingestion runs elsewhere.
+
+    python -m src.utils.ingestion_jobs enqueue data/new.pdf
+    python -m src.utils.ingestion_jobs worker --processes 2
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = "./ingestion_jobs.sqlite"
+# A running job whose worker hasn't reported for this long is assumed dead
+STALE_AFTER_SECONDS = 300
+# How often a worker touches its running job, whatever the handler is doing
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 3
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class JobQueue:
+    """Jobs with status and progress counters in SQLite, safe across processes"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("INGESTION_JOBS_PATH", DEFAULT_QUEUE_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                progress TEXT NOT NULL DEFAULT '{}',
+                error TEXT,
+                worker TEXT,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                heartbeat_at TEXT
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+
+    @staticmethod
+    def _job(row) -> Dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def enqueue(self, kind: str, payload: Dict) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, payload, created_at) VALUES (?, ?, ?)",
+                (kind, json.dumps(payload), _now())
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Atomically take the oldest queued job, or None if there is none"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                now = _now()
+                self._conn.execute(
+                    """UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                       started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?""",
+                    (worker, now, now, row["id"])
+                )
+                job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._job(job)
+
+    def update_progress(self, job_id: int, progress: Dict):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ?",
+                (json.dumps(progress), _now(), job_id)
+            )
+
+    def heartbeat(self, job_id: int):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (_now(), job_id))
+
+    def complete(self, job_id: int, progress: Dict = None):
+        with self._lock:
+            self._conn.execute(
+                """UPDATE jobs SET status = 'done', finished_at = ?,
+                   progress = COALESCE(?, progress) WHERE id = ?""",
+                (_now(), json.dumps(progress) if progress is not None else None, job_id)
+            )
+
+    def fail(self, job_id: int, error: str):
+        """Record a failure; the job is retried until it has used MAX_ATTEMPTS"""
+        with self._lock:
+            self._conn.execute(
+                """UPDATE jobs SET error = ?, finished_at = ?,
+                   status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END WHERE id = ?""",
+                (error, _now(), MAX_ATTEMPTS, job_id)
+            )
+
+    def requeue_stale(self, stale_after: float = STALE_AFTER_SECONDS) -> int:
+        """Put running jobs whose worker stopped reporting back in the queue"""
+        cutoff = (datetime.now() - timedelta(seconds=stale_after)).isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                """UPDATE jobs SET error = 'worker stopped responding',
+                   status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END
+                   WHERE status = 'running' AND heartbeat_at < ?""",
+                (MAX_ATTEMPTS, cutoff)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        """Most recent jobs first; cheap enough to poll on every rerun"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        self._conn.close()
+
+
+def enqueue_pdf(pdf_path: str, queue: JobQueue = None) -> int:
+    """Queue a PDF for ingestion into the knowledge base"""
+    return (queue or JobQueue()).enqueue("ingest_pdf", {"path": os.path.abspath(pdf_path)})
+
+
+def _ingest_pdf_job(payload: Dict, progress: Callable[[Dict], None]) -> Dict:
+    from src.utils.pdf_loader import ingest_pdf
+
+    return ingest_pdf(payload["path"], progress=progress)
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict, Callable[[Dict], None]], Dict]] = {
+    "ingest_pdf": _ingest_pdf_job,
+}
+
+
+def _run_with_heartbeat(queue: JobQueue, job_id: int, fn: Callable, interval: float):
+    """Run fn while a thread keeps the job's heartbeat fresh, so long steps aren't taken for a dead worker"""
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(interval):
+            queue.heartbeat(job_id)
+
+    thread = threading.Thread(target=beat, name=f"job-{job_id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        return fn()
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_worker(queue_path: str = None, poll_interval: float = 1.0, max_jobs: int = None,
+               stop_event=None, handlers: Dict = None, heartbeat_interval: float = HEARTBEAT_SECONDS) -> int:
+    """Claim and run jobs until stopped (or ``max_jobs`` are done); returns jobs run"""
+    queue = JobQueue(queue_path)
+    handlers = handlers or JOB_HANDLERS
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    while (max_jobs is None or processed < max_jobs) and not (stop_event and stop_event.is_set()):
+        queue.requeue_stale()
+        job = queue.claim(worker)
+        if job is None:
+            if max_jobs is not None:
+                break
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker} running job {job['id']} ({job['kind']})")
+        try:
+            handler = handlers[job["kind"]]
+            result = _run_with_heartbeat(
+                queue, job["id"],
+                lambda: handler(job["payload"], lambda p: queue.update_progress(job["id"], p)),
+                heartbeat_interval
+            )
+            queue.complete(job["id"], result)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}")
+            queue.fail(job["id"], str(e))
+        processed += 1
+    queue.close()
+    return processed
+
+
+def start_workers(processes: int = 1, queue_path: str = None, stop_event=None) -> List[multiprocessing.Process]:
+    """Start worker processes from a plain script or the CLI.
+
+    ``stop_event`` (a spawn-context Event) asks them to exit after their current job.
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(processes):
+        process = context.Process(
+            target=run_worker, kwargs={"queue_path": queue_path, "stop_event": stop_event}, daemon=True
+        )
+        process.start()
+        workers.append(process)
+    return workers
+
+
+def launch_worker_processes(processes: int = 1) -> subprocess.Popen:
+    """Run the workers as a separate ``python -m`` process tree.
+
+    Used from the Streamlit app, whose script must not be re-imported by
+    spawned children. The workers are stopped when this process exits, and
+    exit on their own if it dies without cleaning up.
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.utils.ingestion_jobs", "worker", "--processes", str(processes),
+         "--parent-pid", str(os.getpid())],
+        cwd=project_root
+    )
+    atexit.register(stop_worker_processes, process)
+    return process
+
+
+def stop_worker_processes(process: subprocess.Popen, timeout: float = 10.0):
+    """Ask a launched worker tree to finish its current jobs, killing it after ``timeout``"""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # Interrupted jobs go stale and are requeued by the next worker
+        process.kill()
+        process.wait()
+
+
+def _watch_parent(parent_pid: int, stop_event, interval: float = 1.0):
+    """Set stop_event once the launching process has gone (we are re-parented)"""
+    while not stop_event.is_set():
+        if os.getppid() != parent_pid:
+            logger.info(f"Parent process {parent_pid} exited; stopping workers")
+            stop_event.set()
+            return
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Knowledge base ingestion jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue_parser = commands.add_parser("enqueue", help="Queue PDFs for ingestion")
+    enqueue_parser.add_argument("paths", nargs="+")
+    worker_parser = commands.add_parser("worker", help="Run ingestion workers")
+    worker_parser.add_argument("--processes", type=int, default=int(os.getenv("INGESTION_WORKERS", 1)))
+    worker_parser.add_argument("--parent-pid", type=int, help="Stop when this process exits")
+    commands.add_parser("status", help="Show recent jobs")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        for path in args.paths:
+            print(f"Queued job {enqueue_pdf(path)} for {path}")
+    elif args.command == "worker":
+        stop = multiprocessing.get_context("spawn").Event()
+        # SIGTERM finishes the jobs in hand instead of abandoning them. The Event is
+        # set from another thread: the handler runs on the main thread, which may be
+        # inside stop.wait() holding the Event's lock
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=stop.set).start())
+        if args.parent_pid:
+            threading.Thread(target=_watch_parent, args=(args.parent_pid, stop), daemon=True).start()
+        if args.processes == 1:
+            run_worker(stop_event=stop)
+        else:
+            for process in start_workers(args.processes, stop_event=stop):
+                process.join()
+    else:
+        for job in JobQueue().recent():
+            print(f"{job['id']:>5} {job['status']:<8} {job['payload'].get('path', '')} {job['progress']}")
@@ -0,0 +1,288 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+from src.rag.context_packer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Lower values are scheduled first
+INTERACTIVE = 0
+BATCH = 1
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Continuously refilling bucket sized to a per-minute quota"""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        self._refill(now)
+        # A single request larger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMController:
+    """Shared admission control for LLM calls.
+
+    Calls wait in a priority queue until a concurrency slot is free and both
+    the request and token-per-minute buckets can cover them, so interactive
+    questions overtake queued batch work. Rate limit and transient errors are
+    retried with full-jitter exponential backoff, honouring Retry-After, and a
+    429 pauses admission for everyone rather than just the caller that hit it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 3500,
+        tokens_per_minute: float = 90000,
+        max_concurrency: int = 8,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.clock = clock
+        self.sleep = sleep
+        now = clock()
+        self.requests = TokenBucket(requests_per_minute, now)
+        self.tokens = TokenBucket(tokens_per_minute, now)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._counter = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+
+    def call(self, fn: Callable, *args, estimated_tokens: int = 0, priority: int = INTERACTIVE, **kwargs):
+        """Run fn under the controller, retrying rate limit and transient errors"""
+        attempt = 0
+        while True:
+            self._acquire(estimated_tokens, priority)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._release()
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"LLM call failed ({e}); retrying in {delay:.1f}s")
+                self.sleep(delay)
+                attempt += 1
+                continue
+            if kwargs.get("stream"):
+                # The slot stays taken until the stream is consumed or closed
+                return _HeldStream(self, result, estimated_tokens, kwargs.get("max_tokens", 0))
+            self._release()
+            self._reconcile(estimated_tokens, result)
+            return result
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _acquire(self, estimated_tokens: int, priority: int):
+        ticket = (priority, next(self._counter))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            while True:
+                now = self.clock()
+                wait = 0.0
+                if self._queue[0] == ticket and self._in_flight < self.max_concurrency:
+                    wait = max(
+                        self._paused_until - now,
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(estimated_tokens, now)
+                    )
+                    if wait <= 0:
+                        heapq.heappop(self._queue)
+                        self.requests.take(1, now)
+                        self.tokens.take(estimated_tokens, now)
+                        self._in_flight += 1
+                        # Let the next ticket re-check now that the head moved
+                        self._cond.notify_all()
+                        return
+                self._cond.wait(timeout=wait or None)
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _reconcile(self, estimated_tokens: int, result):
+        """Correct the token bucket once actual usage is known"""
+        usage = getattr(result, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if actual is not None:
+            self._settle(estimated_tokens, actual)
+
+    def _settle(self, estimated_tokens: int, actual: int):
+        with self._cond:
+            if actual < estimated_tokens:
+                self.tokens.refund(estimated_tokens - actual)
+            else:
+                self.tokens.take(actual - estimated_tokens, self.clock())
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if _status_code(error) == 429:
+            with self._cond:
+                self._paused_until = max(self._paused_until, self.clock() + delay)
+        return delay
+
+
+class _HeldStream:
+    """A streamed completion that holds its concurrency slot until exhausted or closed.
+
+    Token usage is reconciled from the final usage chunk when the API sends
+    one (``stream_options={"include_usage": True}``), otherwise from the
+    prompt part of the estimate plus one token per streamed chunk.
+    """
+
+    def __init__(self, controller: LLMController, stream, estimated_tokens: int, max_tokens: int):
+        self._controller = controller
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._estimated_tokens = estimated_tokens
+        self._max_tokens = max_tokens
+        self._chunks = 0
+        self._usage = None
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            chunk = next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+        if getattr(chunk, "usage", None) is not None:
+            self._usage = chunk.usage
+        if getattr(chunk, "choices", None):
+            self._chunks += 1
+        return chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        close = getattr(self._stream, "close", None)
+        try:
+            if close is not None:
+                close()
+        finally:
+            self._controller._release()
+            actual = getattr(self._usage, "total_tokens", None)
+            if actual is None:
+                actual = max(self._estimated_tokens - self._max_tokens, 0) + self._chunks
+            self._controller._settle(self._estimated_tokens, actual)
+
+    def __del__(self):
+        # An abandoned stream must not keep its slot forever
+        self.close()
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    if _status_code(error) in RETRYABLE_STATUS:
+        return True
+    # Connection resets and timeouts carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "RateLimitError")
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, if it said"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def estimate_tokens(messages, max_tokens: int = 0, model: str = "gpt-3.5-turbo") -> int:
+    """Estimate prompt plus completion tokens for admission control"""
+    if isinstance(messages, str):
+        prompt_tokens = count_tokens(messages, model)
+    else:
+        # Chat formatting adds a few tokens per message
+        prompt_tokens = sum(count_tokens(m["content"], model) + 4 for m in messages)
+    return prompt_tokens + max_tokens
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_llm_controller() -> LLMController:
+    """Return the process-wide controller configured from the environment.
+
+    The limits are for the whole API key; when LLM_QUOTA_SHARE processes use
+    the key at once (e.g. web.prefork workers), each takes that fraction.
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            share = max(1, int(os.getenv("LLM_QUOTA_SHARE", 1)))
+            _controller = LLMController(
+                requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", 3500)) / share,
+                tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", 90000)) / share,
+                max_concurrency=max(1, int(os.getenv("LLM_MAX_CONCURRENCY", 8)) // share)
+            )
+        return _controller
@@ -1,84 +1,84 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from transformers import (
-    DPRContextEncoder,
-    DPRContextEncoderTokenizer,
-)
 import os
-import torch
-from pinecone import Pinecone
+from typing import Callable, Dict, Optional
 from dotenv import load_dotenv
+from src.rag.backends import get_context_encoder, get_vector_index
+from src.rag.document_store import get_document_store
+from src.utils.tracing import span
 
 # Load environment variables
 load_dotenv()
 
-def load_pdfs_to_pinecone(pdf_directory):
-    # Initialize Pinecone
-    pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
-    index = pc.Index(os.getenv('PINECONE_INDEX_NAME'))
-    
-    # Initialize DPR context encoder
-    context_encoder = DPRContextEncoder.from_pretrained(
-        "facebook/dpr-ctx_encoder-single-nq-base"
-    )
-    context_tokenizer = DPRContextEncoderTokenizer.from_pretrained(
-        "facebook/dpr-ctx_encoder-single-nq-base"
-    )
-    
+def split_pdf(pdf_path):
+    """Load a PDF and split it into overlapping chunks; returns (pages, chunks)"""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
     # Initialize text splitter
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
         length_function=len,
     )
-    
+    pages = PyPDFLoader(pdf_path).load()
+    return pages, text_splitter.split_documents(pages)
+
+def ingest_pdf(pdf_path, index=None, store=None, encode=None, batch_size=100,
+               progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Embed one PDF's chunks and upsert them, reporting progress after each batch.
+
+    ``progress`` is called with running counts of pages, chunks and vectors.
+    """
+    index = index or get_vector_index()
+    # Chunk text is kept locally; vectors only carry source and page
+    store = store or get_document_store()
+    encode = encode or get_context_encoder()
+    filename = os.path.basename(pdf_path)
+
+    with span("ingest.split_pdf", source=filename):
+        pages, chunks = split_pdf(pdf_path)
+    counts = {"pages": len(pages), "chunks": len(chunks), "vectors": 0}
+    if progress:
+        progress(dict(counts))
+
+    # Process chunks in batches
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        with span("ingest.encode", chunks=len(batch)):
+            embeddings = encode([chunk.page_content for chunk in batch])
+        vectors, records = [], []
+        for i, (chunk, embedding) in enumerate(zip(batch, embeddings), start=start):
+            chunk_id = f"{filename}_chunk_{i}"
+            page = chunk.metadata.get('page', 0)
+            vectors.append({
+                "id": chunk_id,
+                "values": embedding.tolist(),
+                "metadata": {
+                    "source": filename,
+                    "page": page
+                }
+            })
+            records.append({
+                "id": chunk_id,
+                "text": chunk.page_content,
+                "source": filename,
+                "page": page
+            })
+        # Write text first so a query never sees an ID it can't hydrate
+        with span("ingest.store_text", chunks=len(records)):
+            store.put_many(records)
+        with span("ingest.upsert", vectors=len(vectors)):
+            index.upsert(vectors=vectors)
+        counts["vectors"] += len(vectors)
+        if progress:
+            progress(dict(counts))
+    return counts
+
+def load_pdfs_to_pinecone(pdf_directory):
     # Process each PDF in the directory
     for filename in os.listdir(pdf_directory):
         if filename.endswith('.pdf'):
-            pdf_path = os.path.join(pdf_directory, filename)
             print(f"Processing {filename}...")
-            
-            # Load PDF
-            loader = PyPDFLoader(pdf_path)
-            pages = loader.load()
-            
-            # Split text into chunks
-            chunks = text_splitter.split_documents(pages)
-            
-            # Process chunks in batches
-            batch_size = 100
-            vectors = []
-            
-            # Process each chunk
-            for i, chunk in enumerate(chunks):
-                # Create DPR embeddings
-                context_inputs = context_tokenizer(
-                    chunk.page_content,
-                    max_length=512,
-                    padding=True,
-                    truncation=True,
-                    return_tensors="pt"
-                )
-                with torch.no_grad():
-                    embedding = context_encoder(**context_inputs).pooler_output[0]
-                
-                # Prepare vector for Pinecone
-                vector = {
-                    "id": f"{filename}_chunk_{i}",
-                    "values": embedding.numpy().tolist(),
-                    "metadata": {
-                        "text": chunk.page_content,
-                        "source": filename,
-                        "page": chunk.metadata.get('page', 0)
-                    }
-                }
-                vectors.append(vector)
-                
-                # Upload batch if it's full or this is the last chunk
-                if len(vectors) >= batch_size or i == len(chunks) - 1:
-                    index.upsert(vectors=vectors)
-                    vectors = []  # Clear the batch
-            
+            ingest_pdf(os.path.join(pdf_directory, filename))
             print(f"Completed processing {filename}")
     
     print("All PDFs have been processed and stored in Pinecone!")
@@ -86,4 +86,4 @@ def load_pdfs_to_pinecone(pdf_directory):
 if __name__ == "__main__":
     # Use the data directory where PDFs are stored
     pdf_dir = "./data"
-    load_pdfs_to_pinecone(pdf_dir)
\ No newline at end of file
+    load_pdfs_to_pinecone(pdf_dir)
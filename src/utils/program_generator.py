@@ -1,8 +1,33 @@
-from typing import Dict, List, Optional
-import openai
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import json
+import logging
+import threading
 from datetime import datetime, timedelta
-from models.user_model import ChildProfile
-from rag_query import query_knowledge_base
+from src.models.user_model import ChildProfile
+from src.models.milestone_data import DEVELOPMENTAL_MILESTONES, MILESTONE_CATEGORIES, get_next_milestones
+from src.rag.rag_query_streamlit import generate_completion, query_knowledge_base, retrieve_contexts
+from src.rag.milestone_index import get_milestone_index
+from src.utils.llm_controller import BATCH
+
+logger = logging.getLogger(__name__)
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+DAY_SCHEMA = """{
+  "day": "<day name>",
+  "focus": "<milestone or skill targeted today>",
+  "activities": [
+    {
+      "name": "<short activity name>",
+      "description": "<step-by-step instructions for parents>",
+      "duration": "<e.g. 15 minutes>",
+      "materials": ["<item>"],
+      "progress_indicators": ["<what progress looks like>"]
+    }
+  ],
+  "rest_notes": "<rest periods and how to adapt if the child is tired>"
+}"""
 
 class DevelopmentProgram:
     def __init__(self, profile: ChildProfile):
@@ -19,14 +44,109 @@ class DevelopmentProgram:
             "last_assessment": self.last_assessment
         }
 
+def _index_focus_areas(focus_areas: List[str]):
+    """Split focus areas into milestone names, categories and ones the milestone index doesn't know"""
+    categories = {c.lower(): c for c in MILESTONE_CATEGORIES}
+    names = {m['name'].lower(): m['name'] for m in DEVELOPMENTAL_MILESTONES}
+    milestones, matched_categories, unmatched = [], [], []
+    for area in focus_areas:
+        key = area.strip().lower()
+        if key in categories:
+            matched_categories.append(categories[key])
+        elif key in names:
+            milestones.append(names[key])
+        else:
+            unmatched.append(area)
+    return milestones, matched_categories, unmatched
+
 class ProgramGenerator:
     def __init__(self):
         self.programs: Dict[str, DevelopmentProgram] = {}
+        # Token usage across all calls, for cost reporting
+        self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        self._usage_lock = threading.Lock()
 
-    def generate_weekly_program(self, profile: ChildProfile) -> Dict:
-        """Generate a personalized weekly program based on the child's profile"""
-        # Create context from profile and milestone data
-        context = f"""
+    def generate_weekly_program(
+        self,
+        profile: ChildProfile,
+        on_day_ready: Optional[Callable[[Dict], None]] = None,
+        max_parallel_days: int = len(DAYS),
+        day_retries: int = 2
+    ) -> List[Dict]:
+        """Generate a personalized weekly program based on the child's profile.
+
+        Knowledge comes from the precomputed milestone index when it matches the
+        current knowledge base and covers the focus areas, otherwise from one
+        live retrieval for the week. Each day is then generated as its own JSON
+        completion in parallel, and parsed as soon as it arrives.
+        ``on_day_ready`` is called with each finished day, in completion order.
+
+        A day whose completion fails is retried on its own, up to
+        ``day_retries`` times, without discarding the other days; after that
+        it is replaced by a light review day carrying the ``error``.
+        """
+        milestones = get_next_milestones(profile.age_months, 3)
+        profile_context = self._format_profile_context(profile)
+        
+        knowledge = self._week_knowledge(milestones, profile)
+        
+        focuses = {day: self._day_focus(i, milestones, profile) for i, day in enumerate(DAYS)}
+        days_by_name = {}
+        failures = {day: 0 for day in DAYS}
+        with ThreadPoolExecutor(max_workers=max_parallel_days) as executor:
+            def submit(day):
+                return executor.submit(self._generate_day, day, focuses[day], profile_context, knowledge)
+
+            pending = {submit(day): day for day in DAYS}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    day = pending.pop(future)
+                    try:
+                        day_program = future.result()
+                    except Exception as e:
+                        failures[day] += 1
+                        if failures[day] <= day_retries:
+                            logger.warning(f"Generating {day} failed ({str(e)}); retrying that day")
+                            pending[submit(day)] = day
+                            continue
+                        logger.error(f"Generating {day} failed {failures[day]} times; using a review day: {str(e)}")
+                        day_program = self._fallback_day(day, focuses[day], e)
+                    days_by_name[day] = day_program
+                    if on_day_ready:
+                        on_day_ready(day_program)
+        
+        weekly_program = [days_by_name[day] for day in DAYS]
+        
+        # Store the program
+        if profile.profile_id not in self.programs:
+            self.programs[profile.profile_id] = DevelopmentProgram(profile)
+        
+        self.programs[profile.profile_id].activities = weekly_program
+        
+        return weekly_program
+
+    def _week_knowledge(self, milestones: List[Dict], profile: ChildProfile) -> List[str]:
+        """Knowledge for the week's prompts, from the precomputed index when it is current"""
+        milestone_index = get_milestone_index()
+        if milestone_index is not None and milestones:
+            focus_milestones, focus_categories, unmatched = _index_focus_areas(profile.current_focus_areas)
+            # Free-text focus areas aren't in the index; a live retrieval covers them
+            if not unmatched:
+                return milestone_index.contexts_for(
+                    [m['name'] for m in milestones] + focus_milestones,
+                    categories=sorted({m['category'] for m in milestones} | set(focus_categories))
+                )
+        
+        # One live retrieval for the whole week, shared by every day's prompt
+        retrieval_query = "Activities for a child with Down syndrome working on: " + ", ".join(
+            [m['name'] for m in milestones] + profile.current_focus_areas
+        )
+        return retrieve_contexts(retrieval_query, top_k=5)
+
+    def _format_profile_context(self, profile: ChildProfile) -> str:
+        """Describe the child for the day prompts"""
+        return f"""
         Child Information:
         - Name: {profile.name}
         - Age: {profile.age_months} months
@@ -38,29 +158,75 @@ class ProgramGenerator:
         
         Current Milestones Working On:
         {self._format_current_milestones(profile)}
-        
-        Based on this information, create a detailed weekly program that:
-        1. Includes daily activities targeting current milestones
-        2. Considers the child's medical needs and limitations
-        3. Provides clear instructions for parents
-        4. Includes progress tracking metrics
-        5. Suggests fun and engaging activities
-        6. Incorporates rest periods and flexibility
         """
+
+    def _day_focus(self, day_index: int, milestones: List[Dict], profile: ChildProfile) -> str:
+        """Rotate the week's targets across days, keeping Sunday light"""
+        if DAYS[day_index] == "Sunday":
+            return "Gentle review of the week's activities and rest"
+        targets = [f"{m['name']} ({m['category']})" for m in milestones] + profile.current_focus_areas
+        if not targets:
+            return "Play-based activities appropriate for the child's age"
+        return targets[day_index % len(targets)]
+
+    def _generate_day(self, day: str, focus: str, profile_context: str, knowledge: List[str]) -> Dict:
+        """Generate and parse one day's activities"""
+        knowledge_text = "\n".join(f"Context {i+1}: {c}" for i, c in enumerate(knowledge))
+        messages = [
+            {"role": "system", "content": "You design home development activities for children with Down syndrome. Respond with JSON only."},
+            {"role": "user", "content": f"""{profile_context}
         
-        # Query the knowledge base for program generation
-        program_response = query_knowledge_base(context)
+        Relevant guidance from documents:
+        {knowledge_text}
         
-        # Structure the program response
-        weekly_program = self._structure_program(program_response)
+        Create the program for {day}, focusing on: {focus}.
+        Include 2-3 fun, engaging activities with clear instructions for parents,
+        consider the child's medical needs, and include rest periods.
         
-        # Store the program
-        if profile.profile_id not in self.programs:
-            self.programs[profile.profile_id] = DevelopmentProgram(profile)
+        Respond with a JSON object matching this schema:
+        {DAY_SCHEMA}"""}
+        ]
         
-        self.programs[profile.profile_id].activities = weekly_program
-        
-        return weekly_program
+        text, usage = generate_completion(
+            messages, max_tokens=700, priority=BATCH, response_format={"type": "json_object"}
+        )
+        self._record_usage(usage)
+        return self._parse_day(day, focus, text)
+
+    def _fallback_day(self, day: str, focus: str, error: Exception) -> Dict:
+        """A light day standing in for one that could not be generated"""
+        return {
+            "day": day,
+            "focus": focus,
+            "activities": [],
+            "rest_notes": "Repeat a favourite activity from earlier in the week, at the child's pace.",
+            "error": str(error)
+        }
+
+    def _parse_day(self, day: str, focus: str, text: str) -> Dict:
+        """Validate a day's JSON, falling back to the free-text structure"""
+        try:
+            data = json.loads(text)
+            activities = [
+                {
+                    "name": str(activity.get("name", "Activity")),
+                    "description": str(activity.get("description", "")),
+                    "duration": str(activity.get("duration", "30 minutes")),
+                    "materials": list(activity.get("materials", [])),
+                    "progress_indicators": list(activity.get("progress_indicators", []))
+                }
+                for activity in data.get("activities", [])
+            ]
+            return {
+                "day": day,
+                "focus": data.get("focus", focus),
+                "activities": activities,
+                "rest_notes": data.get("rest_notes", "")
+            }
+        except (ValueError, AttributeError, TypeError) as e:
+            logger.warning(f"Could not parse {day} program as JSON ({e}); keeping raw text")
+            activities = [a for entry in self._structure_program(text) for a in entry["activities"]]
+            return {"day": day, "focus": focus, "activities": activities, "rest_notes": ""}
 
     def assess_activity_completion(self, profile: ChildProfile, activity_log: str) -> Dict:
         """Assess the completion and effectiveness of activities"""
@@ -79,7 +245,7 @@ class ProgramGenerator:
         4. Recommendations for next activities
         """
         
-        assessment = query_knowledge_base(context)
+        assessment = self._ask(context)
         
         # Store the assessment
         if profile.profile_id in self.programs:
@@ -108,7 +274,7 @@ class ProgramGenerator:
         5. Signs of progress to look for
         """
         
-        return query_knowledge_base(context)
+        return self._ask(context)
 
     def adjust_program_difficulty(self, profile: ChildProfile, feedback: str) -> Dict:
         """Adjust program difficulty based on feedback"""
@@ -125,24 +291,40 @@ class ProgramGenerator:
         3. Additional support requirements
         """
         
-        adjustments = query_knowledge_base(context)
+        adjustments = self._ask(context)
         return {
             "adjustments": adjustments,
             "timestamp": datetime.now().isoformat()
         }
 
+    def _ask(self, context: str) -> str:
+        """Query the knowledge base at batch priority so interactive questions go first"""
+        response = query_knowledge_base(context, priority=BATCH)
+        if response['error']:
+            raise RuntimeError(f"Knowledge base query failed: {response['error']}")
+        self._record_usage(response.get('usage'))
+        return response['answer']
+
+    def _record_usage(self, usage: Optional[Dict]):
+        """Add one call's token usage to the running totals"""
+        if not usage:
+            return
+        with self._usage_lock:
+            for key in self.token_usage:
+                self.token_usage[key] += usage[key]
+
     def _format_recent_progress(self, profile: ChildProfile) -> str:
         """Format recent progress for context"""
         progress = []
-        for entry in profile.progress_history[-5:]:
+        for entry in profile.last_entries(5):
             progress.append(f"- {entry['date']}: {entry['milestone']}")
         return "\n".join(progress)
 
     def _format_current_milestones(self, profile: ChildProfile) -> str:
         """Format current milestones being worked on"""
         current = []
-        for milestone in profile.get_next_milestones(3):
-            current.append(f"- {milestone.name} ({milestone.category})")
+        for milestone in get_next_milestones(profile.age_months, 3):
+            current.append(f"- {milestone['name']} ({milestone['category']})")
         return "\n".join(current)
 
     def _structure_program(self, raw_program: str) -> List[Dict]:
@@ -0,0 +1,287 @@
+"""Structured query log: one JSON object per line, written off the request path.
+
+Callers hand records to ``QueryLog.log``, which only enqueues them. A
+background thread writes them in batches, rotates the file once it passes a
+size or age limit and gzips rotated files, keeping the most recent
+QUERY_LOG_BACKUPS. If the writer falls behind and the queue fills up,
+records are dropped (and counted) rather than slowing queries down.
+
+Several processes (prefork workers, the Streamlit app) may share one log:
+each batch is written and each rotation decided under an exclusive lock on
+``<path>.lock``, and a writer whose file was rotated away by another
+reopens the path before writing. The lock file's mtime marks when the live
+file was started, for the age limit. Without fcntl (Windows) the lock only
+serialises writers within one process.
+
+``iter_records`` reads the live file and the rotated ones, oldest first,
+for analytics and cache warming.
+
+    python -m src.utils.query_log import-legacy user_queries.txt
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = "./logs/queries.jsonl"
+_STOP = object()
+# Stands in for the file lock where fcntl is unavailable
+_process_lock = threading.Lock()
+
+
+def query_record(question: str, result: Dict, profile_id: str = None, source: str = None,
+                 timings: Dict = None, cached: bool = False) -> Dict:
+    """Build a log record from a query_knowledge_base / StreamingAnswer result"""
+    sources = result.get('sources') or []
+    usage = result.get('usage') or {}
+    return {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "source": source,
+        "profile_id": profile_id,
+        "question": question,
+        "answer": result.get('answer'),
+        "retrieved_ids": [s['id'] for s in sources],
+        "scores": [s['score'] for s in sources],
+        "timings_ms": timings if timings is not None else result.get('timings') or {},
+        "prompt_tokens": usage.get('prompt_tokens'),
+        "completion_tokens": usage.get('completion_tokens'),
+        "cached": cached,
+        "error": result.get('error'),
+    }
+
+
+class QueryLog:
+    def __init__(
+        self,
+        path: str = None,
+        max_bytes: int = None,
+        rotate_seconds: float = None,
+        backups: int = None,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000
+    ):
+        self.path = path or os.getenv("QUERY_LOG_PATH", DEFAULT_LOG_PATH)
+        self.max_bytes = max_bytes or int(os.getenv("QUERY_LOG_MAX_BYTES", 50 * 1024 * 1024))
+        self.rotate_seconds = rotate_seconds or float(os.getenv("QUERY_LOG_ROTATE_SECONDS", 24 * 3600))
+        self.backups = backups if backups is not None else int(os.getenv("QUERY_LOG_BACKUPS", 30))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._lock_fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+        self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, record: Dict) -> bool:
+        """Queue a record for writing; never blocks. Returns False if it was dropped."""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self):
+        """Block until every record queued so far is on disk"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the live file among every process writing it"""
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        else:
+            _process_lock.acquire()
+        try:
+            # Another writer may have rotated the file we have open
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current != os.fstat(self._file.fileno()).st_ino:
+                self._file.close()
+                self._open()
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            else:
+                _process_lock.release()
+
+    def _run(self):
+        self._open()
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            try:
+                with self._locked():
+                    if batch:
+                        self._write(batch)
+                    rotated = self._maybe_rotate()
+                # Compressing can take a while; other writers needn't wait for it
+                if rotated:
+                    self._compress(rotated)
+            except Exception as e:
+                logger.error(f"Query log write failed, {len(batch)} records lost: {str(e)}")
+            finally:
+                for _ in range(len(batch) + stopping):
+                    self._queue.task_done()
+        self._file.close()
+        os.close(self._lock_fd)
+
+    def _write(self, batch: List[Dict]):
+        self._file.write("".join(json.dumps(record, default=str) + "\n" for record in batch))
+        self._file.flush()
+
+    def _maybe_rotate(self) -> Optional[str]:
+        """Move the live file aside if it is due (call under the lock); returns its new name"""
+        size = os.fstat(self._file.fileno()).st_size
+        if not size:
+            return None
+        started = os.fstat(self._lock_fd).st_mtime
+        if size < self.max_bytes and time.time() - started < self.rotate_seconds:
+            return None
+        self._file.close()
+        rotated = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        os.replace(self.path, rotated)
+        self._open()
+        os.utime(self.path + ".lock")
+        return rotated
+
+    def _compress(self, rotated: str):
+        # Written under a temporary name so readers never see a partial .gz
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(rotated + ".gz.tmp", rotated + ".gz")
+        os.remove(rotated)
+        for stale in rotated_files(self.path)[:-self.backups or None]:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                # Pruned by another writer
+                pass
+
+
+def rotated_files(path: str) -> List[str]:
+    """Rotated, gzipped log files for ``path``, oldest first"""
+    return sorted(glob.glob(glob.escape(path) + ".*.gz"))
+
+
+def iter_records(path: str = None) -> Iterator[Dict]:
+    """Every record in the rotated files and the live log, oldest first"""
+    path = path or os.getenv("QUERY_LOG_PATH", DEFAULT_LOG_PATH)
+    files = rotated_files(path) + ([path] if os.path.exists(path) else [])
+    for name in files:
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(name, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    continue
+
+
+def parse_legacy_log(path: str) -> Iterator[Dict]:
+    """Records from the old free-text user_queries.txt format"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    pattern = r"\[(?P<ts>[^\]]+)\]\s*\nQuery: (?P<question>.*?)\nResponse: (?P<answer>.*?)\n-{20,}"
+    for match in re.finditer(pattern, text, flags=re.DOTALL):
+        yield {
+            "ts": datetime.strptime(match["ts"], "%Y-%m-%d %H:%M:%S").isoformat(timespec="milliseconds"),
+            "source": "legacy",
+            "profile_id": None,
+            "question": match["question"].strip(),
+            "answer": match["answer"].strip(),
+            "retrieved_ids": [],
+            "scores": [],
+            "timings_ms": {},
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "cached": False,
+            "error": None,
+        }
+
+
+_default_log: Optional[QueryLog] = None
+_default_log_lock = threading.Lock()
+
+
+def get_query_log() -> Optional[QueryLog]:
+    """The process-wide query log, or None when QUERY_LOG=0"""
+    global _default_log
+    if os.getenv("QUERY_LOG", "1") == "0":
+        return None
+    with _default_log_lock:
+        if _default_log is None:
+            _default_log = QueryLog()
+            atexit.register(_default_log.close)
+        return _default_log
+
+
+def log_query(question: str, result: Dict, **fields) -> bool:
+    """Queue a record on the process-wide query log (see ``query_record`` for fields)"""
+    query_log = get_query_log()
+    return query_log.log(query_record(question, result, **fields)) if query_log else False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query log utilities")
+    commands = parser.add_subparsers(dest="command", required=True)
+    legacy = commands.add_parser("import-legacy", help="Append a free-text user_queries.txt to the JSONL log")
+    legacy.add_argument("path")
+    args = parser.parse_args()
+
+    query_log = QueryLog()
+    count = sum(query_log.log(record) for record in parse_legacy_log(args.path))
+    query_log.close()
+    print(f"Imported {count} queries into {query_log.path}")
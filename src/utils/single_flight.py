@@ -0,0 +1,133 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterator
+
+
+class _Call:
+    """An in-flight computation whose result is shared by every caller"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.callers = 1
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    """Buffered fan-out of one iterator to any number of subscribers"""
+
+    def __init__(self):
+        self.items = []
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def publish(self, item):
+        with self.cond:
+            self.items.append(item)
+            self.cond.notify_all()
+
+    def finish(self, error: Exception = None):
+        with self.cond:
+            self.finished = True
+            self.error = error
+            self.cond.notify_all()
+
+    def subscribe(self) -> Iterator:
+        position = 0
+        while True:
+            with self.cond:
+                while position >= len(self.items) and not self.finished:
+                    self.cond.wait()
+                if position < len(self.items):
+                    item = self.items[position]
+                    position += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield item
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait and receive the same result (or exception). Once the
+    call completes the key is forgotten, so later calls run fresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn once for all concurrent callers with the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.callers += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn(*args, **kwargs)
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stream(self, key: Hashable, fn: Callable, *args, **kwargs) -> Iterator:
+        """Share one iterator among concurrent callers with the same key.
+
+        The source iterator is driven by a background thread so a subscriber
+        that stops early never stalls the others; late subscribers replay the
+        items produced so far before following the live stream.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._streams[key] = _Broadcast()
+
+        if leader:
+            threading.Thread(
+                target=self._pump,
+                args=(key, broadcast, fn, args, kwargs),
+                daemon=True
+            ).start()
+        return broadcast.subscribe()
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed"""
+        with self._lock:
+            return len(self._calls) + len(self._streams)
+
+    def callers(self, key: Hashable) -> int:
+        """Number of callers sharing the in-flight ``do`` call for key (0 if none)"""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.callers if call is not None else 0
+
+    def _pump(self, key, broadcast: _Broadcast, fn, args, kwargs):
+        try:
+            for item in fn(*args, **kwargs):
+                broadcast.publish(item)
+        except Exception as e:
+            broadcast.finish(e)
+        else:
+            broadcast.finish()
+        finally:
+            with self._lock:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
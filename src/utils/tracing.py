@@ -0,0 +1,256 @@
+"""Lightweight per-stage latency tracing for the RAG pipeline.
+
+Wrap a stage in ``span``:
+
+    with span("index.query", top_k=top_k):
+        results = index.query(...)
+
+Enabled with RAGSTEPS_TRACING=1, every finished span adds its duration to a
+per-stage histogram (p50/p95/p99 via ``get_tracer().summary()``, Prometheus
+text via ``to_prometheus()``) and is kept in a bounded buffer that
+``export_spans()`` drains as OpenTelemetry (OTLP/JSON) spans. Spans opened
+inside another span on the same thread or task become its children.
+
+Disabled (the default), ``span`` returns one shared no-op context manager,
+so an instrumented stage costs a global lookup and a function call.
+"""
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Optional
+import os
+import random
+import threading
+import time
+
+# Upper bounds in seconds, roughly log-spaced from 0.5 ms to 2 minutes
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+MAX_BUFFERED_SPANS = 10000
+
+
+class LatencyHistogram:
+    """Bucketed durations for one stage; percentiles interpolate within a bucket"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Optional["Span"]] = ContextVar("ragsteps_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attributes", "trace_id", "span_id", "parent_id",
+                 "start_ns", "end_ns", "error", "_start", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.error = None
+        parent = _current.get()
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = f"{random.getrandbits(64):016x}"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(duration * 1e9)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        self.tracer._finish(self, duration)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled: bool = None, max_spans: int = MAX_BUFFERED_SPANS):
+        if enabled is None:
+            enabled = os.getenv("RAGSTEPS_TRACING", "0").lower() not in ("0", "", "false", "off")
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def _finish(self, span: "Span", duration: float):
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = LatencyHistogram()
+            histogram.observe(duration)
+            self._spans.append(span)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per-stage count, mean and p50/p95/p99/max in milliseconds"""
+        with self._lock:
+            return {
+                name: {
+                    "count": h.count,
+                    "mean_ms": round(h.total / h.count * 1000, 3),
+                    "p50_ms": round(h.percentile(0.50) * 1000, 3),
+                    "p95_ms": round(h.percentile(0.95) * 1000, 3),
+                    "p99_ms": round(h.percentile(0.99) * 1000, 3),
+                    "max_ms": round(h.max * 1000, 3),
+                }
+                for name, h in sorted(self.histograms.items()) if h.count
+            }
+
+    def to_prometheus(self, labels: Dict[str, str] = None) -> str:
+        """Histograms in the Prometheus text exposition format.
+
+        ``labels`` are added to every series, e.g. a worker ID when several
+        processes serve the same scrape target and each keeps its own counts.
+        """
+        metric = "ragsteps_stage_duration_seconds"
+        extra = "".join(f',{key}="{value}"' for key, value in (labels or {}).items())
+        lines = [f"# HELP {metric} Duration of RAG pipeline stages", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                series = f'stage="{name}"{extra}'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{series},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{series}}} {h.total}')
+                lines.append(f'{metric}_count{{{series}}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def export_spans(self, service_name: str = "ragsteps") -> Dict:
+        """Drain buffered spans as an OTLP/JSON ExportTraceServiceRequest body"""
+        with self._lock:
+            spans, self._spans = list(self._spans), deque(maxlen=self._spans.maxlen)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "ragsteps.tracing"},
+                "spans": [_otlp_span(s) for s in spans],
+            }],
+        }]}
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self._spans.clear()
+
+
+def _attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: "Span") -> Dict:
+    exported = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        exported["parentSpanId"] = span.parent_id
+    return exported
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    """Swap the process-wide tracer, e.g. to enable tracing in a benchmark"""
+    global _tracer
+    _tracer = tracer
+
+
+def start_otlp_exporter(endpoint: str = None, interval: float = 10.0) -> threading.Thread:
+    """Push buffered spans to an OTLP/HTTP collector (``<endpoint>/v1/traces``) every ``interval`` seconds"""
+    import json
+    import logging
+    import urllib.request
+
+    endpoint = (endpoint or os.getenv("RAGSTEPS_OTLP_ENDPOINT", "http://localhost:4318")).rstrip("/")
+    logger = logging.getLogger(__name__)
+
+    def push():
+        while True:
+            time.sleep(interval)
+            body = _tracer.export_spans()
+            if not body["resourceSpans"][0]["scopeSpans"][0]["spans"]:
+                continue
+            request = urllib.request.Request(
+                f"{endpoint}/v1/traces", data=json.dumps(body).encode("utf-8"),
+                headers={"Content-Type": "application/json"}
+            )
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except OSError as e:
+                logger.warning(f"Dropped spans, OTLP export failed: {str(e)}")
+
+    thread = threading.Thread(target=push, name="otlp-exporter", daemon=True)
+    thread.start()
+    return thread
+
+
+def span(name: str, **attributes):
+    """Context manager timing one pipeline stage (a no-op unless tracing is enabled)"""
+    if not _tracer.enabled:
+        return _NOOP
+    return Span(_tracer, name, attributes)
+
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from typing import Dict
+
+import pytest
+
+from src.models import profile_payload
+from src.rag import backends, document_store
+from src.rag.document_store import DocumentStore
+
+PASSAGES = {
+    "guide.pdf_chunk_0": "Physiotherapy helps children with Down syndrome build muscle tone for walking.",
+    "guide.pdf_chunk_1": "Speech therapy and signing support early language and first words.",
+    "guide.pdf_chunk_2": "Regular thyroid checks are part of the preventative medical checklist.",
+}
+
+
+def profile_data(profile_id: str = "child_1", name: str = None, date_of_birth: str = "2022-01-01",
+                 age_months: int = None, focus=("Walking",), medical=(), milestones: Dict = None,
+                 progress_entries: int = 0) -> Dict:
+    """A profile dict shaped like ChildProfile.to_dict(); ``age_months`` overrides the date of birth"""
+    if age_months is not None:
+        date_of_birth = (datetime.now() - timedelta(days=30 * age_months + 5)).date().isoformat()
+    return {
+        "profile_id": profile_id,
+        "name": name or profile_id,
+        "date_of_birth": date_of_birth,
+        "medical_considerations": list(medical),
+        "current_focus_areas": list(focus),
+        "milestones": milestones or {},
+        "progress_history": [
+            {"date": f"2024-01-{i % 28 + 1:02d}", "milestone": "Walking", "note": f"Took {i} steps"}
+            for i in range(progress_entries)
+        ],
+    }
+
+
+@pytest.fixture
+def passages():
+    """Indexed by ``fake_backend``; override in a test module for other documents"""
+    return PASSAGES
+
+
+@pytest.fixture
+def fake_backend(monkeypatch, tmp_path, passages):
+    monkeypatch.setenv("RAGSTEPS_BACKEND", "fake")
+    backends.reset_backends()
+    store = DocumentStore(str(tmp_path / "docs.sqlite"))
+    monkeypatch.setattr(document_store, "_default_store", store)
+
+    encoder = backends.get_question_encoder()
+    index = backends.get_vector_index()
+    index.upsert([{"id": i, "values": encoder(text)} for i, text in passages.items()])
+    store.put_many([{"id": i, "text": text} for i, text in passages.items()])
+    yield index
+    backends.reset_backends()
+
+
+@pytest.fixture(autouse=True)
+def payload_store(monkeypatch, tmp_path):
+    """Keep profile payloads written by tests out of the working directory"""
+    store = profile_payload.ProfilePayloadStore(str(tmp_path / "payloads.sqlite"))
+    monkeypatch.setattr(profile_payload, "_default_store", store)
+    yield store
+    store.close()
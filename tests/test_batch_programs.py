@@ -0,0 +1,48 @@
+import json
+import os
+
+from src.models.user_model import ChildProfile, UserManager
+from src.utils.batch_programs import BatchProgramRunner
+
+
+class FlakyGenerator:
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        self.calls = []
+
+    def generate_weekly_program(self, profile):
+        self.calls.append(profile.profile_id)
+        if profile.profile_id in self.fail_ids:
+            raise RuntimeError("rate limited")
+        self.token_usage["prompt_tokens"] += 1000
+        self.token_usage["completion_tokens"] += 500
+        return [{"day": "Monday", "activities": []}]
+
+
+def _manager(tmp_path, count=5):
+    manager = UserManager(data_dir=str(tmp_path / "user_data"))
+    for i in range(count):
+        manager.add_profile(ChildProfile(name=f"Child {i}", date_of_birth="2022-01-01", profile_id=f"child_{i}"))
+    return manager
+
+
+def test_batch_persists_and_resumes_after_failures(tmp_path):
+    manager = _manager(tmp_path)
+    output_dir = str(tmp_path / "programs")
+
+    first = BatchProgramRunner(manager, FlakyGenerator(fail_ids={"child_3"}), output_dir, 3, run_id="run")
+    report = first.run()
+    assert report["completed"] == 4
+    assert report["failed"] == ["child_3"]
+    assert report["estimated_cost_usd"] > 0
+    assert os.path.exists(os.path.join(output_dir, "run", "child_3.error.json"))
+
+    retry_generator = FlakyGenerator()
+    second = BatchProgramRunner(manager, retry_generator, output_dir, 3, run_id="run")
+    report = second.run()
+    assert retry_generator.calls == ["child_3"]
+    assert report["completed"] == 1
+    assert not os.path.exists(os.path.join(output_dir, "run", "child_3.error.json"))
+    with open(os.path.join(output_dir, "run", "child_3.json")) as f:
+        assert json.load(f)["program"][0]["day"] == "Monday"
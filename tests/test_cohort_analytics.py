@@ -0,0 +1,43 @@
+from datetime import date
+
+from src.models.cohort_analytics import CohortAnalytics
+from src.models.user_model import ChildProfile, UserManager
+
+
+def _dob(age_months):
+    today = date.today()
+    months = today.year * 12 + today.month - 1 - age_months
+    return date(months // 12, months % 12 + 1, 1).isoformat()
+
+
+def _rate(rows, band, category):
+    return next(r for r in rows if r["age_band"] == band and r["category"] == category)
+
+
+def test_builds_from_store_and_updates_incrementally(tmp_path):
+    manager = UserManager(data_dir=str(tmp_path / "user_data"))
+    for i, age in enumerate([14, 18, 30]):
+        profile = ChildProfile(name=f"Child {i}", date_of_birth=_dob(age), profile_id=f"child_{i}")
+        profile.add_milestone("Sitting", "Gross Motor", completed_date=_dob(age - 10))
+        manager.add_profile(profile)
+
+    analytics = CohortAnalytics.from_store(manager.store)
+    manager.add_listener(analytics.record_event)
+    rows = analytics.completion_rates()
+    toddlers = _rate(rows, "12-23 months", "Gross Motor")
+    assert (toddlers["children"], toddlers["completed"]) == (2, 2)
+    assert 0 < toddlers["rate"] < 1
+    assert _rate(rows, "24-35 months", "Speech and Language")["completed"] == 0
+    assert analytics.median_completion_age() == {"Sitting": 10.0}
+
+    profile = manager.get_profile("child_0")
+    manager.record_milestone(profile, "First Words", "Speech and Language", completed_date=_dob(2))
+    manager.record_milestone(profile, "Sitting", "Gross Motor")
+    assert _rate(analytics.completion_rates(), "12-23 months", "Speech and Language")["completed"] == 1
+    assert _rate(analytics.completion_rates(), "12-23 months", "Gross Motor")["completed"] == 2
+
+    manager.add_profile(ChildProfile(name="New", date_of_birth=_dob(20), profile_id="child_9"))
+    assert _rate(analytics.completion_rates(), "12-23 months", "Gross Motor")["children"] == 3
+
+    analytics.remove_profile("child_1")
+    assert _rate(analytics.completion_rates(), "12-23 months", "Gross Motor")["completed"] == 1
@@ -0,0 +1,32 @@
+from src.rag.context_packer import count_tokens, pack_contexts
+
+
+def test_highest_scores_packed_first():
+    packed = pack_contexts(["low score chunk.", "high score chunk."], scores=[0.1, 0.9], budget=100)
+    assert packed == ["high score chunk.", "low score chunk."]
+
+
+def test_chunk_overlap_is_removed():
+    shared = "Children with Down syndrome often benefit from early physiotherapy. "
+    first = "Motor skills develop at their own pace. " + shared
+    second = shared + "Speech therapy can start in the first year."
+
+    packed = pack_contexts([first, second], scores=[0.9, 0.8], budget=1000)
+
+    assert packed[0] == first.strip()
+    assert packed[1] == "Speech therapy can start in the first year."
+
+
+def test_duplicate_chunks_are_dropped():
+    assert pack_contexts(["Same text here.", "Same text here."], budget=100) == ["Same text here."]
+
+
+def test_last_chunk_is_trimmed_at_sentence_boundary():
+    first = "A" * 40 + "."
+    second = "First sentence fits. " + "Second sentence is much too long to fit " * 5 + "."
+    budget = count_tokens(first) + count_tokens("First sentence fits. ")
+
+    packed = pack_contexts([first, second], scores=[1.0, 0.5], budget=budget)
+
+    assert packed == [first, "First sentence fits."]
+    assert sum(count_tokens(text) for text in packed) <= budget
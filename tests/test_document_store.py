@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from src.rag.document_store import DocumentStore, hydrate_matches
+
+
+def test_round_trip_and_missing_ids(tmp_path):
+    store = DocumentStore(str(tmp_path / "docs.sqlite"))
+    store.put_many([
+        {"id": "a.pdf_chunk_0", "text": "First chunk", "source": "a.pdf", "page": 0},
+        {"id": "a.pdf_chunk_1", "text": "Second chunk", "source": "a.pdf", "page": 1},
+    ])
+
+    assert store.count() == 2
+    assert store.get_texts(["a.pdf_chunk_1", "missing", "a.pdf_chunk_0"]) == [
+        "Second chunk", None, "First chunk"
+    ]
+
+
+def test_version_changes_on_write(tmp_path):
+    store = DocumentStore(str(tmp_path / "docs.sqlite"))
+    before = store.kb_version()
+    store.put_many([{"id": "x", "text": "text"}])
+    after = store.kb_version()
+    assert before != after
+    store.delete(["x"])
+    assert store.kb_version() != after
+
+
+def test_hydrate_falls_back_to_index_metadata(tmp_path):
+    store = DocumentStore(str(tmp_path / "docs.sqlite"))
+    store.put_many([{"id": "new", "text": "stored locally"}])
+
+    class LegacyIndex:
+        def fetch(self, ids):
+            return SimpleNamespace(vectors={
+                i: SimpleNamespace(metadata={"text": f"legacy {i}"}) for i in ids
+            })
+
+    matches = [SimpleNamespace(id="new", score=0.9), SimpleNamespace(id="old", score=0.5)]
+    hydrated = hydrate_matches(matches, index=LegacyIndex(), store=store)
+    assert [m["text"] for m in hydrated] == ["stored locally", "legacy old"]
+    assert [m["score"] for m in hydrated] == [0.9, 0.5]
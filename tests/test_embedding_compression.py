@@ -0,0 +1,52 @@
+import numpy as np
+
+from src.utils.embedding_compression import (
+    CompressedVectorIndex,
+    EmbeddingCompressor,
+    evaluate_compression,
+)
+
+
+def _corpus(n=300, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_precisions_shrink_storage_and_keep_recall():
+    corpus = _corpus()
+    queries = corpus[:20]
+
+    half = evaluate_compression(corpus, queries, "float16", k=5)
+    quarter = evaluate_compression(corpus, queries, "int8", k=5)
+
+    assert half["compression_ratio"] == 2
+    assert quarter["compression_ratio"] == 4
+    assert half["recall@5"] > 0.95
+    assert quarter["recall@5"] > 0.8
+
+
+def test_pca_reduces_dimension_and_keeps_recall():
+    # Low-rank data with an offset, like real embeddings sharing a common direction
+    rng = np.random.default_rng(1)
+    corpus = rng.normal(size=(300, 12)) @ rng.normal(size=(12, 64)) + 3 * rng.normal(size=64)
+    corpus = (corpus + 0.05 * rng.normal(size=corpus.shape)).astype(np.float32)
+    compressor = EmbeddingCompressor("int8", n_components=16).fit(corpus)
+    assert compressor.encode(corpus).shape == (300, 16)
+    assert compressor.bytes_per_vector == 16
+
+    report = evaluate_compression(corpus, corpus[:30], "float16", n_components=16, k=5)
+    assert report["recall@5"] > 0.9
+
+
+def test_index_round_trip(tmp_path):
+    corpus = _corpus(n=50)
+    ids = [f"chunk_{i}" for i in range(50)]
+    index = CompressedVectorIndex(EmbeddingCompressor("float16").fit(corpus))
+    index.add(ids, corpus)
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = CompressedVectorIndex.load(path)
+
+    assert loaded.search(corpus[7], k=1)[0][0] == "chunk_7"
+    assert loaded.ids == ids
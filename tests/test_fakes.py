@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.rag.fakes import FakeChatClient, FakeEncoder, FakeVectorIndex, LatencyModel
+from src.rag.record_replay import RecordingChatClient, RecordingStore, ReplayChatClient
+
+def test_fake_index_filters_and_ranks_by_cosine():
+    index = FakeVectorIndex()
+    index.upsert([
+        {"id": "a", "values": [1, 0], "metadata": {"type": "profile", "age_months": 12}},
+        {"id": "b", "values": [0.9, 0.1], "metadata": {"type": "profile", "age_months": 30}},
+        {"id": "c", "values": [0, 1], "metadata": {"type": "chunk"}},
+    ], namespace="profiles")
+
+    results = index.query(vector=[1, 0], top_k=3, filter={"type": "profile"}, namespace="profiles")
+    assert [m.id for m in results.matches] == ["a", "b"]
+
+    results = index.query(vector=[1, 0], top_k=3, filter={"age_months": {"$gte": 24}}, namespace="profiles")
+    assert [m.id for m in results.matches] == ["b"]
+
+
+def test_fake_index_save_and_load(tmp_path):
+    index = FakeVectorIndex()
+    index.upsert([{"id": "a", "values": [1, 0]}, {"id": "b", "values": [0, 1]}])
+    index.save(str(tmp_path / "index.npz"))
+    loaded = FakeVectorIndex.load(str(tmp_path / "index.npz"))
+    assert loaded.query(vector=[0, 1], top_k=1).matches[0].id == "b"
+
+    FakeVectorIndex().save(str(tmp_path / "empty.npz"))
+    assert FakeVectorIndex.load(str(tmp_path / "empty.npz")).describe_index_stats().total_vector_count == 0
+
+
+def test_fake_encoder_is_deterministic_and_topical():
+    encoder = FakeEncoder(128)
+    a = encoder("walking and muscle tone")
+    assert np.allclose(a, encoder("walking and muscle tone"))
+    assert a @ encoder("muscle tone for walking") > a @ encoder("thyroid checklist")
+
+
+def test_query_knowledge_base_runs_offline(fake_backend):
+    from src.rag.rag_query_streamlit import query_knowledge_base, stream_knowledge_base
+
+    result = query_knowledge_base("How can physiotherapy help with walking?", top_k=1)
+    assert result["error"] is None
+    assert "Physiotherapy" in result["contexts"][0]
+    assert result["answer"].startswith("According to the documents")
+
+    stream = stream_knowledge_base("How can physiotherapy help with walking?", top_k=1)
+    assert "".join(stream) == result["answer"]
+
+
+def test_record_then_replay(tmp_path):
+    store = RecordingStore(str(tmp_path / "recordings.jsonl"))
+    live = RecordingChatClient(FakeChatClient(), store)
+    request = {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "Context 1: hello there"}]}
+    recorded = live.chat.completions.create(**request).choices[0].message.content
+    streamed = "".join(
+        c.choices[0].delta.content for c in live.chat.completions.create(stream=True, **request)
+    )
+
+    replay = ReplayChatClient(RecordingStore(store.path), ttft=LatencyModel("constant:0"))
+    assert replay.chat.completions.create(**request).choices[0].message.content == recorded
+    assert "".join(
+        c.choices[0].delta.content for c in replay.chat.completions.create(stream=True, **request)
+    ) == streamed
@@ -0,0 +1,88 @@
+import time
+
+from src.utils import ingestion_jobs
+from src.utils.ingestion_jobs import (
+    MAX_ATTEMPTS,
+    JobQueue,
+    enqueue_pdf,
+    launch_worker_processes,
+    run_worker,
+    stop_worker_processes,
+)
+
+
+def test_worker_runs_jobs_and_reports_progress(tmp_path):
+    queue_path = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(queue_path)
+    job_id = enqueue_pdf(str(tmp_path / "guide.pdf"), queue)
+    seen = []
+
+    def handler(payload, progress):
+        progress({"pages": 2, "chunks": 5, "vectors": 0})
+        seen.append(queue.get(job_id)["progress"])
+        return {"pages": 2, "chunks": 5, "vectors": 5}
+
+    assert run_worker(queue_path, max_jobs=5, handlers={"ingest_pdf": handler}) == 1
+    job = queue.get(job_id)
+    assert seen == [{"pages": 2, "chunks": 5, "vectors": 0}]
+    assert job["status"] == "done"
+    assert job["progress"]["vectors"] == 5
+    assert job["payload"]["path"].endswith("guide.pdf")
+    assert queue.counts() == {"done": 1}
+
+
+def test_failed_jobs_retry_then_fail(tmp_path):
+    queue_path = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(queue_path)
+    job_id = queue.enqueue("ingest_pdf", {"path": "missing.pdf"})
+
+    def handler(payload, progress):
+        raise FileNotFoundError(payload["path"])
+
+    assert run_worker(queue_path, max_jobs=10, handlers={"ingest_pdf": handler}) == MAX_ATTEMPTS
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == MAX_ATTEMPTS
+    assert "missing.pdf" in job["error"]
+
+
+def test_stale_running_jobs_are_requeued(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    first = queue.enqueue("ingest_pdf", {"path": "a.pdf"})
+    queue.enqueue("ingest_pdf", {"path": "b.pdf"})
+    assert queue.claim("dead-worker")["id"] == first
+    assert queue.requeue_stale(stale_after=60) == 0
+    assert queue.requeue_stale(stale_after=-1) == 1
+    assert queue.get(first)["status"] == "queued"
+    assert queue.claim("worker")["id"] == first
+    assert [job["id"] for job in queue.recent(1)] == [first + 1]
+
+
+def test_ingest_pdf_handler_is_registered():
+    assert ingestion_jobs.JOB_HANDLERS["ingest_pdf"] is ingestion_jobs._ingest_pdf_job
+
+
+def test_heartbeat_keeps_long_jobs_from_going_stale(tmp_path):
+    queue_path = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(queue_path)
+    queue.enqueue("ingest_pdf", {"path": "big.pdf"})
+    requeued = []
+
+    def slow_handler(payload, progress):
+        # No progress reports for longer than the stale cutoff
+        time.sleep(0.5)
+        requeued.append(queue.requeue_stale(stale_after=0.3))
+        return {}
+
+    run_worker(queue_path, max_jobs=1, handlers={"ingest_pdf": slow_handler}, heartbeat_interval=0.05)
+    assert requeued == [0]
+    assert queue.counts() == {"done": 1}
+
+
+def test_launched_workers_stop_cleanly(tmp_path, monkeypatch):
+    monkeypatch.setenv("INGESTION_JOBS_PATH", str(tmp_path / "jobs.sqlite"))
+    process = launch_worker_processes(1)
+    time.sleep(0.5)
+    assert process.poll() is None
+    stop_worker_processes(process, timeout=10)
+    assert process.returncode == 0
@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils.llm_controller import BATCH, INTERACTIVE, LLMController
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+def test_retries_honour_retry_after():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    controller = LLMController(clock=lambda: now[0], sleep=sleep, base_delay=0.001)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited(retry_after=2)
+        return "ok"
+
+    assert controller.call(flaky) == "ok"
+    assert len(attempts) == 3
+    assert all(delay >= 2 for delay in sleeps)
+
+
+def test_non_retryable_errors_propagate():
+    controller = LLMController(sleep=lambda _: None)
+    with pytest.raises(KeyError):
+        controller.call(lambda: {}["missing"])
+
+
+def test_interactive_calls_overtake_queued_batch_calls():
+    controller = LLMController(max_concurrency=1)
+    gate = threading.Event()
+    order = []
+
+    def blocker():
+        gate.wait(timeout=5)
+
+    first = threading.Thread(target=controller.call, args=(blocker,))
+    first.start()
+    time.sleep(0.05)
+
+    batch = threading.Thread(target=controller.call, args=(lambda: order.append("batch"),), kwargs={"priority": BATCH})
+    batch.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=controller.call, args=(lambda: order.append("interactive"),), kwargs={"priority": INTERACTIVE})
+    interactive.start()
+    time.sleep(0.05)
+
+    gate.set()
+    for thread in (first, batch, interactive):
+        thread.join(timeout=5)
+    assert order == ["interactive", "batch"]
+
+
+def test_token_bucket_delays_calls_over_quota():
+    now = [0.0]
+    controller = LLMController(tokens_per_minute=600, clock=lambda: now[0])
+    controller.call(lambda: None, estimated_tokens=600)
+    # Bucket is empty; a further 60 tokens needs six seconds of refill
+    assert controller.tokens.wait_time(60, now[0]) == pytest.approx(6.0)
+
+
+def test_streams_hold_their_slot_until_consumed():
+    controller = LLMController(max_concurrency=1, tokens_per_minute=1000)
+
+    def chunks(usage=None, **request):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="a"))])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="b"))])
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+    stream = controller.call(chunks, stream=True, max_tokens=100, estimated_tokens=300)
+    assert controller._in_flight == 1
+    assert [c.choices[0].delta.content for c in stream] == ["a", "b"]
+    assert controller._in_flight == 0
+    # No usage chunk: the 200 prompt tokens of the estimate plus two streamed chunks
+    assert controller.tokens.level == pytest.approx(1000 - 202, abs=1)
+
+    controller.call(chunks, SimpleNamespace(total_tokens=50), stream=True, estimated_tokens=300).close()
+    assert controller._in_flight == 0
+
+    usage = SimpleNamespace(total_tokens=50)
+    before = controller.tokens.level
+    list(controller.call(chunks, usage, stream=True, estimated_tokens=300))
+    assert controller.tokens.level == pytest.approx(before - 50, abs=1)
+
+
+def test_quota_is_split_between_processes(monkeypatch):
+    from src.utils import llm_controller
+
+    monkeypatch.setattr(llm_controller, "_controller", None)
+    monkeypatch.setenv("LLM_REQUESTS_PER_MINUTE", "1000")
+    monkeypatch.setenv("LLM_TOKENS_PER_MINUTE", "80000")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "8")
+    monkeypatch.setenv("LLM_QUOTA_SHARE", "4")
+    controller = llm_controller.get_llm_controller()
+    assert controller.requests.capacity == 250
+    assert controller.tokens.capacity == 20000
+    assert controller.max_concurrency == 2
@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.models.milestone_data import (
+    DEVELOPMENTAL_MILESTONES,
+    MILESTONE_CATEGORIES,
+    get_milestones_by_age_range,
+    get_milestones_by_category,
+    get_next_milestones,
+    get_next_milestones_batch,
+    next_milestone_indices,
+)
+
+
+def _linear_next_milestones(age, limit):
+    def months(age_range):
+        start, end = age_range.split("-")
+        return int(start.strip().split()[0]), int(end.strip().split()[0])
+
+    found = [m for m in DEVELOPMENTAL_MILESTONES if months(m["age_range"])[0] <= age <= months(m["age_range"])[1] + 3]
+    found.sort(key=lambda m: months(m["age_range"])[0])
+    return found[:limit]
+
+
+def test_indexed_lookups_match_linear_scans():
+    for age in range(-1, 120):
+        for limit in (1, 3, 10):
+            assert get_next_milestones(age, limit) == _linear_next_milestones(age, limit)
+    for category in MILESTONE_CATEGORIES + ["Unknown"]:
+        assert get_milestones_by_category(category) == [m for m in DEVELOPMENTAL_MILESTONES if m["category"] == category]
+    assert get_milestones_by_age_range("2-4 months") == [
+        m for m in DEVELOPMENTAL_MILESTONES if m["age_range"] == "2-4 months"
+    ]
+
+
+def test_batch_matches_scalar_and_skips_completed():
+    ages = np.arange(0, 90)
+    assert get_next_milestones_batch(ages, limit=4) == [get_next_milestones(int(a), 4) for a in ages]
+
+    first = get_next_milestones(24, 1)[0]["name"]
+    batch = get_next_milestones_batch([24, 24], completed=[{first}, set()], limit=3)
+    assert first not in [m["name"] for m in batch[0]]
+    assert batch[1] == get_next_milestones(24, 3)
+    assert (next_milestone_indices([500], limit=2) == -1).all()
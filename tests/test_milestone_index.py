@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from src.rag import document_store
+from src.rag.milestone_index import (
+    MilestoneKnowledgeIndex,
+    build_milestone_index,
+    get_milestone_index,
+)
+
+
+def test_index_covers_milestones_and_invalidates_on_kb_change(fake_backend, tmp_path, monkeypatch):
+    path = str(tmp_path / "milestones.json.gz")
+    monkeypatch.setenv("MILESTONE_INDEX_PATH", path)
+    build_milestone_index(top_k=2)
+
+    index = get_milestone_index()
+    walking = index.milestone_chunks("Walking")
+    assert len(walking) == 2
+    assert "walking" in walking[0]["text"].lower()
+    assert index.contexts_for(["Walking", "First Words"], categories=["Gross Motor"])
+
+    document_store.get_document_store().put_many([{"id": "new_chunk", "text": "New guidance."}])
+    assert get_milestone_index() is None
+    assert MilestoneKnowledgeIndex.load(path) is not None
+
+
+def test_program_generation_skips_live_retrieval(fake_backend, tmp_path, monkeypatch):
+    from src.models.user_model import ChildProfile
+    from src.utils import program_generator
+
+    monkeypatch.setenv("MILESTONE_INDEX_PATH", str(tmp_path / "milestones.json.gz"))
+    build_milestone_index(top_k=2)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("live retrieval should not run")
+
+    monkeypatch.setattr(program_generator, "retrieve_contexts", fail)
+    # Ten months old, so there are milestones in range
+    dob = (datetime.now() - timedelta(days=305)).date().isoformat()
+    profile = ChildProfile(name="Amani", date_of_birth=dob, profile_id="child_x")
+    program = program_generator.ProgramGenerator().generate_weekly_program(profile)
+    assert len(program) == 7
+
+
+def test_focus_areas_reach_program_knowledge(monkeypatch):
+    from src.models.user_model import ChildProfile
+    from src.utils import program_generator
+
+    class RecordingIndex:
+        def contexts_for(self, names, categories=None):
+            requested.append((names, categories))
+            return []
+
+    requested, live = [], []
+    monkeypatch.setattr(program_generator, "get_milestone_index", RecordingIndex)
+    monkeypatch.setattr(program_generator, "retrieve_contexts", lambda query, top_k: live.append(query) or [])
+    dob = (datetime.now() - timedelta(days=305)).date().isoformat()
+    generator = program_generator.ProgramGenerator()
+    milestones = program_generator.get_next_milestones(10, 3)
+
+    profile = ChildProfile(name="Amani", date_of_birth=dob, current_focus_areas=["speech and language", "Walking"])
+    generator._week_knowledge(milestones, profile)
+    names, categories = requested[-1]
+    assert "Walking" in names and "Speech and Language" in categories
+    assert live == []
+
+    # Free-text focus areas aren't in the index, so they go to live retrieval
+    profile.current_focus_areas = ["Swimming"]
+    generator._week_knowledge(milestones, profile)
+    assert "Swimming" in live[0]
@@ -1,25 +1,26 @@
-from rag_query_pinecone import query_documents
+import pytest
+
+
+@pytest.fixture
+def passages():
+    return {
+        "rag_0": "The RAG process retrieves relevant passages and then generates an answer.",
+        "rag_1": "Document retrieval embeds the question and searches the vector index.",
+        "rag_2": "DPR encodes questions and passages into dense vectors for retrieval.",
+    }
+
+
+def test_rag(fake_backend):
+    # Run the DPR + query expansion path against the in-process fakes
+    from src.rag.rag_query_pinecone import query_documents
 
-def test_rag():
     # Test questions
     test_questions = [
         "What are the key steps in the RAG process?",
         "How does the system handle document retrieval?",
         "What is the role of DPR in the system?"
     ]
-    
-    print("Testing RAG system with Pinecone...")
-    print("-" * 50)
-    
-    for question in test_questions:
-        print(f"\nQuestion: {question}")
-        try:
-            answer = query_documents(question)
-            print(f"Answer: {answer}")
-        except Exception as e:
-            print(f"Error: {str(e)}")
-    
-    print("\nTest complete!")
 
-if __name__ == "__main__":
-    test_rag()
+    for question in test_questions:
+        answer = query_documents(question)
+        assert answer
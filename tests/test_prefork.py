@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+
+from web.prefork import Supervisor
+
+
+def test_replaces_crashed_workers_until_restart_budget_is_spent(tmp_path):
+    log = tmp_path / "spawns"
+
+    def crash(slot):
+        with open(log, "a") as f:
+            f.write(f"{slot}\n")
+        raise RuntimeError("model failed to load")
+
+    supervisor = Supervisor(workers=2, target=crash, max_restarts=3)
+    assert supervisor.run() == 1
+    assert len(supervisor._restarts) == 3
+    # The last replacement may be stopped before it gets to write
+    spawns = log.read_text().split()
+    assert 2 + 2 <= len(spawns) <= 2 + 3
+    assert set(spawns) == {"0", "1"}
+    assert supervisor.children == {}
+
+
+def test_stop_terminates_workers(tmp_path):
+    started = tmp_path / "started"
+    started.mkdir()
+
+    def serve(slot):
+        open(started / str(slot), "w").close()
+        time.sleep(30)
+
+    supervisor = Supervisor(workers=2, target=serve)
+
+    def stop_once_started():
+        deadline = time.monotonic() + 10
+        while len(os.listdir(started)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        supervisor.stop()
+
+    stopper = threading.Thread(target=stop_once_started)
+    stopper.start()
+    begin = time.monotonic()
+    assert supervisor.run() == 0
+    stopper.join()
+    assert time.monotonic() - begin < 10
+    assert supervisor.children == {}
+
+
+def test_profile_sync_runs_once_before_workers(monkeypatch, tmp_path):
+    from src.models import profile_embeddings_namespace_v4
+    from web import prefork
+
+    marker = tmp_path / "synced"
+    monkeypatch.setattr(profile_embeddings_namespace_v4, "sync_all_profiles",
+                        lambda: marker.write_text(str(os.getpid())))
+    assert prefork._sync_profiles_once()
+    # The sync ran in a child, so no connections it opened live in this process
+    assert int(marker.read_text()) != os.getpid()
+
+    def fail():
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(profile_embeddings_namespace_v4, "sync_all_profiles", fail)
+    assert not prefork._sync_profiles_once()
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from src.models.profile_embeddings_namespace_v4 import ProfileEmbeddingHandler, sync_all_profiles
+from src.models.profile_payload import ProfilePayloadStore
+from src.models.user_model import ChildProfile, UserManager
+from src.rag.fakes import FakeEncoder, FakeVectorIndex
+from tests.conftest import profile_data
+
+
+class CountingEncoder(FakeEncoder):
+    def __init__(self):
+        super().__init__(64)
+        self.encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += 1 if isinstance(texts, str) else len(texts)
+        return super().encode(texts, **kwargs)
+
+
+def test_sync_reembeds_only_changed_profiles():
+    index, encoder = FakeVectorIndex(), CountingEncoder()
+    handler = ProfileEmbeddingHandler(index=index, model=encoder)
+    profiles = [profile_data(f"child_{i}", f"Child {i}") for i in range(5)]
+
+    first = handler.sync_profiles(profiles, batch_size=2)
+    assert (first["upserted"], first["unchanged"]) == (5, 0)
+    assert first["verification"].result()
+    assert encoder.encoded == 5
+
+    profiles[3] = profile_data("child_3", "Child 3", focus=["First words"])
+    second = handler.sync_profiles(profiles)
+    assert (second["upserted"], second["unchanged"]) == (1, 4)
+    assert second["verification"].result()
+    assert encoder.encoded == 6
+
+    assert handler.upsert_profile(profiles[0])
+    assert encoder.encoded == 6
+    assert handler.sync_profiles(profiles, force=True)["upserted"] == 5
+
+
+def test_upsert_profile_reports_failed_verification():
+    class DroppingIndex(FakeVectorIndex):
+        def upsert(self, vectors, namespace=""):
+            pass
+
+    handler = ProfileEmbeddingHandler(index=DroppingIndex(), model=CountingEncoder())
+    assert handler.upsert_profile(profile_data("child_1", "Child 1")) is False
+    assert handler.upsert_profile(profile_data("child_2", "Child 2"), wait=False).result() is False
+
+
+def test_sync_restores_payloads_missing_from_a_fresh_store(tmp_path):
+    index = FakeVectorIndex()
+    profile = profile_data("child_1", "Child 1")
+    ProfileEmbeddingHandler(index=index, model=CountingEncoder()).sync_profiles([profile])
+
+    fresh_store = ProfilePayloadStore(str(tmp_path / "fresh.sqlite"))
+    encoder = CountingEncoder()
+    handler = ProfileEmbeddingHandler(index=index, model=encoder, payloads=fresh_store)
+    summary = handler.sync_profiles([profile])
+    assert (summary["upserted"], summary["unchanged"]) == (0, 1)
+    assert encoder.encoded == 0
+    assert handler.get_profile_context("child_1")["name"] == "Child 1"
+    assert [p["profile_id"] for p in handler.get_similar_profiles("walking")] == ["child_1"]
+    fresh_store.close()
+
+
+def test_sync_all_profiles_pages_through_the_store(tmp_path):
+    manager = UserManager(data_dir=str(tmp_path / "user_data"))
+    for i in range(7):
+        manager.add_profile(ChildProfile(name=f"Child {i}", date_of_birth="2022-01-01", profile_id=f"child_{i}"))
+    handler = ProfileEmbeddingHandler(index=FakeVectorIndex(), model=CountingEncoder())
+
+    summary = sync_all_profiles(manager, handler, page_size=3)
+    assert summary == {"total": 7, "upserted": 7, "unchanged": 0, "verified": True}
+    assert sync_all_profiles(manager, handler, page_size=3)["upserted"] == 0
+
+
+def test_profile_lookup_uses_fetch_and_cache_without_encoding():
+    index, encoder = FakeVectorIndex(), CountingEncoder()
+    handler = ProfileEmbeddingHandler(index=index, model=encoder)
+    handler.upsert_profile(profile_data("child_1", "Child 1"))
+    encoded = encoder.encoded
+
+    assert handler.get_profile_context("child_1")["current_focus_areas"] == ("Walking",)
+    handler.index = None  # a second lookup must not touch the index
+    cached = handler.get_profile_context("child_1")
+    with pytest.raises(TypeError):
+        cached["name"] = "mutated"
+    assert cached.to_dict()["name"] == "Child 1"
+    assert encoder.encoded == encoded
+
+    handler.index = index
+    handler.upsert_profile(profile_data("child_1", "Child 1", focus=["First words"]))
+    assert handler.get_profile_context("child_1")["current_focus_areas"] == ("First words",)
+    handler.delete_profile("child_1")
+    assert handler.get_profile_context("child_1") is None
+
+
+def test_profile_payloads_live_outside_vector_metadata(payload_store):
+    index = FakeVectorIndex()
+    handler = ProfileEmbeddingHandler(index=index, model=CountingEncoder())
+    handler.upsert_profile(profile_data("child_1", "Child 1"))
+
+    metadata = index.fetch(ids=["profile_child_1"], namespace="profiles").vectors["profile_child_1"].metadata
+    assert "full_data" not in metadata
+    assert payload_store.get("child_1")["name"] == "Child 1"
+
+
+def test_legacy_full_data_vectors_are_still_readable(payload_store):
+    index = FakeVectorIndex()
+    legacy = profile_data("child_2", "Child 2")
+    index.upsert([{"id": "profile_child_2", "values": [1.0] * 64,
+                   "metadata": {"type": "profile", "profile_id": "child_2", "full_data": json.dumps(legacy)}}],
+                 namespace="profiles")
+    handler = ProfileEmbeddingHandler(index=index, model=CountingEncoder())
+    assert handler.get_profile_context("child_2").to_dict() == legacy
+    assert payload_store.get("child_2").to_dict() == legacy
@@ -0,0 +1,49 @@
+import pytest
+
+from src.models import profile_payload
+from src.models.profile_payload import CODEC_JSON, ProfilePayloadStore, decode_profile, encode_profile
+from tests.conftest import profile_data
+
+
+def _profile(entries=200):
+    return profile_data(name="Ada", medical=["Hypotonia"], progress_entries=entries,
+                        milestones={"Sitting": {"name": "Sitting", "category": "Motor", "completed": True}})
+
+
+def test_round_trip_and_lazy_sections():
+    data = _profile()
+    payload = decode_profile(encode_profile(data))
+    assert payload["name"] == "Ada"
+    assert "progress_history" not in payload._decoded
+    assert payload.to_dict() == data
+    assert dict(payload).keys() == data.keys()
+
+
+def test_decoded_sections_are_deeply_read_only():
+    payload = decode_profile(encode_profile(_profile(3)))
+    assert payload["current_focus_areas"] == ("Walking",)
+    with pytest.raises(TypeError):
+        payload["progress_history"][0]["note"] = "mutated"
+    with pytest.raises(TypeError):
+        payload["milestones"]["Sitting"]["completed"] = False
+    assert payload.to_dict()["progress_history"] == _profile(3)["progress_history"]
+    copy = payload.to_dict()
+    copy["current_focus_areas"].append("Speech")
+    assert payload["current_focus_areas"] == ("Walking",)
+
+
+def test_json_codec_and_compression():
+    data = _profile()
+    blob = encode_profile(data, codec=CODEC_JSON)
+    assert len(blob) < len(profile_payload.json.dumps(data)) / 3
+    assert decode_profile(blob).to_dict() == data
+    with pytest.raises(ValueError):
+        decode_profile(b"JUNK" + blob[4:])
+
+
+def test_store_bulk_lookup(tmp_path):
+    store = ProfilePayloadStore(str(tmp_path / "payloads.sqlite"))
+    store.put_many([dict(_profile(3), profile_id=f"child_{i}") for i in range(3)])
+    assert sorted(store.get_many(["child_0", "child_2", "missing"])) == ["child_0", "child_2"]
+    store.delete(["child_0"])
+    assert store.get("child_0") is None
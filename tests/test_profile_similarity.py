@@ -0,0 +1,113 @@
+import numpy as np
+
+from src.models.profile_embeddings_namespace_v4 import ProfileEmbeddingHandler, sync_all_profiles
+from src.models.user_model import ChildProfile, UserManager
+from src.models.profile_similarity import ProfileSimilarityIndex
+from src.rag.fakes import FakeEncoder, FakeVectorIndex
+from src.utils.embedding_compression import EmbeddingCompressor
+from tests.conftest import profile_data
+
+
+def test_filtered_top_k_and_incremental_updates():
+    index = ProfileSimilarityIndex(capacity=2)
+    index.upsert(profile_data("a", age_months=12, focus=["Walking"]), [1, 0, 0])
+    index.upsert(profile_data("b", age_months=14, focus=["walking", "Speech"], medical=["Hypotonia"]), [0.9, 0.1, 0])
+    index.upsert(profile_data("c", age_months=40, focus=["Speech"]), [1, 0, 0])
+    index.upsert(profile_data("d", age_months=13, focus=["Speech"]), [0, 1, 0])
+
+    assert [p["profile_id"] for p, _ in index.search([1, 0, 0], k=2)] == ["a", "c"]
+    assert [p["profile_id"] for p, _ in index.search([1, 0, 0], k=5, age_range=(10, 16))] == ["a", "b", "d"]
+    assert [p["profile_id"] for p, _ in index.search([1, 0, 0], k=5, focus_areas=["WALKING"])] == ["a", "b"]
+    assert [p["profile_id"] for p, _ in index.search([1, 0, 0], medical_considerations=["hypotonia"])] == ["b"]
+    assert index.search([1, 0, 0], medical_considerations=["Asthma"]) == []
+
+    index.upsert(profile_data("a", age_months=12, focus=["Speech"]), [0, 0, 1])
+    index.remove("c")
+    ranked = [p["profile_id"] for p, _ in index.search([1, 0, 0], k=5)]
+    assert ranked[0] == "b" and sorted(ranked) == ["a", "b", "d"]
+    index.upsert(profile_data("e", age_months=12), [1, 0, 0])
+    assert len(index) == 4 and np.allclose(index.vector("e"), [1, 0, 0])
+    assert index._vectors.dtype == np.float16
+
+
+def test_int8_rows_keep_ranking():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(20, 32)).astype(np.float32)
+    index = ProfileSimilarityIndex(compressor=EmbeddingCompressor("int8").fit(embeddings))
+    for i, embedding in enumerate(embeddings):
+        index.upsert(profile_data(f"p{i}", age_months=12), embedding)
+    assert index._vectors.dtype == np.int8
+    assert [p["profile_id"] for p, _ in index.search(embeddings[7], k=1)] == ["p7"]
+    assert index.search(index.vector("p3"), k=1)[0][0]["profile_id"] == "p3"
+
+
+def test_handler_serves_similar_profiles_locally():
+    handler = ProfileEmbeddingHandler(index=FakeVectorIndex(), model=FakeEncoder(64))
+    profiles = [
+        profile_data("mine", age_months=24, focus=["Walking"]),
+        profile_data("peer", age_months=26, focus=["Walking", "Speech"]),
+        profile_data("older", age_months=60, focus=["Walking"]),
+        profile_data("other_focus", age_months=24, focus=["Toilet training"]),
+    ]
+    handler.sync_profiles(profiles)["verification"].result()
+    handler.warmed = True
+
+    assert [p["profile_id"] for p in handler.get_profiles_like("mine")] == ["peer"]
+    similar = handler.get_similar_profiles("walking", n_results=4, age_range=(20, 30))
+    assert {p["profile_id"] for p in similar} == {"mine", "peer", "other_focus"}
+
+    # A fresh handler warms its local index from the stored vectors without re-encoding
+    fresh = ProfileEmbeddingHandler(index=handler.index, model=FakeEncoder(64))
+    assert fresh.sync_profiles(profiles)["upserted"] == 0
+    assert len(fresh.similarity) == 4
+    fresh.delete_profile("peer")
+    assert fresh.get_profiles_like("mine") == []
+
+
+def test_similar_profiles_go_to_pinecone_until_warmed(tmp_path):
+    manager = UserManager(data_dir=str(tmp_path / "user_data"))
+    for i, focus in enumerate(["Walking", "Speech", "Walking", "Feeding", "Speech"]):
+        manager.add_profile(ChildProfile(name=f"c{i}", date_of_birth="2023-01-01", profile_id=f"c{i}",
+                                         current_focus_areas=[focus], medical_considerations=["Hypotonia"][:i % 2]))
+    index = FakeVectorIndex()
+    sync_all_profiles(manager, ProfileEmbeddingHandler(index=index, model=FakeEncoder(64)))
+
+    fresh = ProfileEmbeddingHandler(index=index, model=FakeEncoder(64))
+    fresh.upsert_profile(manager.get_profile("c4").to_dict())
+    remote = fresh.get_similar_profiles("walking", n_results=5)
+    assert sorted(p["profile_id"] for p in remote) == ["c0", "c1", "c2", "c3", "c4"]
+    assert all(type(p) is dict for p in remote)
+    remote_speech = fresh.get_similar_profiles("walking", n_results=5, focus_areas=["speech"],
+                                               medical_considerations=["hypotonia"])
+    assert [p["profile_id"] for p in remote_speech] == ["c1"]
+
+    sync_all_profiles(manager, fresh)
+    assert fresh.warmed
+    local = fresh.get_similar_profiles("walking", n_results=5)
+    assert sorted(p["profile_id"] for p in local) == ["c0", "c1", "c2", "c3", "c4"]
+    assert all(type(p) is dict for p in local)
+    assert fresh.get_similar_profiles("walking", n_results=5, focus_areas=["speech"],
+                                      medical_considerations=["hypotonia"]) == remote_speech
+
+
+def test_resync_picks_up_changes_made_elsewhere(tmp_path):
+    data_dir = str(tmp_path / "user_data")
+    manager = UserManager(data_dir=data_dir)
+    for i in range(3):
+        manager.add_profile(ChildProfile(name=f"c{i}", date_of_birth="2023-01-01", profile_id=f"c{i}",
+                                         current_focus_areas=["Walking"]))
+    handler = ProfileEmbeddingHandler(index=FakeVectorIndex(), model=FakeEncoder(64))
+    sync_all_profiles(manager, handler)
+
+    # Another process edits, adds and deletes profiles
+    other = UserManager(data_dir=data_dir)
+    edited = other.get_profile("c1")
+    edited.current_focus_areas = ["Speech"]
+    other.save_profile(edited)
+    other.add_profile(ChildProfile(name="c3", date_of_birth="2023-01-01", profile_id="c3"))
+    other.store.delete_profile("c2")
+
+    summary = sync_all_profiles(UserManager(data_dir=data_dir, store=manager.store), handler)
+    assert (summary["total"], summary["upserted"]) == (3, 2)
+    assert sorted(handler.similarity.profile_ids()) == ["c0", "c1", "c3"]
+    assert handler.similarity.profile("c1")["current_focus_areas"] == ["Speech"]
@@ -0,0 +1,112 @@
+import json
+
+from src.models.profile_store import JSONProfileStore, SQLiteProfileStore
+from src.models.user_model import ChildProfile, UserManager
+
+
+def _write_json_profiles(data_dir, count):
+    data_dir.mkdir()
+    for i in range(count):
+        profile = ChildProfile(name=f"Child {i:02d}", date_of_birth="2022-01-01", profile_id=f"child_{i}")
+        profile.add_milestone("First Words", "Speech")
+        profile.progress_history.append({"date": "2024-01-01", "activity": "Reading", "notes": f"note {i}"})
+        (data_dir / f"child_{i}.json").write_text(json.dumps(profile.to_dict()))
+
+
+def test_json_profiles_are_migrated_once_and_looked_up_lazily(tmp_path):
+    data_dir = tmp_path / "user_data"
+    _write_json_profiles(data_dir, 12)
+
+    manager = UserManager(data_dir=str(data_dir))
+    assert isinstance(manager.store, SQLiteProfileStore)
+    assert manager.count_profiles() == 12
+    assert [p.name for p in manager.list_profiles(offset=10, limit=5)] == ["Child 10", "Child 11"]
+
+    profile = manager.get_profile_by_name("Child 07")
+    assert profile.profile_id == "child_7"
+    assert profile._milestones is None and profile._progress_history is None
+    assert profile.milestones["First Words"].completed
+    assert profile.progress_history[0]["notes"] == "note 7"
+    assert manager.get_profile_by_name("Nobody") is None
+
+    # Reopening does not import the JSON files again
+    assert UserManager(data_dir=str(data_dir)).count_profiles() == 12
+
+
+def test_saved_profiles_round_trip(tmp_path):
+    manager = UserManager(data_dir=str(tmp_path / "user_data"))
+    profile = ChildProfile(name="Ada", date_of_birth="2023-03-01", profile_id="child_1",
+                           medical_considerations=["Hypotonia"])
+    profile.add_milestone("Sitting", "Motor", completed_date="2024-01-05T00:00:00")
+    manager.add_profile(profile)
+
+    reloaded = UserManager(data_dir=str(tmp_path / "user_data")).get_profile("child_1")
+    assert reloaded.to_dict() == profile.to_dict()
+
+
+def test_json_store_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_STORE", "json")
+    data_dir = tmp_path / "user_data"
+    _write_json_profiles(data_dir, 3)
+    manager = UserManager(data_dir=str(data_dir))
+    assert isinstance(manager.store, JSONProfileStore)
+    assert manager.get_profile_by_name("Child 02").milestones["First Words"].category == "Speech"
+
+
+def test_json_journal_appends_and_compacts(tmp_path):
+    store = JSONProfileStore(str(tmp_path), compact_every=4)
+    manager = UserManager(data_dir=str(tmp_path), store=store)
+    manager.add_profile(ChildProfile(name="Ada", date_of_birth="2023-03-01", profile_id="child_1"))
+    snapshot = tmp_path / "child_1.json"
+    journal = tmp_path / "child_1.journal.jsonl"
+
+    profile = manager.get_profile("child_1")
+    before = snapshot.read_text()
+    assert manager.record_milestone(profile, "Sitting", "Motor")
+    assert not manager.record_milestone(profile, "Sitting", "Motor")
+    manager.add_progress_note(profile, "Sat for a minute", milestone="Sitting")
+    assert snapshot.read_text() == before
+    assert len(journal.read_text().splitlines()) == 2
+
+    fresh = UserManager(data_dir=str(tmp_path), store=JSONProfileStore(str(tmp_path))).get_profile("child_1")
+    assert [e["milestone"] for e in fresh.last_entries(5)] == ["Sitting", "Sitting"]
+    assert fresh.last_entries(1)[0]["note"] == "Sat for a minute"
+    assert fresh._progress_history is None
+    assert fresh.milestones["Sitting"].completed
+
+    manager.add_progress_note(profile, "Crawled", milestone="Crawling")
+    manager.add_progress_note(profile, "Clapped")
+    assert not journal.exists()
+    assert len(json.loads(snapshot.read_text())["progress_history"]) == 4
+    assert [e["milestone"] for e in store.last_progress("child_1", 2)] == ["Crawling", "Note"]
+    assert profile.progress_history == store.load_progress("child_1")
+
+
+def test_journal_survives_torn_lines_and_interrupted_compaction(tmp_path):
+    store = JSONProfileStore(str(tmp_path))
+    store.save_profile(ChildProfile(name="Ada", date_of_birth="2023-03-01", profile_id="child_1").to_dict())
+    manager = UserManager(data_dir=str(tmp_path), store=store)
+    profile = manager.get_profile("child_1")
+    manager.add_progress_note(profile, "one")
+    with open(tmp_path / "child_1.journal.jsonl", "a") as f:
+        f.write('{"type": "note_added", "no')
+    manager.add_progress_note(profile, "two")
+    assert [e["note"] for e in store.load_progress("child_1")] == ["one", "two"]
+
+    # Snapshot written but journal not yet removed: events must not be applied twice
+    store._write_snapshot(store._read("child_1"))
+    assert [e["note"] for e in store.load_progress("child_1")] == ["one", "two"]
+
+
+def test_sqlite_last_progress(tmp_path):
+    manager = UserManager(data_dir=str(tmp_path / "user_data"))
+    manager.add_profile(ChildProfile(name="Ada", date_of_birth="2023-03-01", profile_id="child_1"))
+    profile = manager.get_profile("child_1")
+    for i in range(10):
+        manager.add_progress_note(profile, f"note {i}")
+    manager.record_milestone(profile, "Walking", "Motor")
+
+    fresh = UserManager(data_dir=str(tmp_path / "user_data")).get_profile("child_1")
+    assert [e["milestone"] for e in fresh.last_entries(2)] == ["Note", "Walking"]
+    assert fresh.milestones["Walking"].category == "Motor"
+    assert len(fresh.progress_history) == 11
@@ -0,0 +1,47 @@
+from src.models.user_model import ChildProfile
+from src.utils.program_generator import DAYS, ProgramGenerator
+
+
+def test_week_is_generated_per_day_in_order(fake_backend):
+    profile = ChildProfile(
+        name="Amani",
+        date_of_birth="2023-06-01",
+        profile_id="child_x",
+        current_focus_areas=["Walking"]
+    )
+    generator = ProgramGenerator()
+    ready = []
+
+    program = generator.generate_weekly_program(profile, on_day_ready=ready.append)
+
+    assert [day["day"] for day in program] == DAYS
+    assert sorted(day["day"] for day in ready) == sorted(DAYS)
+    assert all(day["activities"] and day["activities"][0]["duration"] == "15 minutes" for day in program)
+    assert generator.token_usage["completion_tokens"] > 0
+    assert generator.programs["child_x"].activities == program
+
+
+def test_failed_day_is_retried_alone(fake_backend):
+    profile = ChildProfile(name="Amani", date_of_birth="2023-06-01", profile_id="child_x")
+    generator = ProgramGenerator()
+    generate_day, calls = generator._generate_day, []
+
+    def flaky(day, *args):
+        calls.append(day)
+        if (day == "Wednesday" and calls.count(day) == 1) or day == "Friday":
+            raise RuntimeError("rate limited")
+        return generate_day(day, *args)
+
+    generator._generate_day = flaky
+    program = generator.generate_weekly_program(profile, day_retries=1)
+
+    assert [day["day"] for day in program] == DAYS
+    assert sorted(calls) == sorted(DAYS + ["Wednesday", "Friday"])
+    assert program[2]["activities"] and "error" not in program[2]
+    assert program[4]["activities"] == [] and program[4]["error"] == "rate limited"
+
+
+def test_unparseable_day_falls_back_to_text():
+    day = ProgramGenerator()._parse_day("Monday", "Walking", "Walk together.\n\nPlay ball.")
+    assert day["day"] == "Monday"
+    assert [a["description"] for a in day["activities"]] == ["Walk together.", "Play ball."]
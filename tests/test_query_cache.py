@@ -0,0 +1,49 @@
+from src.rag import backends, document_store
+from src.rag.rag_query_streamlit import (
+    QueryResultCache,
+    get_session_cache,
+    query_knowledge_base,
+    stream_knowledge_base,
+)
+
+QUESTION = "How can physiotherapy help with walking?"
+
+
+def test_reruns_with_an_unchanged_question_reuse_the_answer(fake_backend):
+    client = backends.get_chat_client()
+    session_state = {}
+    cache = get_session_cache(session_state)
+    assert get_session_cache(session_state) is cache
+
+    first = stream_knowledge_base(QUESTION, top_k=1, cache=cache)
+    answer = "".join(first)
+    assert client.calls == 1 and not first.cached
+
+    rerun = stream_knowledge_base("  how can physiotherapy HELP with walking? ", top_k=1, cache=cache)
+    assert "".join(rerun) == answer
+    assert rerun.cached and rerun.contexts == first.contexts
+    assert query_knowledge_base(QUESTION, top_k=1, cache=cache)["answer"] == answer
+    assert client.calls == 1
+
+    # A different retrieval setting is a different question
+    query_knowledge_base(QUESTION, top_k=2, cache=cache)
+    assert client.calls == 2
+
+
+def test_cache_is_dropped_when_the_knowledge_base_changes(fake_backend):
+    client = backends.get_chat_client()
+    cache = QueryResultCache(max_entries=1)
+    query_knowledge_base(QUESTION, top_k=1, cache=cache)
+    document_store.get_document_store().put_many([{"id": "new_chunk", "text": "Hydrotherapy also helps."}])
+    query_knowledge_base(QUESTION, top_k=1, cache=cache)
+    assert client.calls == 2
+
+    query_knowledge_base("Thyroid checks?", top_k=1, cache=cache)
+    query_knowledge_base(QUESTION, top_k=1, cache=cache)
+    assert client.calls == 4
+
+
+def test_failed_queries_are_not_cached():
+    cache = QueryResultCache()
+    cache.put(("q",), {"answer": None, "contexts": None, "error": "boom"})
+    assert len(cache._entries) == 0
@@ -0,0 +1,130 @@
+import gzip
+import json
+
+import pytest
+
+from src.rag.rag_query_streamlit import query_knowledge_base, stream_knowledge_base
+from src.utils import query_log as query_log_module
+from src.utils.query_log import QueryLog, iter_records, parse_legacy_log, query_record, rotated_files
+
+
+@pytest.fixture
+def query_log(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"), flush_interval=0.05)
+    yield log
+    log.close()
+
+
+def test_records_are_written_in_order(query_log):
+    for i in range(5):
+        assert query_log.log({"question": f"q{i}"})
+    query_log.flush()
+    assert [r["question"] for r in iter_records(query_log.path)] == ["q0", "q1", "q2", "q3", "q4"]
+
+
+def test_rotation_gzips_and_prunes_old_files(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"), max_bytes=200, backups=2, flush_interval=0.05)
+    try:
+        for i in range(6):
+            log.log({"question": f"question number {i}", "answer": "x" * 200})
+            log.flush()
+    finally:
+        log.close()
+
+    rotated = rotated_files(log.path)
+    assert len(rotated) == 2
+    with gzip.open(rotated[-1], "rt", encoding="utf-8") as f:
+        assert json.loads(f.readline())["question"] == "question number 5"
+    assert [r["question"] for r in iter_records(log.path)] == ["question number 4", "question number 5"]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"), max_queue=1)
+    log.close()
+    assert log.log({"question": "kept"})
+    assert not log.log({"question": "dropped"})
+    assert log.dropped == 1
+
+
+def test_parse_legacy_log(tmp_path):
+    legacy = tmp_path / "user_queries.txt"
+    legacy.write_text(
+        "\n[2024-11-27 06:01:33]\nQuery: hey\nResponse: Hello!\n" + "-" * 80 + "\n"
+        "\n[2024-11-27 06:02:00]\nQuery: When do babies crawl?\nResponse: Around\n9 months.\n" + "-" * 80 + "\n",
+        encoding="utf-8"
+    )
+    records = list(parse_legacy_log(str(legacy)))
+    assert [r["question"] for r in records] == ["hey", "When do babies crawl?"]
+    assert records[1]["answer"] == "Around\n9 months."
+    assert records[0]["ts"] == "2024-11-27T06:01:33.000"
+
+
+def test_query_record_from_result(fake_backend):
+    result = query_knowledge_base("How does physiotherapy help walking?")
+    record = query_record("How does physiotherapy help walking?", result, profile_id="p1", source="test")
+
+    assert record["retrieved_ids"][0] == "guide.pdf_chunk_0"
+    assert len(record["scores"]) == len(record["retrieved_ids"]) == 3
+    assert record["scores"] == sorted(record["scores"], reverse=True)
+    assert set(record["timings_ms"]) == {"retrieve_ms", "total_ms"}
+    assert record["prompt_tokens"] is not None
+    assert record["profile_id"] == "p1" and record["error"] is None
+    json.dumps(record)
+
+
+def _write_many(path, writer, count, **kwargs):
+    log = QueryLog(path, flush_interval=0.01, **kwargs)
+    for i in range(count):
+        log.log({"question": f"{writer}-{i}", "answer": "x" * 100})
+        if i % 3 == 0:
+            log.flush()
+    log.close()
+
+
+def test_processes_sharing_a_log_lose_nothing(tmp_path):
+    import multiprocessing
+
+    path = str(tmp_path / "queries.jsonl")
+    ctx = multiprocessing.get_context("fork")
+    # One writer rotates constantly while the other never does on its own
+    writers = [ctx.Process(target=_write_many, args=(path, "rotating", 60), kwargs={"max_bytes": 500, "backups": 100}),
+               ctx.Process(target=_write_many, args=(path, "steady", 60), kwargs={"backups": 100})]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    questions = [r["question"] for r in iter_records(path)]
+    assert len(questions) == 120
+    for writer in ("rotating", "steady"):
+        assert [q for q in questions if q.startswith(writer)] == [f"{writer}-{i}" for i in range(60)]
+    assert len(rotated_files(path)) > 1
+
+
+def test_writers_share_a_log_without_fcntl(tmp_path, monkeypatch):
+    import threading
+
+    # As on Windows: writers in one process still take turns and reopen after rotation
+    monkeypatch.setattr(query_log_module, "fcntl", None)
+    path = str(tmp_path / "queries.jsonl")
+    writers = [threading.Thread(target=_write_many, args=(path, "rotating", 30), kwargs={"max_bytes": 500, "backups": 100}),
+               threading.Thread(target=_write_many, args=(path, "steady", 30), kwargs={"backups": 100})]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+
+    questions = [r["question"] for r in iter_records(path)]
+    for writer in ("rotating", "steady"):
+        assert [q for q in questions if q.startswith(writer)] == [f"{writer}-{i}" for i in range(30)]
+
+
+def test_query_record_from_streamed_answer(fake_backend):
+    answer = stream_knowledge_base("How does physiotherapy help walking?")
+    assert "".join(answer)
+    record = query_record("How does physiotherapy help walking?", answer.result(), timings=answer.timings)
+
+    assert record["retrieved_ids"][0] == "guide.pdf_chunk_0"
+    assert record["prompt_tokens"] > 0 and record["completion_tokens"] > 0
+    assert "first_token_ms" in record["timings_ms"]
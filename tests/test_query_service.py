@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.models.user_model import ChildProfile
+from src.rag.fakes import FakeEncoder, FakeVectorIndex
+from src.models.profile_embeddings_namespace_v4 import ProfileEmbeddingHandler
+from src.rag.rag_profile_integration import ProfileAwareRAG
+from web.service import Overloaded, QueryService
+
+
+def test_rejects_when_workers_and_queue_are_full():
+    release = threading.Event()
+
+    async def scenario():
+        service = QueryService(workers=1, max_pending=1, timeout=5)
+        first = asyncio.ensure_future(service.run(release.wait))
+        second = asyncio.ensure_future(service.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert service.in_flight == 2
+        with pytest.raises(Overloaded):
+            await service.run(lambda: "rejected")
+        release.set()
+        assert await first is True
+        assert await second == "queued"
+        assert service.in_flight == 0
+        service.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_call_keeps_its_slot_until_it_finishes():
+    release = threading.Event()
+
+    async def scenario():
+        service = QueryService(workers=1, max_pending=0, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await service.run(release.wait)
+        assert service.in_flight == 1
+        release.set()
+        await asyncio.sleep(0.05)
+        assert service.in_flight == 0
+        service.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_stream_yields_items_and_errors():
+    def failing():
+        yield "a"
+        raise RuntimeError("upstream closed")
+
+    async def scenario():
+        service = QueryService(workers=2, max_pending=0, timeout=5)
+        assert [item async for item in service.stream(lambda: iter("abc"))] == ["a", "b", "c"]
+        received = []
+        with pytest.raises(RuntimeError):
+            async for item in service.stream(failing):
+                received.append(item)
+        assert received == ["a"]
+        service.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_profile_aware_query_adds_profile_context(fake_backend):
+    handler = ProfileEmbeddingHandler(index=FakeVectorIndex(), model=FakeEncoder(64))
+    profile = ChildProfile(name="Ada", date_of_birth="2022-01-01", profile_id="child_1",
+                           current_focus_areas=["Walking"])
+    profile.progress_history = [{"date": "2024-01-02", "milestone": "Walking", "note": "Took 3 steps"}]
+
+    handler.model = None  # building the profile context must not embed anything
+    result = ProfileAwareRAG(handler).query(profile, "How can physiotherapy help walking?")
+    assert result["error"] is None
+    assert result["answer"]
+    assert "Context about Ada" in result["profile_context"]
+    assert "Took 3 steps" in result["profile_context"]
+    assert result["contexts"]
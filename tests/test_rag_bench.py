@@ -0,0 +1,34 @@
+from benchmarks import rag_bench
+from src.rag.document_store import get_document_store
+from tests.conftest import PASSAGES
+
+
+def test_parse_query_log(tmp_path):
+    log = tmp_path / "user_queries.txt"
+    log.write_text(
+        "\n[2024-11-27 06:01:33]\nQuery: hey\nResponse: Hello!\n" + "-" * 80 + "\n"
+        "\n[2024-11-27 06:02:00]\nQuery: When do babies crawl?\nResponse: Around 9 months.\n" + "-" * 80 + "\n"
+    )
+    assert rag_bench.parse_query_log(str(log)) == ["hey", "When do babies crawl?"]
+    questions = rag_bench.benchmark_questions(str(log), 12)
+    assert len(questions) == 12
+    assert questions[:2] == ["hey", "When do babies crawl?"]
+
+
+def test_retrieval_recall_and_end_to_end(fake_backend):
+    results = rag_bench.benchmark_retrieval(fake_backend, get_document_store(), list(PASSAGES), top_k=1)
+    assert results["retrieval"]["recall_at_1"] == 1.0
+    assert results["retrieval"]["mrr"] == 1.0
+    assert results["embed"]["count"] == len(PASSAGES)
+    end_to_end = rag_bench.benchmark_end_to_end(["How does speech therapy help?"] * 3)
+    assert end_to_end["count"] == 3
+    assert end_to_end["errors"] == 0
+
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = {"retrieval": {"p95_ms": 10.0, "recall_at_5": 0.9, "count": 100},
+                "ingestion": {"summary": {"chunks_per_s": 500.0}}, "end_to_end": {"errors": 0}}
+    current = {"retrieval": {"p95_ms": 10.5, "recall_at_5": 0.7, "count": 50},
+               "ingestion": {"summary": {"chunks_per_s": 300.0}}, "end_to_end": {"errors": 2}}
+    regressed = {r["metric"] for r in rag_bench.compare(baseline, current, tolerance=0.1)}
+    assert regressed == {"retrieval.recall_at_5", "ingestion.summary.chunks_per_s", "end_to_end.errors"}
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from src.utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow_answer(question):
+        calls.append(question)
+        release.wait(timeout=5)
+        return {"answer": question.upper()}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("q", slow_answer, "hi")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    # Release the shared call only once every caller has joined it
+    deadline = time.monotonic() + 5
+    while flight.callers("q") < len(threads) and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert flight.callers("q") == len(threads)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["hi"]
+    assert results == [{"answer": "HI"}] * 8
+    assert flight.in_flight() == 0
+
+
+def test_callers_get_independent_copies(monkeypatch):
+    from src.rag import rag_query_streamlit
+
+    shared = {"answer": "a", "contexts": ["c"], "sources": [{"id": "x", "score": 0.5}], "error": None}
+    monkeypatch.setattr(rag_query_streamlit._query_flight, "do", lambda key, fn, *args: shared)
+
+    first = rag_query_streamlit.query_knowledge_base("q")
+    first["contexts"].append("mutated")
+    first["sources"][0]["score"] = 0
+    assert rag_query_streamlit.query_knowledge_base("q") == shared == {
+        "answer": "a", "contexts": ["c"], "sources": [{"id": "x", "score": 0.5}], "error": None
+    }
+
+
+def test_errors_reach_every_caller_and_key_is_released():
+    flight = SingleFlight()
+
+    def boom():
+        raise ValueError("rate limited")
+
+    with pytest.raises(ValueError):
+        flight.do("q", boom)
+    assert flight.do("q", lambda: "fresh") == "fresh"
+
+
+def test_stream_fans_out_to_late_subscribers():
+    flight = SingleFlight()
+    gate = threading.Event()
+    produced = []
+
+    def tokens():
+        for token in ["a", "b", "c"]:
+            produced.append(token)
+            yield token
+            gate.wait(timeout=5)
+
+    first = flight.stream("q", tokens)
+    assert next(first) == "a"
+    second = flight.stream("q", tokens)
+    gate.set()
+
+    assert list(first) == ["b", "c"]
+    assert list(second) == ["a", "b", "c"]
+    assert produced == ["a", "b", "c"]
@@ -0,0 +1,70 @@
+import pytest
+
+from src.rag.rag_query_streamlit import query_knowledge_base
+from src.utils import tracing
+from src.utils.tracing import LatencyHistogram, Tracer, span
+
+
+@pytest.fixture
+def tracer():
+    previous = tracing.get_tracer()
+    tracer = Tracer(enabled=True)
+    tracing.set_tracer(tracer)
+    yield tracer
+    tracing.set_tracer(previous)
+
+
+def test_disabled_tracer_records_nothing():
+    previous = tracing.get_tracer()
+    tracing.set_tracer(Tracer(enabled=False))
+    try:
+        with span("stage", size=3) as s:
+            s.set_attribute("more", 1)
+        assert tracing.get_tracer().histograms == {}
+    finally:
+        tracing.set_tracer(previous)
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000)
+    assert histogram.count == 100
+    assert 0.025 <= histogram.percentile(0.5) <= 0.05
+    assert 0.05 <= histogram.percentile(0.95) <= 0.1
+    assert histogram.percentile(0.99) <= 0.1
+
+
+def test_query_stages_are_traced_and_exported(fake_backend, tracer):
+    result = query_knowledge_base("How does physiotherapy help walking?")
+    assert result["error"] is None
+
+    summary = tracer.summary()
+    for stage in ("query_knowledge_base", "retrieve_contexts", "encode_question", "index.query",
+                  "hydrate_matches", "pack_contexts", "chat_completion"):
+        assert summary[stage]["count"] == 1
+    assert summary["query_knowledge_base"]["p99_ms"] >= summary["chat_completion"]["p50_ms"]
+
+    metrics = tracer.to_prometheus()
+    assert 'ragsteps_stage_duration_seconds_count{stage="index.query"} 1' in metrics
+    assert 'le="+Inf"' in metrics
+    assert 'ragsteps_stage_duration_seconds_count{stage="index.query",worker="7"} 1' in tracer.to_prometheus(
+        labels={"worker": "7"}
+    )
+
+    spans = tracer.export_spans()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_name = {s["name"]: s for s in spans}
+    root = by_name["query_knowledge_base"]
+    assert "parentSpanId" not in root
+    assert by_name["retrieve_contexts"]["parentSpanId"] == root["spanId"]
+    assert by_name["index.query"]["traceId"] == root["traceId"]
+    assert {"key": "top_k", "value": {"intValue": "3"}} in by_name["index.query"]["attributes"]
+    assert tracer.export_spans()["resourceSpans"][0]["scopeSpans"][0]["spans"] == []
+
+
+def test_failed_span_is_marked_as_error(tracer):
+    with pytest.raises(ValueError):
+        with span("explode"):
+            raise ValueError("boom")
+    exported = tracer.export_spans()["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert exported["status"] == {"code": 2, "message": "ValueError: boom"}
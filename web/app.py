@@ -0,0 +1,240 @@
+"""HTTP API for the knowledge base, served separately from the Streamlit UI.
+
+    uvicorn web.app:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+  POST /query                          answer a question
+  POST /query/stream                   the same, as server-sent events
+  POST /profiles/{profile_id}/query    answer with the child's profile as context
+  GET  /profiles/{profile_id}/similar  synced profiles most like this child
+  POST /profiles/similar               profiles matching a free-text description
+  GET  /health                         load, for the load balancer
+  GET  /metrics                        per-stage latency histograms (Prometheus)
+
+Encoders, index and chat clients load once at startup, before the server
+accepts traffic. Profiles are re-synced every WEB_PROFILE_SYNC_SECONDS so
+similar-profile search sees edits made by other processes. Blocking work runs on a bounded pool (see web.service):
+overloaded requests get 503 with Retry-After, slow ones 504.
+"""
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from src.models.profile_embeddings_namespace_v4 import ProfileEmbeddingHandler, sync_all_profiles
+from src.models.profile_store import open_profile_store
+from src.models.user_model import UserManager
+from src.rag.backends import get_chat_client, get_vector_index, preload_models
+from src.rag.document_store import get_document_store
+from src.rag.rag_profile_integration import ProfileAwareRAG
+from src.rag.rag_query_streamlit import query_knowledge_base, stream_knowledge_base
+from src.utils.query_log import log_query
+from src.utils.tracing import get_tracer, start_otlp_exporter
+from web.service import Overloaded, QueryService
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    top_k: int = Field(3, ge=1, le=20)
+    use_gpt_knowledge: bool = True
+    token_budget: Optional[int] = Field(None, ge=1)
+
+
+class SimilarProfilesRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    n_results: int = Field(3, ge=1, le=50)
+    min_age_months: Optional[int] = None
+    max_age_months: Optional[int] = None
+    focus_areas: List[str] = []
+    medical_considerations: List[str] = []
+
+
+def _plain(profile) -> Dict:
+    """Profile payloads are read-only mappings; responses need plain dicts"""
+    return profile.to_dict() if hasattr(profile, "to_dict") else dict(profile)
+
+
+def _load_models(state):
+    """Everything the first request would otherwise load; runs once per server process.
+
+    Under web.prefork the weights are already loaded in the parent, so only
+    the clients and stores, which must not cross a fork, are opened here.
+    """
+    preload_models()
+    get_vector_index()
+    get_chat_client()
+    get_document_store()
+    state.profile_store = open_profile_store()
+    state.profile_handler = ProfileEmbeddingHandler()
+    state.profile_rag = ProfileAwareRAG(state.profile_handler)
+    if os.getenv("WEB_SYNC_PROFILES", "1") != "0":
+        # Fills the local similarity index; unchanged profiles are not re-embedded,
+        # so under web.prefork (which syncs before forking) this only loads them
+        sync_all_profiles(_current_profiles(state), state.profile_handler)
+
+
+def _current_profiles(state) -> UserManager:
+    """A UserManager over the shared store that has cached nothing yet.
+
+    UserManager keeps every profile it hands out, so a long-lived one never
+    sees edits saved by other processes; requests and re-syncs use a fresh one.
+    """
+    return UserManager(store=state.profile_store)
+
+
+async def _resync_profiles(state, interval: float):
+    """Pick up profiles created, edited or deleted by other processes; only changed ones are re-embedded"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            summary = await asyncio.to_thread(sync_all_profiles, _current_profiles(state), state.profile_handler)
+            logger.info(f"Profile re-sync: {summary['upserted']} of {summary['total']} re-embedded")
+        except Exception as e:
+            logger.error(f"Profile re-sync failed: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Loading models...")
+    await asyncio.to_thread(_load_models, app.state)
+    app.state.service = QueryService()
+    if get_tracer().enabled and os.getenv("RAGSTEPS_OTLP_ENDPOINT"):
+        start_otlp_exporter()
+    resync = None
+    interval = float(os.getenv("WEB_PROFILE_SYNC_SECONDS", 300))
+    if os.getenv("WEB_SYNC_PROFILES", "1") != "0" and interval > 0:
+        resync = asyncio.create_task(_resync_profiles(app.state, interval))
+    logger.info("Ready")
+    yield
+    if resync is not None:
+        resync.cancel()
+    app.state.service.shutdown()
+
+
+app = FastAPI(title="Bright Steps knowledge base", lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def _overloaded(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": "Server busy, try again shortly"}, status_code=503,
+                        headers={"Retry-After": "1"})
+
+
+@app.exception_handler(asyncio.TimeoutError)
+async def _timed_out(request: Request, exc: asyncio.TimeoutError):
+    return JSONResponse({"detail": "Request timed out"}, status_code=504)
+
+
+def _answer(result: Dict) -> Dict:
+    if result.get("error"):
+        raise HTTPException(status_code=502, detail=result["error"])
+    return result
+
+
+@app.get("/health")
+async def health(request: Request):
+    service = request.app.state.service
+    return {"status": "ok", "in_flight": service.in_flight, "capacity": service.capacity}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Empty unless RAGSTEPS_TRACING is enabled.
+
+    Each process keeps its own histograms and, under web.prefork, a scrape
+    reaches whichever worker accepts it; the ``worker`` label keeps every
+    worker's counters a separate, monotonic series (sum them by stage).
+    """
+    return get_tracer().to_prometheus(labels={"worker": str(os.getpid())})
+
+
+@app.post("/query")
+async def query(body: QueryRequest, request: Request):
+    result = await request.app.state.service.run(
+        query_knowledge_base, body.question, top_k=body.top_k,
+        use_gpt_knowledge=body.use_gpt_knowledge, token_budget=body.token_budget
+    )
+    log_query(body.question, result, source="api")
+    return _answer(result)
+
+
+@app.post("/query/stream")
+async def query_stream(body: QueryRequest, request: Request):
+    service = request.app.state.service
+    answer = stream_knowledge_base(body.question, top_k=body.top_k,
+                                   use_gpt_knowledge=body.use_gpt_knowledge, token_budget=body.token_budget)
+    # Takes the slot now, so an overloaded server answers 503 rather than an empty stream
+    tokens = service.stream(lambda: answer)
+
+    async def events():
+        try:
+            async for token in tokens:
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except asyncio.TimeoutError:
+            answer.error = "Request timed out"
+        finally:
+            await tokens.aclose()
+            log_query(body.question, answer.result(), source="api_stream", timings=answer.timings,
+                      cached=answer.cached)
+        yield f"event: done\ndata: {json.dumps(answer.result())}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/profiles/{profile_id}/query")
+async def profile_query(profile_id: str, body: QueryRequest, request: Request):
+    state = request.app.state
+    profile = await state.service.run(_current_profiles(state).get_profile, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile {profile_id}")
+    result = await state.service.run(
+        state.profile_rag.query, profile, body.question, top_k=body.top_k,
+        use_gpt_knowledge=body.use_gpt_knowledge, token_budget=body.token_budget
+    )
+    log_query(body.question, result, profile_id=profile_id, source="api_profile")
+    return _answer(result)
+
+
+@app.get("/profiles/{profile_id}/similar")
+async def profiles_like(profile_id: str, request: Request, n_results: int = 3, age_window: int = 6,
+                        share_focus: bool = True):
+    state = request.app.state
+    handler = state.profile_handler
+    if profile_id not in handler.similarity:
+        # Created since the last sync: sync just this one now
+        profile = await state.service.run(_current_profiles(state).get_profile, profile_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail=f"Unknown profile {profile_id}")
+        await state.service.run(handler.sync_profiles, [profile.to_dict()])
+    profiles = await state.service.run(
+        handler.get_profiles_like, profile_id, n_results=n_results, age_window=age_window,
+        share_focus=share_focus
+    )
+    return {"profiles": [_plain(p) for p in profiles]}
+
+
+@app.post("/profiles/similar")
+async def similar_profiles(body: SimilarProfilesRequest, request: Request):
+    age_range = None
+    if body.min_age_months is not None or body.max_age_months is not None:
+        age_range = (body.min_age_months or 0, body.max_age_months if body.max_age_months is not None else 10 ** 6)
+    profiles = await request.app.state.service.run(
+        request.app.state.profile_handler.get_similar_profiles, body.query, n_results=body.n_results,
+        age_range=age_range, focus_areas=body.focus_areas or None,
+        medical_considerations=body.medical_considerations or None
+    )
+    return {"profiles": [_plain(p) for p in profiles]}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.getenv("WEB_HOST", "0.0.0.0"), port=int(os.getenv("WEB_PORT", 8000)))
@@ -0,0 +1,184 @@
+"""Pre-fork serving: load models once, share them copy-on-write across workers.
+
+    python -m web.prefork --workers 4 --port 8000
+
+The parent loads the DPR and SentenceTransformer weights, collects and then
+freezes the heap (``gc.freeze``) so later collections in the workers don't
+write to the inherited objects, binds the listening socket and forks the
+workers. Each worker opens its own clients and stores (those must not cross a
+fork) and serves web.app on the shared socket. Weight pages stay shared
+until something writes to them, so N workers cost far less than N copies of
+the models. The parent only supervises: a worker that dies is replaced, and
+the server gives up if workers keep dying.
+
+Profiles are re-embedded once, in a short-lived child, before the workers
+start; each worker then only loads the stored embeddings. The OpenAI limits
+(LLM_REQUESTS_PER_MINUTE etc.) are split evenly between the workers.
+"""
+from collections import deque
+from typing import Callable, Dict
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# More restarts than this within RESTART_WINDOW_SECONDS means workers can't start
+MAX_RESTARTS = 10
+RESTART_WINDOW_SECONDS = 60
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Fork ``workers`` children running ``target(slot)`` and keep them running"""
+
+    def __init__(self, workers: int, target: Callable[[int], None], max_restarts: int = MAX_RESTARTS,
+                 restart_window: float = RESTART_WINDOW_SECONDS):
+        self.workers = workers
+        self.target = target
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.children: Dict[int, int] = {}
+        self._restarts = deque()
+        self._stopping = False
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                self.target(slot)
+            except BaseException:
+                logger.exception(f"Worker {slot} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = slot
+        logger.info(f"Started worker {slot} (pid {pid})")
+
+    def stop(self, signum=None, frame=None):
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _restart_allowed(self) -> bool:
+        now = time.monotonic()
+        while self._restarts and now - self._restarts[0] > self.restart_window:
+            self._restarts.popleft()
+        if len(self._restarts) >= self.max_restarts:
+            return False
+        self._restarts.append(now)
+        return True
+
+    def run(self) -> int:
+        """Run until stopped or workers keep failing; returns the exit code"""
+        previous = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            return self._supervise()
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def _supervise(self) -> int:
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        exit_code = 0
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            slot = self.children.pop(pid, None)
+            if slot is None or self._stopping:
+                continue
+            logger.warning(f"Worker {slot} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}")
+            if self._restart_allowed():
+                self._spawn(slot)
+            else:
+                logger.error("Workers are failing repeatedly; shutting down")
+                exit_code = 1
+                self.stop()
+        return exit_code
+
+
+def _serve(sock: socket.socket, torch_threads: int = None):
+    """Worker body: fresh clients, then uvicorn on the inherited socket"""
+    import uvicorn
+    from src.rag.backends import reset_clients
+    from web.app import app
+
+    reset_clients()
+    if torch_threads and "torch" in sys.modules:
+        # Each worker gets its share of the cores instead of all of them
+        sys.modules["torch"].set_num_threads(torch_threads)
+    uvicorn.Server(uvicorn.Config(app, lifespan="on")).run(sockets=[sock])
+
+
+def _sync_profiles_once() -> bool:
+    """Re-embed changed profiles in a child process, so neither the parent
+    nor the workers hold its connections and the workers don't race to do it"""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            from src.models.profile_embeddings_namespace_v4 import sync_all_profiles
+
+            logger.info(f"Profile sync: {sync_all_profiles()}")
+        except BaseException:
+            logger.exception("Profile sync failed")
+            code = 1
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status) == 0
+
+
+def serve(workers: int, host: str = "0.0.0.0", port: int = 8000, torch_threads: int = None) -> int:
+    from src.rag.backends import preload_models
+    import web.app  # noqa: F401  imported once so workers share its modules too
+
+    # Every worker has its own LLMController; together they must stay within the key's quota
+    os.environ["LLM_QUOTA_SHARE"] = str(workers)
+    logger.info("Loading models in the parent process...")
+    preload_models()
+    if os.getenv("WEB_SYNC_PROFILES", "1") != "0" and not _sync_profiles_once():
+        # Workers would each retry the same failing re-embed; they search Pinecone instead
+        os.environ["WEB_SYNC_PROFILES"] = "0"
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(host, port)
+    torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+    supervisor = Supervisor(workers, lambda slot: _serve(sock, torch_threads))
+    logger.info(f"Serving on {host}:{port} with {workers} workers")
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Serve web.app from pre-forked workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_PROCESSES", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("WEB_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WEB_PORT", 8000)))
+    parser.add_argument("--torch-threads", type=int, default=None)
+    args = parser.parse_args()
+    sys.exit(serve(args.workers, args.host, args.port, args.torch_threads))
@@ -0,0 +1,112 @@
+"""Bounded execution of blocking RAG calls for the async HTTP service.
+
+The RAG functions block on the encoder, the vector index and the chat API, so
+the event loop hands them to a fixed thread pool. A request only gets a slot
+if fewer than ``workers + max_pending`` calls are in flight; otherwise it is
+rejected straight away with ``Overloaded`` so the load balancer can retry
+elsewhere instead of queueing without limit. A slot is held until the call
+really finishes, not just until its request times out, so abandoned work
+still counts against capacity.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable
+import asyncio
+import os
+import threading
+import time
+
+_DONE = object()
+
+
+class Overloaded(Exception):
+    """Every worker is busy and the pending queue is full"""
+
+
+class QueryService:
+    def __init__(self, workers: int = None, max_pending: int = None, timeout: float = None):
+        self.workers = workers or int(os.getenv("WEB_WORKERS", 4))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("WEB_MAX_PENDING", 16))
+        self.timeout = timeout or float(os.getenv("WEB_REQUEST_TIMEOUT", 30))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-worker")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_pending
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise Overloaded(f"{self._in_flight} requests in flight")
+            self._in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _submit(self, fn: Callable, *args, **kwargs):
+        self._acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run a blocking call on the pool; raises Overloaded or asyncio.TimeoutError"""
+        future = self._submit(fn, *args, **kwargs)
+        # A call still waiting for a thread is cancelled on timeout and frees its slot
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+    def stream(self, make_iterable: Callable[[], Iterable]) -> AsyncIterator:
+        """Iterate a blocking iterable on the pool, yielding its items as they arrive.
+
+        Must be called from the event loop. The slot is taken immediately, so
+        Overloaded is raised here rather than on first iteration. The timeout
+        covers the whole stream; closing the generator early (the client went
+        away) stops the producer at its next item.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def put(item):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def produce():
+            try:
+                for item in make_iterable():
+                    if stopped.is_set():
+                        break
+                    put(item)
+            except Exception as e:
+                put(e)
+            finally:
+                put(_DONE)
+
+        self._submit(produce)
+        return self._drain(queue, stopped, time.monotonic() + self.timeout)
+
+    @staticmethod
+    async def _drain(queue: asyncio.Queue, stopped: threading.Event, deadline: float) -> AsyncIterator:
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), max(deadline - time.monotonic(), 0))
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)